@@ -4,6 +4,7 @@ from . import views
 urlpatterns=[
     path('register',views.register,name='register'),
     path('profile/<str:username>',views.profile,name='profile'),
+    path('profile/<str:username>/activity',views.profile_activity,name='profile_activity'),
     path('settings',views.editProfile,name='edit_profile'),
     path('delete',views.deleteProfile,name='delete_profile'),
     path('login',views.login,name='login'),
@@ -4,7 +4,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User,auth
 from .models import Profile
 from quiz.models import Quiz
-from quiz.models import QuizSubmission
+from quiz.models import QuizSubmission,UserStats,UserCategoryStrength
+from django.db.models import Count
+from django.http import JsonResponse
+from quiz.services.user_stats import get_activity_history
 
 # Create your views here.
 def register(request):
@@ -60,27 +63,36 @@ def profile(request,username):
     user_object=get_object_or_404(User,username=request.user.username)
     user_profile=get_object_or_404(Profile,user=user_object)
     
-    submissions=QuizSubmission.objects.filter(user=user_object2)
-
-    # Calculate average score percentage
-    if submissions:
-        total_percentage = 0
-        count = 0
-        for sub in submissions:
-            total_q = sub.quiz.question_set.count()
-            if total_q > 0:
-                percentage = (sub.score / total_q) * 100
-                total_percentage += percentage
-                count += 1
-        average_score = total_percentage / count if count > 0 else 0
-    else:
-        average_score = 0
-
-    context={"user_profile":user_profile,"user_profile2":user_profile2,"submissions":submissions, "average_score": average_score}
+    # Totals come from the incrementally maintained stats row; only the
+    # recent attempts are fetched, with their question counts joined in
+    user_stats=UserStats.objects.filter(user=user_object2).first()
+    submissions=list(
+        QuizSubmission.objects.filter(user=user_object2)
+        .select_related('quiz')
+        .annotate(question_count=Count('quiz__question'))
+        .order_by('-submitted_at','-id')[:5]
+    )
+    average_score = user_stats.average_percentage if user_stats else 0
+
+    # Precomputed by the compute_category_strengths batch job
+    category_strengths=list(
+        UserCategoryStrength.objects.filter(user=user_object2)
+        .select_related('category')
+        .order_by('-accuracy')
+    )
+
+    context={"user_profile":user_profile,"user_profile2":user_profile2,"submissions":submissions,"user_stats":user_stats,"average_score": average_score,"category_strengths":category_strengths}
     return render(request,'profile.html',context)
 
 
 
+@login_required(login_url='login')
+def profile_activity(request,username):
+    """Daily activity for the profile heatmap and progress chart, read from the rollup."""
+    user_object2=get_object_or_404(User,username=username)
+    return JsonResponse(get_activity_history(user_object2))
+
+
 @login_required(login_url='login')
 def editProfile(request):
     user_object = get_object_or_404(User, username=request.user)
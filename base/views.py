@@ -1,12 +1,17 @@
 from django.shortcuts import render, HttpResponse, redirect, get_object_or_404
 from django.contrib.auth.models import User
 from account.models import Profile
-from quiz.models import Question,Quiz,QuizSubmission,UserRank
+from quiz.models import Category
+from quiz.services.metrics import get_site_metrics
+from quiz.services.leaderboard import LEADERBOARD_WINDOWS,get_leaderboard_queryset,get_rank_neighbourhood,get_windowed_leaderboard,rebuild_if_unattended
 from django.contrib.auth.decorators import login_required,user_passes_test
 import datetime,math
 from .models import Message,Blog
 from django.contrib import messages
 from django.db.models import Count
+from django.conf import settings
+from django.core.paginator import Paginator
+from urllib.parse import urlencode
 from django.db.models.functions import ExtractYear
 from django.db.models import Q 
 # Create your views here.
@@ -36,10 +41,48 @@ def home(request):
 
 #     return render(request, "leaderboard.html", context)
 def leaderboard_view(request):
-    leaderboard_users = UserRank.objects.order_by('rank')
-    context = {"leaderboard_users": leaderboard_users}
+    window = request.GET.get('window', 'all')
+    if window not in LEADERBOARD_WINDOWS:
+        window = 'all'
+    category_id = request.GET.get('category')
+    category_id = int(category_id) if category_id and category_id.isdigit() else None
+
+    # The all-time global board is materialized in UserRank; windowed and
+    # per-category boards are summed from the daily rollups.
+    is_global = window == 'all' and category_id is None
+    if is_global:
+        # Ranks go stale without the worker; rebuild here once it is overdue
+        rebuild_if_unattended()
+        board = get_leaderboard_queryset()
+    else:
+        board = get_windowed_leaderboard(window, category_id)
+
+    paginator = Paginator(board, getattr(settings, 'LEADERBOARD_PAGE_SIZE', 25))
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        "leaderboard_users": page_obj,
+        "page_obj": page_obj,
+        "window": window,
+        "selected_category": category_id,
+        "categories": Category.objects.all(),
+        "filter_query": urlencode({"window": window, "category": category_id or ""}),
+    }
 
     if request.user.is_authenticated:
+        if is_global:
+            my_rank, around_me = get_rank_neighbourhood(request.user)
+        else:
+            radius = getattr(settings, 'LEADERBOARD_AROUND_ME', 2)
+            positions = [entry['user'].id for entry in board]
+            my_rank, around_me = None, []
+            if request.user.id in positions:
+                index = positions.index(request.user.id)
+                my_rank = board[index]
+                around_me = board[max(index - radius, 0):index + radius + 1]
+        context["my_rank"] = my_rank
+        context["around_me"] = around_me
+
         try:
             user_profile = Profile.objects.get(user=request.user)
             context["user_profile"] = user_profile
@@ -58,21 +101,17 @@ def dashboard_view(request):
     user_profile = get_object_or_404(Profile, user=request.user)
     
 
-    #total numbers 
-    total_users=User.objects.all().count()
-    total_quizzes=Quiz.objects.all().count()
-    total_quiz_submit=QuizSubmission.objects.all().count()
-    total_questions=Question.objects.all().count()
-
-    #today numbers
-    today_users=User.objects.filter(date_joined__date=datetime.date.today()).count()
-    today_quizzes_objs=Quiz.objects.filter(created_at__date=datetime.date.today())
-    today_quizzes=Quiz.objects.filter(created_at__date=datetime.date.today()).count()
-    today_quiz_submit=QuizSubmission.objects.filter(submitted_at__date=datetime.date.today()).count()
-    today_questions=0
-    for quiz in today_quizzes_objs:
-        today_questions+= quiz.question_set.count()
-   # today_questions=Question.objects.filter(date_joined__date=datetime.date.today()).count()
+    # Totals and today's counts come from the shared, cached metrics snapshot
+    metrics=get_site_metrics()
+    total_users=metrics['total_users']
+    total_quizzes=metrics['total_quizzes']
+    total_quiz_submit=metrics['total_submissions']
+    total_questions=metrics['total_questions']
+
+    today_users=metrics['today_users']
+    today_quizzes=metrics['today_quizzes']
+    today_quiz_submit=metrics['today_submissions']
+    today_questions=metrics['today_questions']
 
     gain_users= gain_percentage(total_users,today_users)
     gain_quizzes=gain_percentage(total_quizzes,today_quizzes)
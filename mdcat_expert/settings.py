@@ -131,6 +131,24 @@ else:
         # No DATABASE_URL and not DEBUG: fail fast to avoid misconfigured prod
         raise RuntimeError("DATABASE_URL or SQLITE_DB_PATH is required in production")
 
+# Cache shared by every gunicorn worker and the background workers, so
+# explanation locks, the Gemini circuit breaker and negative caching agree
+# across processes. Explanation texts (one per question, 24h) live in their
+# own table so filling it can never cull those coordination keys. The
+# tables are created by quiz migrations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'explanations': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'explanation_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
 # Auto-configure CSRF for Fly.io
 FLY_APP_NAME = os.getenv('FLY_APP_NAME')
 if FLY_APP_NAME:
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Category, Quiz, Question, Choice, QuizSubmission, UserRank
+from .models import Category, Quiz, Question, Choice, QuizSubmission, UserRank, DailyCategoryScore, DailyQuizScore, LeaderboardState, UserQuizScore, QuizScoreBucket, UserStats, UserCategoryStrength, UserDailyActivity, SiteCounter, ChoiceStats, CohortRetention, SharedExplanation, TokenLedgerEntry, ExplanationJob
+from .services.metrics import get_site_metrics
+from .services.cohorts import get_cohort_table
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
@@ -8,6 +10,7 @@ from django.http import HttpResponseRedirect
 from django.template.response import TemplateResponse
 import json
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, Subquery, Sum
 from django.contrib.auth import get_user_model
 
 # Use get_user_model so custom user models are supported
@@ -57,28 +60,133 @@ class QuestionInline(admin.TabularInline):
 class QuizAdmin(admin.ModelAdmin):
     form = QuizAdminForm
     inlines = [QuestionInline]
-    list_display = ['title', 'category', 'created_at', 'question_count']
+    list_display = ['title', 'category', 'created_at', 'question_count', 'reliability']
     list_filter = ['category', 'created_at']
     search_fields = ['title', 'description']
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('item_analysis')
+
     def question_count(self, obj):
         return obj.question_set.count()
     question_count.short_description = "Questions"
 
+    def reliability(self, obj):
+        analysis = getattr(obj, 'item_analysis', None)
+        if analysis is None or analysis.kr20 is None:
+            return "-"
+        return f"{analysis.kr20:.2f} ({analysis.attempts} attempts)"
+    reliability.short_description = "KR-20"
+
+
+def weak_choice_q(prefix=''):
+    """
+    Choices the pick counters flag: distractors nobody picks or that attract
+    top scorers more than bottom scorers, and keys picked more by bottom scorers.
+    """
+    return (
+        Q(**{f'{prefix}is_correct': False}) & (
+            Q(**{f'{prefix}stats__isnull': True})
+            | Q(**{f'{prefix}stats__picks': 0})
+            | Q(**{f'{prefix}stats__top_picks__gt': F(f'{prefix}stats__bottom_picks')})
+        )
+        | Q(**{f'{prefix}is_correct': True, f'{prefix}stats__bottom_picks__gt': F(f'{prefix}stats__top_picks')})
+    )
+
+
+def is_weak_choice(choice):
+    """Python counterpart of weak_choice_q for choices with their stats loaded."""
+    stats = getattr(choice, 'stats', None)
+    if choice.is_correct:
+        return stats is not None and stats.bottom_picks > stats.top_picks
+    return stats is None or stats.picks == 0 or stats.top_picks > stats.bottom_picks
+
+
+def distractor_analysis(choice, question_picks, question_top, question_bottom):
+    """Pick rate overall and within the top and bottom scorer groups of the question."""
+    stats = getattr(choice, 'stats', None)
+    if stats is None or not question_picks:
+        return "-"
+
+    def rate(picks, total):
+        return f"{picks * 100 / total:.0f}%" if total else "-"
+
+    top, bottom = rate(stats.top_picks, question_top), rate(stats.bottom_picks, question_bottom)
+    return format_html(
+        '<span style="color: {};">{} picked · top {} / bottom {}</span>',
+        'red' if is_weak_choice(choice) else 'inherit', rate(stats.picks, question_picks), top, bottom,
+    )
+
+
+class DistractorFilter(admin.SimpleListFilter):
+    title = 'distractor analysis'
+    parameter_name = 'distractor'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('unpicked', 'Distractor never picked'),
+            ('attracts_top', 'Distractor attracts top scorers'),
+            ('key_favours_bottom', 'Key picked more by bottom scorers'),
+            ('weak', 'Any of the above'),
+        )
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value == 'unpicked':
+            return queryset.filter(Q(stats__isnull=True) | Q(stats__picks=0), is_correct=False)
+        if value == 'attracts_top':
+            return queryset.filter(is_correct=False, stats__top_picks__gt=F('stats__bottom_picks'))
+        if value == 'key_favours_bottom':
+            return queryset.filter(is_correct=True, stats__bottom_picks__gt=F('stats__top_picks'))
+        if value == 'weak':
+            return queryset.filter(weak_choice_q())
+        return queryset
+
+
+class WeakDistractorFilter(admin.SimpleListFilter):
+    title = 'distractor analysis'
+    parameter_name = 'distractors'
+
+    def lookups(self, request, model_admin):
+        return (('weak', 'Has weak choices'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'weak':
+            return queryset.filter(Exists(
+                Choice.objects.filter(weak_choice_q(), question_id=OuterRef('pk'))
+            ))
+        return queryset
+
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 0
-    readonly_fields = ['is_correct']
+    readonly_fields = ['is_correct', 'distractor_analysis']
+
+    def distractor_analysis(self, obj):
+        choices = obj.question.choice_set.all()
+        stats = [choice.stats for choice in choices if getattr(choice, 'stats', None)]
+        return distractor_analysis(
+            obj,
+            sum(s.picks for s in stats),
+            sum(s.top_picks for s in stats),
+            sum(s.bottom_picks for s in stats),
+        )
+    distractor_analysis.short_description = "Distractor analysis"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('stats', 'question').prefetch_related(
+            Prefetch('question__choice_set', queryset=Choice.objects.select_related('stats'))
+        )
 
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'quiz', 'short_text', 'has_explanation', 'ai_status', 'ai_cost_display']
-    list_filter = ['quiz', 'ai_generated_at', 'ai_model']
+    list_display = ['id', 'quiz', 'short_text', 'has_explanation', 'ai_status', 'ai_cost_display', 'difficulty', 'discrimination', 'weak_choices']
+    list_filter = ['quiz', 'ai_generated_at', 'ai_model', WeakDistractorFilter]
     search_fields = ['text', 'explanation', 'ai_explanation']
-    readonly_fields = ['ai_generated_at', 'ai_cost', 'ai_model', 'ai_error']
+    readonly_fields = ['ai_generated_at', 'ai_cost', 'ai_model', 'ai_error', 'difficulty', 'discrimination']
     inlines = [ChoiceInline]
     actions = ['generate_ai_explanations', 'regenerate_ai_explanations']
 
@@ -89,8 +197,16 @@ class QuestionAdmin(admin.ModelAdmin):
         ('Explanations', {
             'fields': ('explanation', 'ai_explanation', 'ai_generated_at', 'ai_model', 'ai_cost', 'ai_error')
         }),
+        ('Item Analysis', {
+            'fields': ('difficulty', 'discrimination')
+        }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('quiz', 'item_analysis').prefetch_related(
+            Prefetch('choice_set', queryset=Choice.objects.select_related('stats'))
+        )
+
     def short_text(self, obj):
         return obj.text[:50] + "..." if len(obj.text) > 50 else obj.text
     short_text.short_description = "Question"
@@ -115,6 +231,34 @@ class QuestionAdmin(admin.ModelAdmin):
         return "-"
     ai_cost_display.short_description = "AI Cost"
 
+    def difficulty(self, obj):
+        analysis = getattr(obj, 'item_analysis', None)
+        if analysis is None or analysis.difficulty is None:
+            return "-"
+        # Flag items almost everyone gets right or wrong
+        color = 'red' if analysis.difficulty < 0.2 or analysis.difficulty > 0.95 else 'inherit'
+        return format_html('<span style="color: {};">{}</span>', color, f"{analysis.difficulty:.2f}")
+    difficulty.short_description = "Difficulty (p)"
+
+    def discrimination(self, obj):
+        analysis = getattr(obj, 'item_analysis', None)
+        if analysis is None or analysis.discrimination is None:
+            return "-"
+        # Low or negative discrimination usually means a flawed question or key
+        color = 'red' if analysis.discrimination < 0.2 else 'inherit'
+        return format_html('<span style="color: {};">{}</span>', color, f"{analysis.discrimination:.2f}")
+    discrimination.short_description = "Discrimination"
+
+    def weak_choices(self, obj):
+        choices = obj.choice_set.all()
+        if not any(getattr(choice, 'stats', None) for choice in choices):
+            return "-"
+        weak = [choice for choice in choices if is_weak_choice(choice)]
+        if not weak:
+            return format_html('<span style="color: green;">OK</span>')
+        return format_html('<span style="color: red;">{} weak</span>', len(weak))
+    weak_choices.short_description = "Distractors"
+
     def generate_ai_explanations(self, request, queryset):
         """Admin action to generate AI explanations for selected questions."""
         from .services import ExplanationGenerator
@@ -210,10 +354,26 @@ class QuestionAdmin(admin.ModelAdmin):
 
 @admin.register(Choice)
 class ChoiceAdmin(admin.ModelAdmin):
-    list_display = ['question', 'short_text', 'is_correct']
-    list_filter = ['is_correct', 'question__quiz']
+    list_display = ['question', 'short_text', 'is_correct', 'distractor_analysis']
+    list_filter = ['is_correct', DistractorFilter, 'question__quiz']
     search_fields = ['text', 'question__text']
 
+    def get_queryset(self, request):
+        # Question-level totals are summed from the sibling choices' counters
+        siblings = ChoiceStats.objects.filter(choice__question_id=OuterRef('question_id')).values('choice__question_id')
+
+        def total(field):
+            return Subquery(siblings.annotate(total=Sum(field)).values('total'))
+        return super().get_queryset(request).select_related('question', 'stats').annotate(
+            question_picks=total('picks'),
+            question_top=total('top_picks'),
+            question_bottom=total('bottom_picks'),
+        )
+
+    def distractor_analysis(self, obj):
+        return distractor_analysis(obj, obj.question_picks, obj.question_top, obj.question_bottom)
+    distractor_analysis.short_description = "Distractor analysis"
+
     def short_text(self, obj):
         return obj.text[:30] + "..." if len(obj.text) > 30 else obj.text
     short_text.short_description = "Choice"
@@ -235,6 +395,107 @@ class UserRankAdmin(admin.ModelAdmin):
     readonly_fields = ['rank', 'total_score']
 
 
+@admin.register(DailyCategoryScore)
+class DailyCategoryScoreAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'category', 'attempts', 'total_score']
+    list_filter = ['date', 'category']
+    search_fields = ['user__username']
+    readonly_fields = ['attempts', 'total_score']
+
+
+@admin.register(DailyQuizScore)
+class DailyQuizScoreAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'quiz', 'attempts', 'best_score', 'latest_score']
+    list_filter = ['date', 'quiz']
+    search_fields = ['user__username', 'quiz__title']
+    readonly_fields = ['attempts', 'best_score', 'latest_score']
+
+
+@admin.register(UserQuizScore)
+class UserQuizScoreAdmin(admin.ModelAdmin):
+    list_display = ['user', 'quiz', 'attempts', 'best_score', 'latest_score', 'total_score', 'last_submitted_at']
+    list_filter = ['quiz']
+    search_fields = ['user__username', 'quiz__title']
+    readonly_fields = ['attempts', 'best_score', 'latest_score', 'total_score', 'last_submitted_at']
+
+
+@admin.register(QuizScoreBucket)
+class QuizScoreBucketAdmin(admin.ModelAdmin):
+    list_display = ['quiz', 'score', 'takers']
+    list_filter = ['quiz']
+    readonly_fields = ['takers']
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'attempts', 'best_score', 'best_percentage', 'last_submitted_at']
+    search_fields = ['user__username']
+    readonly_fields = ['attempts', 'scored_attempts', 'total_percentage', 'best_score', 'best_percentage', 'last_submitted_at']
+
+
+@admin.register(UserDailyActivity)
+class UserDailyActivityAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'attempts', 'questions_answered', 'correct_answers']
+    list_filter = ['date']
+    search_fields = ['user__username']
+    readonly_fields = ['attempts', 'questions_answered', 'correct_answers']
+
+
+@admin.register(UserCategoryStrength)
+class UserCategoryStrengthAdmin(admin.ModelAdmin):
+    list_display = ['user', 'category', 'attempts', 'accuracy', 'recent_accuracy', 'trend', 'computed_at']
+    list_filter = ['category']
+    search_fields = ['user__username']
+
+
+@admin.register(CohortRetention)
+class CohortRetentionAdmin(admin.ModelAdmin):
+    list_display = ['cohort_week', 'week_offset', 'cohort_size', 'active_users', 'retention', 'computed_at']
+    list_filter = ['cohort_week']
+
+
+@admin.register(SharedExplanation)
+class SharedExplanationAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'ai_model', 'generated_at', 'reuse_count']
+    search_fields = ['content_hash', 'explanation']
+    readonly_fields = ['content_hash', 'generated_at', 'reuse_count']
+
+
+@admin.register(TokenLedgerEntry)
+class TokenLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'ai_model', 'question', 'questions', 'prompt_tokens', 'output_tokens', 'cost']
+    list_filter = ['ai_model', 'created_at']
+    raw_id_fields = ['question']
+    date_hierarchy = 'created_at'
+
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ExplanationJob)
+class ExplanationJobAdmin(admin.ModelAdmin):
+    list_display = ['question', 'status', 'priority', 'attempts', 'next_attempt_at', 'updated_at']
+    list_filter = ['status']
+    raw_id_fields = ['question']
+    readonly_fields = ['attempts', 'last_error', 'next_attempt_at', 'created_at', 'updated_at']
+
+
+@admin.register(SiteCounter)
+class SiteCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+    search_fields = ['name']
+    readonly_fields = ['value']
+
+
+@admin.register(LeaderboardState)
+class LeaderboardStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'dirty_at', 'rebuilt_at']
+    readonly_fields = ['dirty_at', 'rebuilt_at']
+
 
 
 # Wrap default index to include dashboard context
@@ -285,29 +546,19 @@ def index_with_dashboard(request, extra_context=None):
 
         return HttpResponseRedirect(request.path)
 
-    # Compute metrics (same as custom dashboard)
-    total_users = User.objects.count()
-    total_quizzes = Quiz.objects.count()
-    total_questions = Question.objects.count()
-    total_submissions = QuizSubmission.objects.count()
-    submissions_today = QuizSubmission.objects.filter(submitted_at__date=timezone.now().date()).count()
-
-    # Average score across all submissions
-    avg_score = None
-    if total_submissions > 0:
-        from django.db.models import Avg
-        avg_score = QuizSubmission.objects.aggregate(avg=Avg('score'))['avg']
-
+    # Shared, cached snapshot (see quiz.services.metrics)
+    metrics = get_site_metrics()
     extra = {
-        'total_users': total_users,
-        'total_quizzes': total_quizzes,
-        'total_questions': total_questions,
-        'total_submissions': total_submissions,
-        'submissions_today': submissions_today,
-        'avg_score': avg_score,
-        'quizzes_with_no_questions': Quiz.objects.annotate(q_count=models.Count('question')).filter(q_count=0).count(),
-        'pending_ai_errors': Question.objects.filter(ai_error__isnull=False).exclude(ai_error__exact='').count(),
-        'top_users': User.objects.annotate(total_score=models.Sum('userrank__total_score')).order_by('-total_score')[:5],
+        'total_users': metrics['total_users'],
+        'total_quizzes': metrics['total_quizzes'],
+        'total_questions': metrics['total_questions'],
+        'total_submissions': metrics['total_submissions'],
+        'submissions_today': metrics['today_submissions'],
+        'avg_score': metrics['avg_score'],
+        'quizzes_with_no_questions': metrics['quizzes_with_no_questions'],
+        'pending_ai_errors': metrics['pending_ai_errors'],
+        'top_users': metrics['top_users'],
+        'cohort_table': get_cohort_table(),
         'categories': Category.objects.all()
     }
 
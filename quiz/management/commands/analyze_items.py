@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from quiz.services.item_analysis import analyze_items
+
+
+class Command(BaseCommand):
+    help = 'Compute item difficulty, discrimination and KR-20 for quizzes with new submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reanalyze every quiz, not only changed ones')
+
+    def handle(self, *args, **options):
+        results = analyze_items(force=options['all'])
+        for quiz_id, result in results.items():
+            kr20 = f"{result['kr20']:.3f}" if result['kr20'] is not None else "n/a"
+            self.stdout.write(f"Quiz {quiz_id}: {result['attempts']} attempts, {result['questions']} questions, KR-20 {kr20}")
+        self.stdout.write(self.style.SUCCESS(f"Analyzed {len(results)} quiz(zes)"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from quiz.services.category_strengths import compute_category_strengths
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-user category strengths and trends shown on the profile page'
+
+    def handle(self, *args, **options):
+        rows = compute_category_strengths()
+        self.stdout.write(self.style.SUCCESS(f"Saved {rows} category strength rows"))
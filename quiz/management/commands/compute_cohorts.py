@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from quiz.services.cohorts import compute_cohort_retention
+
+
+class Command(BaseCommand):
+    help = 'Rebuild weekly signup cohorts and their retention curves for the admin dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, help='Weeks of retention to track per cohort (default: COHORT_MAX_WEEKS)')
+
+    def handle(self, *args, **options):
+        rows = compute_cohort_retention(options['weeks'])
+        self.stdout.write(self.style.SUCCESS(f"Saved {rows} cohort retention rows"))
@@ -1,37 +1,43 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from quiz.models import AdminDailyMetric, Quiz, Question, QuizSubmission
-from django.contrib.auth import get_user_model
-from django.db.models import Avg
+from django.utils.dateparse import parse_date
+from quiz.services.daily_metrics import compute_daily_metrics, default_range
 
-User = get_user_model()
 
 class Command(BaseCommand):
-    help = 'Compute and persist daily admin metrics'
+    help = (
+        'Compute and persist daily admin metrics. Without arguments, only the days '
+        'since the last computed date are processed; use --start/--end to backfill a range.'
+    )
 
-    def handle(self, *args, **options):
-        today = timezone.now().date()
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to compute (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to compute (YYYY-MM-DD, default: today)')
 
-        total_users = User.objects.count()
-        total_quizzes = Quiz.objects.count()
-        total_questions = Question.objects.count()
-        total_submissions = QuizSubmission.objects.count()
-        submissions_today = QuizSubmission.objects.filter(submitted_at__date=today).count()
+    def handle(self, *args, **options):
+        start, end = default_range()
+        if options['start']:
+            start = self._parse(options['start'], '--start')
+        if options['end']:
+            end = self._parse(options['end'], '--end')
+        elif options['start']:
+            end = timezone.localdate()
 
-        avg_score = None
-        if total_submissions > 0:
-            avg_score = QuizSubmission.objects.aggregate(avg=Avg('score'))['avg']
+        if start is None:
+            self.stdout.write("No data to compute metrics for")
+            return
+        if start > end:
+            raise CommandError(f"--start ({start}) is after --end ({end})")
 
-        metric, created = AdminDailyMetric.objects.update_or_create(
-            date=today,
-            defaults={
-                'total_users': total_users,
-                'total_quizzes': total_quizzes,
-                'total_questions': total_questions,
-                'total_submissions': total_submissions,
-                'submissions_today': submissions_today,
-                'avg_score': avg_score or None,
-            }
-        )
+        days = compute_daily_metrics(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Saved daily metrics for {days} day(s) from {start} to {end}"))
 
-        self.stdout.write(self.style.SUCCESS(f"Saved daily metric for {today}"))
\ No newline at end of file
+    def _parse(self, value, option):
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            # Well formed but not a real day, e.g. 2025-02-30
+            parsed = None
+        if parsed is None:
+            raise CommandError(f"{option} must be a date in YYYY-MM-DD format")
+        return parsed
@@ -1,7 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 from django.db.models import Q
 from quiz.models import Question
 from quiz.services import ExplanationGenerator
+from quiz.services.explanation_store import forget, reuse_stored_explanations
+from quiz.services.rate_limit import RateLimiter
 import logging
 import time
 
@@ -37,7 +42,29 @@ class Command(BaseCommand):
             '--delay',
             type=float,
             default=1.0,
-            help='Delay between API calls in seconds',
+            help='Delay between API calls in seconds (sequential mode only)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of concurrent API calls; above 1, calls are paced by --rpm/--tpm instead of --delay',
+        )
+        parser.add_argument(
+            '--pack-size',
+            type=int,
+            default=getattr(settings, 'EXPLANATION_PACK_SIZE', 1),
+            help='Number of questions explained by a single packed request (1 disables packing)',
+        )
+        parser.add_argument(
+            '--rpm',
+            type=float,
+            help='Requests per minute allowed in concurrent mode (default: GEMINI_REQUESTS_PER_MINUTE)',
+        )
+        parser.add_argument(
+            '--tpm',
+            type=float,
+            help='Tokens per minute allowed in concurrent mode (default: GEMINI_TOKENS_PER_MINUTE)',
         )
         parser.add_argument(
             '--dry-run',
@@ -46,6 +73,11 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options['pack_size'] < 1:
+            raise CommandError("--pack-size must be at least 1")
+
         try:
             generator = ExplanationGenerator()
         except Exception as e:
@@ -83,64 +115,154 @@ class Command(BaseCommand):
                 self.stdout.write(f"  ... and {total_questions - 10} more")
             return
 
-        # Process questions in batches
+        # Content explained before is copied over; duplicates are generated once
+        questions = list(queryset.order_by('id').prefetch_related('choice_set'))
+        if options['force']:
+            # Forced runs generate afresh rather than copying the old text back
+            for question in questions:
+                generator.clear_cache_for_question(question)
+                forget(question)
+        to_generate, reused = reuse_stored_explanations(questions, generator.cache_timeout)
+        if reused:
+            self.stdout.write(f"Reused stored explanations for {len(reused)} questions with identical content")
+        question_ids = [question.id for question in to_generate]
+
+        if options['workers'] > 1:
+            processed, successful, failed = self._process_concurrently(generator, question_ids, options)
+        else:
+            processed, successful, failed = self._process_sequentially(generator, question_ids, options)
+
+        handled = {question.id for question in reused} | set(question_ids)
+        _, copied = reuse_stored_explanations(
+            [question for question in questions if question.id not in handled], generator.cache_timeout
+        )
+        if copied:
+            self.stdout.write(f"Copied new explanations to {len(copied)} duplicate questions")
+
+        # Summary
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write("PROCESSING COMPLETE")
+        self.stdout.write("="*50)
+        self.stdout.write(f"Total questions processed: {processed}")
+        self.stdout.write(f"Reused without a request: {len(reused) + len(copied)}")
+        self.stdout.write(self.style.SUCCESS(f"Successful: {successful}"))
+        self.stdout.write(self.style.ERROR(f"Failed: {failed}"))
+
+        if successful > 0:
+            success_rate = (successful / processed) * 100
+            self.stdout.write(f"Success rate: {success_rate:.1f}%")
+
+        # Show cost estimate
+        try:
+            stats = generator.get_generation_stats()
+            if stats['total_cost'] > 0:
+                self.stdout.write(f"Estimated total cost: ${stats['total_cost']:.4f}")
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Could not retrieve cost stats: {e}"))
+
+    def _generate(self, generator, questions):
+        """Generate one pack of questions, as a single request when it holds several."""
+        if len(questions) == 1:
+            return {questions[0].id: generator.generate_explanation(questions[0])}
+        return generator.generate_explanations(questions)
+
+    def _report(self, question_id, explanation, progress=''):
+        if explanation:
+            self.stdout.write(self.style.SUCCESS(f"✓ Generated explanation for question {question_id}{progress}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"✗ Failed to generate explanation for question {question_id}{progress}"))
+
+    def _process_sequentially(self, generator, question_ids, options):
+        """Process one pack of questions at a time, sleeping ``--delay`` seconds between calls."""
+        total_questions = len(question_ids)
         processed = 0
         successful = 0
         failed = 0
 
         batch_size = options['batch_size']
+        pack_size = options['pack_size']
         delay = options['delay']
 
         self.stdout.write(f"Processing in batches of {batch_size} with {delay}s delay...")
 
         for i in range(0, total_questions, batch_size):
-            batch = queryset[i:i + batch_size]
+            batch = list(
+                Question.objects.prefetch_related('choice_set').filter(id__in=question_ids[i:i + batch_size]).order_by('id')
+            )
 
-            for question in batch:
-                processed += 1
-                self.stdout.write(f"Processing question {question.id} ({processed}/{total_questions})...")
+            for start in range(0, len(batch), pack_size):
+                pack = batch[start:start + pack_size]
+                processed += len(pack)
+                self.stdout.write(
+                    f"Processing question(s) {', '.join(str(question.id) for question in pack)} "
+                    f"({processed}/{total_questions})..."
+                )
 
                 try:
-                    explanation = generator.generate_explanation(question)
-
-                    if explanation:
-                        successful += 1
-                        self.stdout.write(
-                            self.style.SUCCESS(f"✓ Generated explanation for question {question.id}")
-                        )
-                    else:
-                        failed += 1
-                        self.stdout.write(
-                            self.style.ERROR(f"✗ Failed to generate explanation for question {question.id}")
-                        )
+                    explanations = self._generate(generator, pack)
+                    for question in pack:
+                        if explanations.get(question.id):
+                            successful += 1
+                        else:
+                            failed += 1
+                        self._report(question.id, explanations.get(question.id))
 
                 except Exception as e:
-                    failed += 1
-                    logger.error(f"Error processing question {question.id}: {e}")
-                    self.stdout.write(
-                        self.style.ERROR(f"✗ Error processing question {question.id}: {e}")
-                    )
+                    failed += len(pack)
+                    logger.error(f"Error processing questions {[question.id for question in pack]}: {e}")
+                    self.stdout.write(self.style.ERROR(f"✗ Error processing question(s): {e}"))
 
                 # Delay between requests to avoid rate limiting
                 if delay > 0 and processed < total_questions:
                     time.sleep(delay)
 
-        # Summary
-        self.stdout.write("\n" + "="*50)
-        self.stdout.write("PROCESSING COMPLETE")
-        self.stdout.write("="*50)
-        self.stdout.write(f"Total questions processed: {processed}")
-        self.stdout.write(self.style.SUCCESS(f"Successful: {successful}"))
-        self.stdout.write(self.style.ERROR(f"Failed: {failed}"))
+        return processed, successful, failed
 
-        if successful > 0:
-            success_rate = (successful / processed) * 100
-            self.stdout.write(f"Success rate: {success_rate:.1f}%")
+    def _process_concurrently(self, generator, question_ids, options):
+        """
+        Process questions on ``--workers`` threads sharing one token-bucket
+        limiter, so throughput follows the requests/tokens per minute quota
+        rather than fixed sleeps.
+        """
+        limiter = RateLimiter(options['rpm'], options['tpm'])
+        # The generator reserves from the limiter per upstream call, so fallback
+        # requests after a failed pack are paced too
+        generator.limiter = limiter
+        total_questions = len(question_ids)
+        self.stdout.write(
+            f"Processing with {options['workers']} workers "
+            f"(limits: {limiter.requests.rate * 60:g} requests/min, {limiter.tokens.rate * 60:g} tokens/min)..."
+        )
 
-        # Show cost estimate
-        try:
-            stats = generator.get_generation_stats()
-            if stats['total_cost'] > 0:
-                self.stdout.write(f"Estimated total cost: ${stats['total_cost']:.4f}")
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"Could not retrieve cost stats: {e}"))
\ No newline at end of file
+        def generate(pack_ids):
+            try:
+                questions = list(Question.objects.prefetch_related('choice_set').filter(id__in=pack_ids))
+                if not questions:
+                    return {}
+                return self._generate(generator, questions)
+            finally:
+                # Each worker thread has its own database connection
+                connection.close()
+
+        pack_size = options['pack_size']
+        packs = [question_ids[i:i + pack_size] for i in range(0, total_questions, pack_size)]
+        processed = successful = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(generate, pack_ids): pack_ids for pack_ids in packs}
+            for future in as_completed(futures):
+                try:
+                    explanations = future.result()
+                except Exception as e:
+                    explanations = {}
+                    logger.error(f"Error processing questions {futures[future]}: {e}")
+
+                for question_id in futures[future]:
+                    processed += 1
+                    explanation = explanations.get(question_id)
+                    if explanation:
+                        successful += 1
+                    else:
+                        failed += 1
+                    self._report(question_id, explanation, f" ({processed}/{total_questions})")
+
+        return processed, successful, failed
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from quiz.services.metrics import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard site counters after bulk writes that bypass signals'
+
+    def handle(self, *args, **options):
+        reconcile_counters()
+        self.stdout.write(self.style.SUCCESS("Site counters reconciled"))
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from quiz.services import ExplanationGenerator
+from quiz.services.prewarm import run_jobs
+from quiz.services.rate_limit import RateLimiter
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Generate queued AI explanations in the background, most popular quizzes first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=max(getattr(settings, 'EXPLANATION_PACK_SIZE', 1), 1),
+            help='Jobs claimed and explained together in one packed request',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=getattr(settings, 'EXPLANATION_WORKER_POLL_INTERVAL', 5.0),
+            help='Seconds to sleep when the queue is empty or a batch failed',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError("--batch must be at least 1")
+
+        try:
+            # Every upstream call, packed or single, waits on the shared quota
+            generator = ExplanationGenerator(limiter=RateLimiter())
+        except Exception as e:
+            raise CommandError(f"Failed to initialize ExplanationGenerator: {e}")
+
+        if not options['once']:
+            self.stdout.write(f"Explanation worker started (batch {options['batch']}, poll {options['poll']}s)")
+
+        while True:
+            close_old_connections()
+            try:
+                counts = run_jobs(generator, options['batch'])
+            except Exception as e:
+                logger.error(f"Explanation jobs failed: {e}")
+                self.stdout.write(self.style.ERROR(f"Explanation jobs failed: {e}"))
+                counts = {'done': 0, 'failed': 0, 'deferred': 0}
+
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Explained {counts['done']} question(s), {counts['failed']} failed, {counts['deferred']} deferred"
+                )
+            elif options['once']:
+                return
+
+            if not counts['done']:
+                # Queue empty or the API failing: back off before claiming again
+                time.sleep(options['poll'])
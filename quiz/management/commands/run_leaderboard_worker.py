@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from quiz.services.leaderboard import rebuild_if_due
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the leaderboard in the background whenever submissions mark it dirty'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'LEADERBOARD_REBUILD_INTERVAL', 30.0),
+            help='Minimum number of seconds between two rebuilds',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=getattr(settings, 'LEADERBOARD_POLL_INTERVAL', 2.0),
+            help='Seconds to sleep between checks of the dirty flag',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Check the dirty flag once and exit',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        poll = options['poll']
+
+        if not options['once']:
+            self.stdout.write(f"Leaderboard worker started (interval {interval}s, poll {poll}s)")
+
+        while True:
+            close_old_connections()
+            try:
+                if rebuild_if_due(interval):
+                    self.stdout.write(self.style.SUCCESS("Leaderboard rebuilt"))
+            except Exception as e:
+                logger.error(f"Leaderboard rebuild failed: {e}")
+                self.stdout.write(self.style.ERROR(f"Leaderboard rebuild failed: {e}"))
+
+            if options['once']:
+                return
+            time.sleep(poll)
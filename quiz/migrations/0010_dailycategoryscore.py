@@ -0,0 +1,60 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_category_scores(apps, schema_editor):
+    QuizSubmission = apps.get_model('quiz', 'QuizSubmission')
+    DailyCategoryScore = apps.get_model('quiz', 'DailyCategoryScore')
+
+    rows = (
+        QuizSubmission.objects.annotate(date=TruncDate('submitted_at'))
+        .values('user_id', 'quiz__category_id', 'date')
+        .annotate(attempts=Count('id'), total_score=Sum('score'))
+    )
+    DailyCategoryScore.objects.bulk_create(
+        (
+            DailyCategoryScore(
+                user_id=row['user_id'],
+                category_id=row['quiz__category_id'],
+                date=row['date'],
+                attempts=row['attempts'],
+                total_score=row['total_score'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_alter_admindailymetric_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategoryScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('total_score', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Category Score',
+                'verbose_name_plural': 'Daily Category Scores',
+                'indexes': [models.Index(fields=['date', 'category'], name='quiz_dailyc_date_d86305_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'date'), name='unique_daily_category_score')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_category_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_leaderboardstate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userrank',
+            index=models.Index(fields=['rank'], name='quiz_userra_rank_d7f53b_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+
+
+def backfill_user_quiz_scores(apps, schema_editor):
+    QuizSubmission = apps.get_model('quiz', 'QuizSubmission')
+    UserQuizScore = apps.get_model('quiz', 'UserQuizScore')
+
+    latest_score = (
+        QuizSubmission.objects.filter(user_id=OuterRef('user_id'), quiz_id=OuterRef('quiz_id'))
+        .order_by('-submitted_at', '-id')
+        .values('score')[:1]
+    )
+    rows = (
+        QuizSubmission.objects.values('user_id', 'quiz_id')
+        .annotate(
+            attempts=Count('id'),
+            best_score=Max('score'),
+            total_score=Sum('score'),
+            last_submitted_at=Max('submitted_at'),
+        )
+        .annotate(latest_score=Subquery(latest_score))
+        .order_by()
+    )
+    UserQuizScore.objects.bulk_create(
+        (UserQuizScore(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_userrank_rank_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserQuizScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('latest_score', models.IntegerField(default=0)),
+                ('total_score', models.IntegerField(default=0)),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Quiz Score',
+                'verbose_name_plural': 'User Quiz Scores',
+                'constraints': [models.UniqueConstraint(fields=('user', 'quiz'), name='unique_user_quiz_score')],
+            },
+        ),
+        migrations.RunPython(backfill_user_quiz_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_quiz_score_buckets(apps, schema_editor):
+    UserQuizScore = apps.get_model('quiz', 'UserQuizScore')
+    QuizScoreBucket = apps.get_model('quiz', 'QuizScoreBucket')
+
+    rows = (
+        UserQuizScore.objects.values('quiz_id', 'best_score')
+        .annotate(takers=Count('id'))
+        .order_by()
+    )
+    QuizScoreBucket.objects.bulk_create(
+        (
+            QuizScoreBucket(quiz_id=row['quiz_id'], score=row['best_score'], takers=row['takers'])
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_userquizscore'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('takers', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Quiz Score Bucket',
+                'verbose_name_plural': 'Quiz Score Buckets',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userquizscore',
+            index=models.Index(fields=['quiz', '-best_score'], name='quiz_userqu_quiz_id_067537_idx'),
+        ),
+        migrations.AddField(
+            model_name='quizscorebucket',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.quiz'),
+        ),
+        migrations.AddConstraint(
+            model_name='quizscorebucket',
+            constraint=models.UniqueConstraint(fields=('quiz', 'score'), name='unique_quiz_score_bucket'),
+        ),
+        migrations.RunPython(backfill_quiz_score_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_user_stats(apps, schema_editor):
+    QuizSubmission = apps.get_model('quiz', 'QuizSubmission')
+    UserStats = apps.get_model('quiz', 'UserStats')
+
+    rows = (
+        QuizSubmission.objects.values_list('user_id', 'score', 'submitted_at')
+        .annotate(question_count=Count('quiz__question'))
+        .order_by()
+    )
+    stats = {}
+    for user_id, score, submitted_at, question_count in rows.iterator():
+        entry = stats.setdefault(user_id, UserStats(
+            user_id=user_id, best_score=score, last_submitted_at=submitted_at,
+        ))
+        entry.attempts += 1
+        entry.best_score = max(entry.best_score, score)
+        entry.last_submitted_at = max(entry.last_submitted_at, submitted_at)
+        if question_count > 0:
+            percentage = score * 100 / question_count
+            entry.scored_attempts += 1
+            entry.total_percentage += percentage
+            entry.best_percentage = max(entry.best_percentage, percentage)
+    UserStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_quizscorebucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('scored_attempts', models.IntegerField(default=0)),
+                ('total_percentage', models.FloatField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('best_percentage', models.FloatField(default=0)),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Stats',
+                'verbose_name_plural': 'User Stats',
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_userstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategoryStrength',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('accuracy', models.FloatField(default=0)),
+                ('recent_accuracy', models.FloatField(blank=True, null=True)),
+                ('trend', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Category Strength',
+                'verbose_name_plural': 'User Category Strengths',
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='unique_user_category_strength')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def backfill_user_daily_activity(apps, schema_editor):
+    QuizSubmission = apps.get_model('quiz', 'QuizSubmission')
+    UserDailyActivity = apps.get_model('quiz', 'UserDailyActivity')
+
+    rows = (
+        QuizSubmission.objects.values_list('user_id', 'submitted_at', 'score')
+        .annotate(question_count=Count('quiz__question'))
+        .order_by()
+    )
+    activity = {}
+    for user_id, submitted_at, score, question_count in rows.iterator():
+        date = timezone.localdate(submitted_at) if timezone.is_aware(submitted_at) else submitted_at.date()
+        entry = activity.setdefault((user_id, date), UserDailyActivity(user_id=user_id, date=date))
+        entry.attempts += 1
+        entry.questions_answered += question_count
+        entry.correct_answers += score
+    UserDailyActivity.objects.bulk_create(activity.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0016_usercategorystrength'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('questions_answered', models.IntegerField(default=0)),
+                ('correct_answers', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Daily Activity',
+                'verbose_name_plural': 'User Daily Activity',
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_user_daily_activity')],
+            },
+        ),
+        migrations.RunPython(backfill_user_daily_activity, migrations.RunPython.noop),
+    ]
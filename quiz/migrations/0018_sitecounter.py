@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def seed_site_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Question = apps.get_model('quiz', 'Question')
+    QuizSubmission = apps.get_model('quiz', 'QuizSubmission')
+    SiteCounter = apps.get_model('quiz', 'SiteCounter')
+
+    counters = {
+        'questions': Question.objects.count(),
+        'submission_score_sum': QuizSubmission.objects.aggregate(total=Sum('score'))['total'] or 0,
+    }
+    for name, model, date_field in (
+        ('users', User, 'date_joined'),
+        ('quizzes', Quiz, 'created_at'),
+        ('submissions', QuizSubmission, 'submitted_at'),
+    ):
+        counters[name] = model.objects.count()
+        per_day = (
+            model.objects.annotate(day=TruncDate(date_field))
+            .values('day').annotate(total=Count('pk')).order_by()
+        )
+        counters.update({f"{name}:{row['day'].isoformat()}": row['total'] for row in per_day})
+
+    SiteCounter.objects.bulk_create(
+        [SiteCounter(name=name, value=value) for name, value in counters.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0017_userdailyactivity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Site Counter',
+                'verbose_name_plural': 'Site Counters',
+            },
+        ),
+        migrations.RunPython(seed_site_counters, migrations.RunPython.noop),
+    ]
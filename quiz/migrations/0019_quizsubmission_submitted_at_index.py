@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0018_sitecounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizsubmission',
+            index=models.Index(fields=['submitted_at'], name='quiz_quizsu_submitt_be1441_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0019_quizsubmission_submitted_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionItemAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('difficulty', models.FloatField(blank=True, null=True)),
+                ('discrimination', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='item_analysis', to='quiz.question')),
+            ],
+            options={
+                'verbose_name': 'Question Item Analysis',
+                'verbose_name_plural': 'Question Item Analyses',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizItemAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('kr20', models.FloatField(blank=True, null=True)),
+                ('last_submission_id', models.IntegerField(default=0)),
+                ('submission_count', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='item_analysis', to='quiz.quiz')),
+            ],
+            options={
+                'verbose_name': 'Quiz Item Analysis',
+                'verbose_name_plural': 'Quiz Item Analyses',
+            },
+        ),
+        migrations.CreateModel(
+            name='SubmissionAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_correct', models.BooleanField(default=False)),
+                ('choice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='quiz.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.question')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='quiz.quizsubmission')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('submission', 'question'), name='unique_submission_answer')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_choice_picks(apps, schema_editor):
+    # Scorer groups are not known for past answers, so only totals are seeded
+    SubmissionAnswer = apps.get_model('quiz', 'SubmissionAnswer')
+    ChoiceStats = apps.get_model('quiz', 'ChoiceStats')
+
+    rows = (
+        SubmissionAnswer.objects.filter(choice__isnull=False)
+        .values('choice_id').annotate(picks=Count('id')).order_by()
+    )
+    ChoiceStats.objects.bulk_create(
+        (ChoiceStats(choice_id=row['choice_id'], picks=row['picks']) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0020_item_analysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('picks', models.IntegerField(default=0)),
+                ('top_picks', models.IntegerField(default=0)),
+                ('bottom_picks', models.IntegerField(default=0)),
+                ('choice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='quiz.choice')),
+            ],
+            options={
+                'verbose_name': 'Choice Stats',
+                'verbose_name_plural': 'Choice Stats',
+            },
+        ),
+        migrations.RunPython(backfill_choice_picks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0021_choicestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortRetention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort_week', models.DateField()),
+                ('week_offset', models.IntegerField()),
+                ('cohort_size', models.IntegerField()),
+                ('active_users', models.IntegerField()),
+                ('retention', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Cohort Retention',
+                'verbose_name_plural': 'Cohort Retention',
+                'constraints': [models.UniqueConstraint(fields=('cohort_week', 'week_offset'), name='unique_cohort_retention')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:15
+
+from django.db import migrations, models
+from django.utils import timezone
+import hashlib
+import re
+
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', (text or '')).strip().lower()
+
+
+def backfill_shared_explanations(apps, schema_editor):
+    """Seed the store with the explanations already generated (the oldest copy wins)."""
+    Question = apps.get_model('quiz', 'Question')
+    SharedExplanation = apps.get_model('quiz', 'SharedExplanation')
+
+    stored = {}
+    questions = (
+        Question.objects.exclude(ai_explanation__isnull=True).exclude(ai_explanation='')
+        .prefetch_related('choice_set').order_by('id')
+    )
+    for question in questions.iterator(chunk_size=500):
+        choices = sorted(question.choice_set.all(), key=lambda choice: choice.id)
+        parts = [_normalize(question.text)]
+        parts.extend(f"{'*' if choice.is_correct else '-'}{_normalize(choice.text)}" for choice in choices)
+        digest = hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+        if digest not in stored:
+            stored[digest] = SharedExplanation(
+                content_hash=digest,
+                explanation=question.ai_explanation,
+                ai_model=question.ai_model,
+                generated_at=question.ai_generated_at or timezone.now(),
+            )
+    SharedExplanation.objects.bulk_create(stored.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0022_cohortretention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharedExplanation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('explanation', models.TextField()),
+                ('ai_model', models.CharField(blank=True, max_length=100, null=True)),
+                ('generated_at', models.DateTimeField()),
+                ('reuse_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Shared Explanation',
+                'verbose_name_plural': 'Shared Explanations',
+            },
+        ),
+        migrations.RunPython(backfill_shared_explanations, migrations.RunPython.noop),
+    ]
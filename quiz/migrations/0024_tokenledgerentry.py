@@ -0,0 +1,51 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_ledger_counters(apps, schema_editor):
+    """
+    Start the running totals from the explanations generated so far. Their
+    token usage was never recorded, so only the estimated cost and the
+    number of explanations are carried over.
+    """
+    Question = apps.get_model('quiz', 'Question')
+    SiteCounter = apps.get_model('quiz', 'SiteCounter')
+
+    generated = Question.objects.filter(ai_explanation__isnull=False).exclude(ai_explanation='')
+    total_cost = generated.aggregate(total=Sum('ai_cost'))['total'] or 0
+    for name, value in {
+        'explanations_generated': generated.count(),
+        'explanation_cost_nanousd': int(total_cost * 1_000_000_000),
+    }.items():
+        SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0023_sharedexplanation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('ai_model', models.CharField(max_length=100)),
+                ('questions', models.IntegerField(default=1)),
+                ('prompt_tokens', models.IntegerField()),
+                ('output_tokens', models.IntegerField()),
+                ('cost', models.DecimalField(decimal_places=9, max_digits=12)),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='quiz.question')),
+            ],
+            options={
+                'verbose_name': 'Token Ledger Entry',
+                'verbose_name_plural': 'Token Ledger',
+            },
+        ),
+        migrations.RunPython(seed_ledger_counters, migrations.RunPython.noop),
+    ]
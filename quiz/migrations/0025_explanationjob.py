@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0024_tokenledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExplanationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='explanation_job', to='quiz.question')),
+            ],
+            options={
+                'verbose_name': 'Explanation Job',
+                'verbose_name_plural': 'Explanation Jobs',
+                'indexes': [models.Index(fields=['status', '-priority', 'created_at'], name='quiz_explan_status_c0f3b5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0025_explanationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='admindailymetric',
+            name='score_sum',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0027_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='explanationjob',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
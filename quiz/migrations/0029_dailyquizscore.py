@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_daily_quiz_scores(apps, schema_editor):
+    QuizSubmission = apps.get_model('quiz', 'QuizSubmission')
+    DailyQuizScore = apps.get_model('quiz', 'DailyQuizScore')
+
+    # One ordered pass: the last submission seen for a day is its latest score
+    def rows():
+        row = None
+        submissions = QuizSubmission.objects.order_by('user_id', 'quiz_id', 'submitted_at', 'id')
+        for user_id, quiz_id, score, submitted_at in submissions.values_list(
+            'user_id', 'quiz_id', 'score', 'submitted_at'
+        ).iterator():
+            date = timezone.localdate(submitted_at)
+            if row is not None and (row.user_id, row.quiz_id, row.date) == (user_id, quiz_id, date):
+                row.attempts += 1
+                row.best_score = max(row.best_score, score)
+                row.latest_score = score
+                continue
+            if row is not None:
+                yield row
+            row = DailyQuizScore(
+                user_id=user_id, quiz_id=quiz_id, date=date, attempts=1, best_score=score, latest_score=score,
+            )
+        if row is not None:
+            yield row
+
+    DailyQuizScore.objects.bulk_create(rows(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0028_explanationjob_next_attempt_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyQuizScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('latest_score', models.IntegerField(default=0)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Quiz Score',
+                'verbose_name_plural': 'Daily Quiz Scores',
+                'indexes': [models.Index(fields=['date'], name='quiz_dailyq_date_31a517_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'quiz', 'date'), name='unique_daily_quiz_score')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_quiz_scores, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 import pandas as pd
 from django.contrib.auth.models import User 
-from django.db.models import Sum
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.core.cache import cache
 from django.conf import settings
@@ -37,6 +36,10 @@ class Quiz(models.Model):
             except Exception as e:
                 # Re-raise so callers (admin/upload handler) can catch and report
                 raise
+            # Optionally queue explanations so they are ready before students ask
+            if getattr(settings, 'EXPLANATION_PREWARM_ON_IMPORT', False):
+                from .services.prewarm import enqueue_explanations
+                transaction.on_commit(lambda: enqueue_explanations(self))
 
     def import_quiz_from_file(self):
         """Import questions from an XLSX/XLS or CSV file attached to this quiz."""
@@ -102,6 +105,8 @@ class AdminDailyMetric(models.Model):
     total_submissions = models.IntegerField()
     submissions_today = models.IntegerField()
     avg_score = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    # Exact running score sum, so the next day can continue from this row
+    score_sum = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'Admin Daily Metric'
@@ -152,6 +157,71 @@ class Question(models.Model):
         return f"question_explanation_{self.id}"
 
 
+class SharedExplanation(models.Model):
+    """AI explanation stored by question content, reused by every copy of the question."""
+    content_hash = models.CharField(max_length=64, unique=True)
+    explanation = models.TextField()
+    ai_model = models.CharField(max_length=100, blank=True, null=True)
+    generated_at = models.DateTimeField()
+    reuse_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Shared Explanation'
+        verbose_name_plural = 'Shared Explanations'
+
+    def __str__(self):
+        return self.content_hash[:12]
+
+
+class TokenLedgerEntry(models.Model):
+    """One model call and its token usage; rows are only ever appended."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    ai_model = models.CharField(max_length=100)
+    question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True)
+    questions = models.IntegerField(default=1)  # Questions explained by the call (packed calls cover several)
+    prompt_tokens = models.IntegerField()
+    output_tokens = models.IntegerField()
+    cost = models.DecimalField(max_digits=12, decimal_places=9)  # Cost in USD
+
+    class Meta:
+        verbose_name = 'Token Ledger Entry'
+        verbose_name_plural = 'Token Ledger'
+
+    def __str__(self):
+        return f"{self.ai_model} {self.prompt_tokens}+{self.output_tokens} tokens"
+
+
+class ExplanationJob(models.Model):
+    """Queued background generation of a question's AI explanation, run by run_explanation_worker."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='explanation_job')
+    priority = models.IntegerField(default=0)  # Higher runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)  # Upstream calls that failed
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)  # Retry backoff
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Explanation Job'
+        verbose_name_plural = 'Explanation Jobs'
+        indexes = [models.Index(fields=['status', '-priority', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.question} ({self.status})"
+
+
 class Choice(models.Model):
     question=models.ForeignKey(Question,on_delete=models.CASCADE)
     text=models.CharField(max_length=255)
@@ -171,49 +241,355 @@ class Choice(models.Model):
             return "?"
     
 
+class ChoiceStats(models.Model):
+    """Running pick counters for a choice, overall and by top/bottom scorer group."""
+    choice = models.OneToOneField(Choice, on_delete=models.CASCADE, related_name='stats')
+    picks = models.IntegerField(default=0)
+    top_picks = models.IntegerField(default=0)
+    bottom_picks = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Choice Stats'
+        verbose_name_plural = 'Choice Stats'
+
+    def __str__(self):
+        return str(self.choice)
+
+
 class QuizSubmission(models.Model):
     user=models.ForeignKey(User,on_delete=models.CASCADE)
     quiz=models.ForeignKey(Quiz,on_delete=models.CASCADE)
     score=models.IntegerField()
     submitted_at=models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['submitted_at']),
+        ]
+
     def __str__(self):
         return f"{self.user},{self.quiz.title}"
 
 
+class SubmissionAnswer(models.Model):
+    """The choice picked for one question of a submission (null when left blank)."""
+    submission = models.ForeignKey(QuizSubmission, on_delete=models.CASCADE, related_name='answers')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.SET_NULL, null=True, blank=True)
+    is_correct = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'question'], name='unique_submission_answer'),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id},{self.question_id}"
+
+
+class QuizItemAnalysis(models.Model):
+    """Quiz-level reliability (KR-20) from the last analyze_items run."""
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name='item_analysis')
+    attempts = models.IntegerField(default=0)
+    kr20 = models.FloatField(null=True, blank=True)
+    # Watermark used to skip quizzes without new (or deleted) submissions
+    last_submission_id = models.IntegerField(default=0)
+    submission_count = models.IntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Quiz Item Analysis'
+        verbose_name_plural = 'Quiz Item Analyses'
+
+    def __str__(self):
+        return self.quiz.title
+
+
+class QuestionItemAnalysis(models.Model):
+    """Per-question difficulty (p-value) and point-biserial discrimination."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='item_analysis')
+    attempts = models.IntegerField(default=0)
+    difficulty = models.FloatField(null=True, blank=True)
+    discrimination = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Question Item Analysis'
+        verbose_name_plural = 'Question Item Analyses'
+
+    def __str__(self):
+        return str(self.question)
+
+
 class UserRank(models.Model):
     user=models.OneToOneField(User,on_delete=models.CASCADE)
     rank=models.IntegerField(null=True,blank=True)
     total_score=models.IntegerField(null=True,blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['rank']),
+        ]
+
     def __str__(self):
         return f"{self.rank},{self.user.username}"
-    
-@receiver(post_save,sender=QuizSubmission)
-def update_leaderboard(sender,instance,created,**kwargs):
-    if created:
-        calculate_leaderboard()
 
 
+class DailyCategoryScore(models.Model):
+    """Per-user, per-day, per-category score rollup maintained on submission."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    date = models.DateField()
+    attempts = models.IntegerField(default=0)
+    total_score = models.IntegerField(default=0)
 
-def calculate_leaderboard():
-    # count sum of scores of all users
-    user_scores= (QuizSubmission.objects.values('user').annotate(total_score=Sum('score')).order_by('-total_score'))
+    class Meta:
+        verbose_name = 'Daily Category Score'
+        verbose_name_plural = 'Daily Category Scores'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'date'], name='unique_daily_category_score'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'category']),
+        ]
+
+    def __str__(self):
+        return f"{self.user},{self.category},{self.date}"
 
-    #update reank based on sorted list
-    rank=1
-    for entry in user_scores:
-        user_id=entry['user']
-        total_score=entry['total_score']
 
-        user_rank,created=UserRank.objects.get_or_create(user_id=user_id)
-        user_rank.rank=rank
-        user_rank.total_score=total_score
+class DailyQuizScore(models.Model):
+    """Per-user, per-day, per-quiz best and latest score for windowed leaderboards."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    date = models.DateField()
+    attempts = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    latest_score = models.IntegerField(default=0)
 
-        user_rank.save()
+    class Meta:
+        verbose_name = 'Daily Quiz Score'
+        verbose_name_plural = 'Daily Quiz Scores'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz', 'date'], name='unique_daily_quiz_score'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
 
+    def __str__(self):
+        return f"{self.user},{self.quiz.title},{self.date}"
 
-        rank+=1
 
+class UserQuizScore(models.Model):
+    """Per-(user, quiz) score aggregate maintained by upsert on submission."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    attempts = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    latest_score = models.IntegerField(default=0)
+    total_score = models.IntegerField(default=0)
+    last_submitted_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        verbose_name = 'User Quiz Score'
+        verbose_name_plural = 'User Quiz Scores'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz'], name='unique_user_quiz_score'),
+        ]
+        indexes = [
+            models.Index(fields=['quiz', '-best_score']),
+        ]
+
+    def __str__(self):
+        return f"{self.user},{self.quiz.title}"
 
+
+class QuizScoreBucket(models.Model):
+    """Histogram bucket: how many takers of a quiz have this best score."""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    score = models.IntegerField()
+    takers = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Quiz Score Bucket'
+        verbose_name_plural = 'Quiz Score Buckets'
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'score'], name='unique_quiz_score_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz.title},{self.score}"
+
+
+class UserStats(models.Model):
+    """Per-user profile statistics maintained incrementally on submission."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='user_stats')
+    attempts = models.IntegerField(default=0)
+    scored_attempts = models.IntegerField(default=0)
+    total_percentage = models.FloatField(default=0)
+    best_score = models.IntegerField(default=0)
+    best_percentage = models.FloatField(default=0)
+    last_submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'User Stats'
+        verbose_name_plural = 'User Stats'
+
+    def __str__(self):
+        return str(self.user)
+
+    @property
+    def average_percentage(self):
+        """Average score percentage over attempts at quizzes with questions."""
+        if not self.scored_attempts:
+            return 0
+        return self.total_percentage / self.scored_attempts
+
+
+class UserDailyActivity(models.Model):
+    """Per-user, per-day activity rollup backing the profile heatmap and progress chart."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    attempts = models.IntegerField(default=0)
+    questions_answered = models.IntegerField(default=0)
+    correct_answers = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'User Daily Activity'
+        verbose_name_plural = 'User Daily Activity'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_user_daily_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.user},{self.date}"
+
+
+class UserCategoryStrength(models.Model):
+    """Per-user accuracy and trend by category, recomputed by compute_category_strengths."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    attempts = models.IntegerField(default=0)
+    accuracy = models.FloatField(default=0)
+    recent_accuracy = models.FloatField(null=True, blank=True)
+    trend = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'User Category Strength'
+        verbose_name_plural = 'User Category Strengths'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_user_category_strength'),
+        ]
+
+    def __str__(self):
+        return f"{self.user},{self.category}"
+
+
+class CohortRetention(models.Model):
+    """Share of a weekly signup cohort active N weeks later, rebuilt by compute_cohorts."""
+    cohort_week = models.DateField()
+    week_offset = models.IntegerField()
+    cohort_size = models.IntegerField()
+    active_users = models.IntegerField()
+    retention = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Cohort Retention'
+        verbose_name_plural = 'Cohort Retention'
+        constraints = [
+            models.UniqueConstraint(fields=['cohort_week', 'week_offset'], name='unique_cohort_retention'),
+        ]
+
+    def __str__(self):
+        return f"{self.cohort_week}+{self.week_offset}w"
+
+
+class SiteCounter(models.Model):
+    """Named running counter for the admin dashboards, maintained by signals."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Site Counter'
+        verbose_name_plural = 'Site Counters'
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class LeaderboardState(models.Model):
+    """Dirty flag for a materialized leaderboard, consumed by run_leaderboard_worker."""
+    name = models.CharField(max_length=50, unique=True)
+    dirty_at = models.DateTimeField(null=True, blank=True)
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Leaderboard State'
+        verbose_name_plural = 'Leaderboard States'
+
+    def __str__(self):
+        return self.name
+
+
+@receiver(post_save,sender=QuizSubmission)
+def update_leaderboard(sender,instance,created,**kwargs):
+    from .services.leaderboard import record_submission, resync_submission, mark_leaderboard_dirty
+    from .services.user_stats import record_user_stats, resync_user_stats
+    if created:
+        record_submission(instance)
+        record_user_stats(instance)
+    else:
+        # Score corrections are rare; recompute the affected aggregates
+        resync_submission(instance.user_id, instance.quiz_id, instance.quiz.category_id, instance.submitted_at)
+        resync_user_stats(instance.user_id, instance.submitted_at)
+    # Ranks are recomputed by the worker
+    mark_leaderboard_dirty()
+
+
+@receiver(post_delete,sender=QuizSubmission)
+def invalidate_leaderboard(sender,instance,**kwargs):
+    from .services.leaderboard import resync_submission, mark_leaderboard_dirty
+    from .services.user_stats import resync_user_stats
+    # Resync after commit: when a user or quiz is being deleted, the cascade
+    # must finish before the remaining aggregates are recomputed
+    args = (instance.user_id, instance.quiz_id, instance.quiz.category_id, instance.submitted_at)
+    transaction.on_commit(lambda: resync_submission(*args))
+    transaction.on_commit(lambda: resync_user_stats(args[0], args[3]))
+    mark_leaderboard_dirty()
+
+
+@receiver(post_save,sender=User)
+@receiver(post_save,sender=Quiz)
+@receiver(post_save,sender=Question)
+@receiver(post_save,sender=QuizSubmission)
+def count_created(sender,instance,created,**kwargs):
+    from .services.metrics import count_instance, count_score_change
+    if created:
+        count_instance(instance, 1)
+    elif sender is QuizSubmission:
+        count_score_change(getattr(instance, '_previous_score', None), instance.score)
+
+
+@receiver(pre_save,sender=QuizSubmission)
+def remember_previous_score(sender,instance,**kwargs):
+    if not instance._state.adding:
+        instance._previous_score = (
+            QuizSubmission.objects.filter(pk=instance.pk).values_list('score', flat=True).first()
+        )
+
+
+@receiver(post_delete,sender=User)
+@receiver(post_delete,sender=Quiz)
+@receiver(post_delete,sender=Question)
+@receiver(post_delete,sender=QuizSubmission)
+def count_deleted(sender,instance,**kwargs):
+    from .services.metrics import count_instance
+    count_instance(instance, -1)
+
+
+def calculate_leaderboard():
+    """Rebuild UserRank from the per-quiz score aggregates immediately."""
+    from .services.leaderboard import rebuild_leaderboard
+    rebuild_leaderboard()
@@ -1,3 +1,4 @@
 from .explanation_generator import ExplanationGenerator
+from .leaderboard import get_windowed_leaderboard
 
-__all__ = ['ExplanationGenerator']
\ No newline at end of file
+__all__ = ['ExplanationGenerator', 'get_windowed_leaderboard']
\ No newline at end of file
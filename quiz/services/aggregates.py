@@ -0,0 +1,32 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from typing import Any, Dict, Optional
+
+
+def upsert_increment(model, lookup: Dict[str, Any], increments: Dict[str, int],
+                     defaults: Optional[Dict[str, Any]] = None,
+                     expressions: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Add ``increments`` to the counters of the row matching ``lookup``, creating
+    the row when it does not exist yet.
+
+    ``defaults`` are plain values written on both insert and update, while
+    ``expressions`` (e.g. ``Greatest('best', Value(x))``) override them on update
+    only, since a new row has nothing to compare against.
+
+    The UPDATE runs first so the common case is a single statement; a concurrent
+    insert of the same row is resolved by retrying the UPDATE.
+    """
+    defaults = defaults or {}
+    updates = {field: F(field) + amount for field, amount in increments.items()}
+    updates.update(defaults)
+    updates.update(expressions or {})
+
+    if model.objects.filter(**lookup).update(**updates):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **increments, **defaults)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates)
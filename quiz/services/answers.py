@@ -0,0 +1,56 @@
+from django.db.models import F
+from typing import Dict, Iterable, Optional
+
+from .quiz_stats import get_score_group
+
+
+def record_answers(submission, questions: Iterable, posted: Dict[str, Optional[str]]) -> list:
+    """
+    Store the choice picked for each question of ``submission``. The quiz
+    form posts the chosen choice's text under the question id; questions
+    left blank (or with an unknown choice) are stored with no choice.
+    ``questions`` should have their choices prefetched.
+    """
+    from ..models import SubmissionAnswer
+
+    answers = []
+    for question in questions:
+        text = posted.get(str(question.id))
+        choice = next((c for c in question.choice_set.all() if text is not None and c.text == text), None)
+        answers.append(SubmissionAnswer(
+            submission=submission,
+            question=question,
+            choice=choice,
+            is_correct=bool(choice and choice.is_correct),
+        ))
+    answers = SubmissionAnswer.objects.bulk_create(answers)
+    count_choice_picks(submission, [answer.choice_id for answer in answers if answer.choice_id])
+    return answers
+
+
+def count_choice_picks(submission, choice_ids) -> None:
+    """
+    Add one pick to each of ``choice_ids``, also counted under the top or
+    bottom scorer group of ``submission``. Missing counter rows are created
+    first so a single UPDATE with F() expressions covers every choice.
+    """
+    from ..models import ChoiceStats
+
+    if not choice_ids:
+        return
+    group = get_score_group(submission.quiz, submission.score)
+    ChoiceStats.objects.bulk_create(
+        [ChoiceStats(choice_id=choice_id) for choice_id in choice_ids], ignore_conflicts=True
+    )
+    ChoiceStats.objects.filter(choice_id__in=choice_ids).update(
+        picks=F('picks') + 1,
+        top_picks=F('top_picks') + int(group == 'top'),
+        bottom_picks=F('bottom_picks') + int(group == 'bottom'),
+    )
+
+
+def get_submitted_answers(submission) -> Dict[int, str]:
+    """Map question id to the chosen choice's text, as the quiz template expects."""
+    return dict(
+        submission.answers.filter(choice__isnull=False).values_list('question_id', 'choice__text')
+    )
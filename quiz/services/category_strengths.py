@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.utils import timezone
+from datetime import timedelta
+import numpy as np
+
+# Values of the ``period`` annotation used to split submissions into trend windows
+OLDER, PREVIOUS, RECENT = 0, 1, 2
+
+
+def _question_counts(quiz_ids: np.ndarray) -> np.ndarray:
+    """Map an array of quiz ids to their question counts with a sorted lookup."""
+    from ..models import Question
+
+    counts = (
+        Question.objects.values('quiz_id').annotate(total=Count('id'))
+        .order_by('quiz_id').values_list('quiz_id', 'total')
+    )
+    lookup = np.array(list(counts), dtype=np.int64).reshape(-1, 2)
+    if not len(lookup):
+        return np.zeros(len(quiz_ids), dtype=np.int64)
+
+    keys, values = lookup[:, 0], lookup[:, 1]
+    index = np.searchsorted(keys, quiz_ids).clip(max=len(keys) - 1)
+    return np.where(keys[index] == quiz_ids, values[index], 0)
+
+
+def _window_accuracy(inverse: np.ndarray, percentages: np.ndarray, mask: np.ndarray, size: int) -> np.ndarray:
+    """Mean percentage per group over the masked submissions, NaN where a group has none."""
+    attempts = np.bincount(inverse[mask], minlength=size)
+    totals = np.bincount(inverse[mask], weights=percentages[mask], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(attempts > 0, totals / attempts, np.nan)
+
+
+def compute_category_strengths(now=None) -> int:
+    """
+    Recompute every user's accuracy per category, plus the trend between the
+    last two ``CATEGORY_TREND_DAYS`` windows, and replace the contents of
+    UserCategoryStrength. Submissions are loaded once into NumPy arrays and
+    grouped by (user, category) with ``np.unique``/``np.bincount``.
+    Returns the number of rows written.
+    """
+    from ..models import QuizSubmission, UserCategoryStrength
+
+    now = now or timezone.now()
+    days = getattr(settings, 'CATEGORY_TREND_DAYS', 30)
+    recent_start = now - timedelta(days=days)
+    previous_start = recent_start - timedelta(days=days)
+
+    rows = (
+        QuizSubmission.objects.annotate(period=Case(
+            When(submitted_at__gte=recent_start, then=Value(RECENT)),
+            When(submitted_at__gte=previous_start, then=Value(PREVIOUS)),
+            default=Value(OLDER),
+            output_field=IntegerField(),
+        ))
+        .values_list('user_id', 'quiz__category_id', 'quiz_id', 'score', 'period')
+        .order_by()
+    )
+    data = np.array(list(rows.iterator(chunk_size=5000)), dtype=np.int64).reshape(-1, 5)
+    users, categories, quizzes, scores, periods = data.T
+
+    # Submissions to quizzes without questions have no accuracy to contribute
+    question_counts = _question_counts(quizzes)
+    scored = question_counts > 0
+    users, categories, periods = users[scored], categories[scored], periods[scored]
+    percentages = scores[scored] * 100 / question_counts[scored]
+
+    keys, inverse = np.unique(np.stack([users, categories], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    size = len(keys)
+
+    attempts = np.bincount(inverse, minlength=size)
+    accuracy = _window_accuracy(inverse, percentages, np.ones(len(inverse), dtype=bool), size)
+    recent = _window_accuracy(inverse, percentages, periods == RECENT, size)
+    previous = _window_accuracy(inverse, percentages, periods == PREVIOUS, size)
+    trend = recent - previous
+
+    strengths = [
+        UserCategoryStrength(
+            user_id=int(user_id),
+            category_id=int(category_id),
+            attempts=int(attempts[i]),
+            accuracy=float(accuracy[i]),
+            recent_accuracy=None if np.isnan(recent[i]) else float(recent[i]),
+            trend=None if np.isnan(trend[i]) else float(trend[i]),
+            computed_at=now,
+        )
+        for i, (user_id, category_id) in enumerate(keys)
+    ]
+    with transaction.atomic():
+        UserCategoryStrength.objects.all().delete()
+        UserCategoryStrength.objects.bulk_create(strengths, batch_size=1000)
+    return size
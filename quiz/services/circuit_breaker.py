@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.core.cache import cache
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker whose state lives in the default cache. It
+    is shared by every worker process only because that cache is the
+    database-backed one from settings; with a per-process cache such as
+    LocMemCache, each process would trip on its own. Counter increments are
+    not atomic there, so under heavy concurrency the failure rate is
+    approximate.
+
+    Calls and failures are counted in fixed windows of ``window`` seconds.
+    Once at least ``min_calls`` calls were made in the current window and
+    the failure rate reaches ``failure_rate``, the circuit opens and calls
+    fail fast for ``open_seconds``. After that a single probe call is let
+    through (half-open): its success closes the circuit, its failure opens
+    it again. Defaults come from the ``GEMINI_CIRCUIT_*`` settings.
+    """
+
+    def __init__(self, name: str = 'gemini', failure_rate=None, min_calls=None, window=None, open_seconds=None):
+        self.name = name
+        self.failure_rate = failure_rate or getattr(settings, 'GEMINI_CIRCUIT_FAILURE_RATE', 0.5)
+        self.min_calls = min_calls or getattr(settings, 'GEMINI_CIRCUIT_MIN_CALLS', 5)
+        self.window = window or getattr(settings, 'GEMINI_CIRCUIT_WINDOW', 60)
+        self.open_seconds = open_seconds or getattr(settings, 'GEMINI_CIRCUIT_OPEN_SECONDS', 30)
+
+    def _key(self, suffix: str) -> str:
+        return f"circuit_{self.name}_{suffix}"
+
+    def _window_keys(self):
+        window = int(time.time() // self.window)
+        return self._key(f"calls_{window}"), self._key(f"failures_{window}")
+
+    def _incr(self, key: str) -> int:
+        cache.add(key, 0, self.window * 2)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            cache.set(key, 1, self.window * 2)
+            return 1
+
+    @property
+    def state(self) -> str:
+        opened_until = cache.get(self._key('open_until'))
+        if opened_until is None:
+            return 'closed'
+        return 'open' if time.time() < opened_until else 'half-open'
+
+    def allow(self) -> bool:
+        """Whether a call may be made now; in the half-open state only one probe is allowed."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'open':
+            return False
+        return cache.add(self._key('probe'), 1, self.open_seconds)
+
+    def record_success(self):
+        self._incr(self._window_keys()[0])
+        if self.state != 'closed':
+            cache.delete_many([self._key('open_until'), self._key('probe')] + list(self._window_keys()))
+            logger.info(f"Circuit '{self.name}' closed")
+
+    def record_failure(self):
+        calls_key, failures_key = self._window_keys()
+        calls = self._incr(calls_key)
+        failures = self._incr(failures_key)
+        if self.state == 'half-open' or (calls >= self.min_calls and failures / calls >= self.failure_rate):
+            self.trip()
+
+    def trip(self):
+        """Open the circuit for ``open_seconds``."""
+        cache.set(self._key('open_until'), time.time() + self.open_seconds, self.open_seconds + self.window * 2)
+        cache.delete(self._key('probe'))
+        logger.warning(f"Circuit '{self.name}' opened for {self.open_seconds}s")
+
+    def call(self, func, *args, **kwargs):
+        """Run ``func`` through the breaker, raising CircuitOpenError when it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open; skipping call")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
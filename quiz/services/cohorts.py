@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from typing import Any, Dict, List, Optional
+import pandas as pd
+
+
+def compute_cohort_retention(max_weeks: Optional[int] = None) -> int:
+    """
+    Rebuild CohortRetention: for every weekly signup cohort, the share of its
+    users active (with at least one submission) in each following week, up
+    to ``COHORT_MAX_WEEKS`` (default 12) weeks.
+
+    Two grouped queries do the heavy lifting: cohort sizes from
+    ``User.date_joined`` and distinct active users per (cohort, week) from the
+    per-user daily activity rollup. pandas pivots them into the
+    cohort x week-offset grid. Returns the number of rows written.
+    """
+    from ..models import CohortRetention, UserDailyActivity
+
+    max_weeks = max_weeks or getattr(settings, 'COHORT_MAX_WEEKS', 12)
+    cohort_week = TruncWeek('date_joined', output_field=DateField())
+    sizes = (
+        get_user_model().objects.annotate(cohort=cohort_week)
+        .values('cohort').annotate(size=Count('id')).order_by()
+    )
+    active = (
+        UserDailyActivity.objects.annotate(
+            cohort=TruncWeek('user__date_joined', output_field=DateField()),
+            week=TruncWeek('date'),
+        )
+        .values('cohort', 'week').annotate(active=Count('user_id', distinct=True)).order_by()
+    )
+
+    sizes = pd.DataFrame.from_records(list(sizes), columns=['cohort', 'size'])
+    active = pd.DataFrame.from_records(list(active), columns=['cohort', 'week', 'active'])
+    now = timezone.now()
+    if sizes.empty:
+        with transaction.atomic():
+            CohortRetention.objects.all().delete()
+        return 0
+
+    sizes['cohort'] = pd.to_datetime(sizes['cohort'])
+    active['cohort'] = pd.to_datetime(active['cohort'])
+    active['offset'] = (pd.to_datetime(active['week']) - active['cohort']).dt.days // 7
+    active = active[(active['offset'] >= 0) & (active['offset'] < max_weeks)]
+
+    grid = active.pivot_table(index='cohort', columns='offset', values='active', aggfunc='sum', fill_value=0)
+    grid = grid.reindex(index=sizes['cohort'], columns=range(max_weeks), fill_value=0)
+
+    # Only weeks that have started are observable for each cohort
+    current_week = pd.Timestamp(timezone.localdate()) - pd.Timedelta(days=timezone.localdate().weekday())
+    observable = ((current_week - grid.index).days // 7).to_numpy()
+
+    rows = []
+    for (cohort, size), active_counts, last_offset in zip(sizes.itertuples(index=False), grid.to_numpy(), observable):
+        for offset in range(min(max_weeks, last_offset + 1)):
+            rows.append(CohortRetention(
+                cohort_week=cohort.date(),
+                week_offset=offset,
+                cohort_size=int(size),
+                active_users=int(active_counts[offset]),
+                retention=float(active_counts[offset] / size),
+                computed_at=now,
+            ))
+
+    with transaction.atomic():
+        CohortRetention.objects.all().delete()
+        CohortRetention.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def get_cohort_table(cohorts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    The most recent ``COHORT_DASHBOARD_WEEKS`` (default 8) cohorts as rows of
+    retention cells for the admin dashboard, read from CohortRetention only.
+    """
+    from ..models import CohortRetention
+
+    cohorts = cohorts or getattr(settings, 'COHORT_DASHBOARD_WEEKS', 8)
+    weeks = list(
+        CohortRetention.objects.values_list('cohort_week', flat=True)
+        .distinct().order_by('-cohort_week')[:cohorts]
+    )
+    table: Dict[Any, Dict[str, Any]] = {
+        week: {'cohort_week': week, 'cohort_size': 0, 'cells': []} for week in sorted(weeks)
+    }
+    for entry in CohortRetention.objects.filter(cohort_week__in=weeks).order_by('cohort_week', 'week_offset'):
+        row = table[entry.cohort_week]
+        row['cohort_size'] = entry.cohort_size
+        row['cells'].append(entry)
+
+    rows: List[Dict[str, Any]] = list(table.values())
+    offsets = max((len(row['cells']) for row in rows), default=0)
+    return {'rows': rows, 'offsets': list(range(offsets))}
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+
+def _bounds(start: date, end: date) -> Dict[str, datetime]:
+    """Local-midnight datetimes around [start, end], so filters stay plain range lookups."""
+    return {
+        'gte': timezone.make_aware(datetime.combine(start, time.min)),
+        'lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    }
+
+
+def _per_day(queryset, date_field: str, start: date, end: date, **aggregates) -> Dict[date, dict]:
+    """Run one grouped query returning ``aggregates`` for every day in [start, end]."""
+    bounds = _bounds(start, end)
+    rows = (
+        queryset.filter(**{f"{date_field}__gte": bounds['gte'], f"{date_field}__lt": bounds['lt']})
+        .annotate(day=TruncDate(date_field))
+        .values('day')
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row['day']: row for row in rows}
+
+
+def _before(queryset, date_field: str, start: date, **aggregates) -> dict:
+    """Aggregate every row dated before ``start``: the baseline for the running totals."""
+    return queryset.filter(**{f"{date_field}__lt": _bounds(start, start)['gte']}).aggregate(**aggregates)
+
+
+def _baseline(start: date, users, quizzes, questions, submissions) -> Tuple[int, int, int, int, int]:
+    """
+    Running totals at the end of the day before ``start``. They are read from
+    that day's stored row when there is one, so incremental runs never scan
+    whole tables; otherwise everything before ``start`` is aggregated.
+    """
+    from ..models import AdminDailyMetric
+
+    previous = AdminDailyMetric.objects.filter(date=start - timedelta(days=1), score_sum__isnull=False).first()
+    if previous is not None:
+        return (previous.total_users, previous.total_quizzes, previous.total_questions,
+                previous.total_submissions, previous.score_sum)
+
+    submitted = _before(submissions, 'submitted_at', start, total=Count('pk'), score=Sum('score'))
+    return (
+        _before(users, 'date_joined', start, total=Count('pk'))['total'],
+        _before(quizzes, 'created_at', start, total=Count('pk'))['total'],
+        _before(questions, 'quiz__created_at', start, total=Count('pk'))['total'],
+        submitted['total'],
+        submitted['score'] or 0,
+    )
+
+
+def default_range() -> Tuple[Optional[date], date]:
+    """
+    Return the range an incremental run covers: from the last computed day
+    (recomputed, since it may have been partial) up to today. Without any
+    computed day, start from the earliest recorded activity. The start is
+    ``None`` when there is nothing to compute.
+    """
+    from ..models import AdminDailyMetric, Quiz, QuizSubmission
+
+    today = timezone.localdate()
+    last = AdminDailyMetric.objects.aggregate(last=Max('date'))['last']
+    if last is not None:
+        return min(last, today), today
+
+    firsts = [
+        get_user_model().objects.aggregate(first=Min('date_joined'))['first'],
+        Quiz.objects.aggregate(first=Min('created_at'))['first'],
+        QuizSubmission.objects.aggregate(first=Min('submitted_at'))['first'],
+    ]
+    firsts = [timezone.localdate(first) for first in firsts if first is not None]
+    return (min(firsts) if firsts else None), today
+
+
+def compute_daily_metrics(start: date, end: date) -> int:
+    """
+    Compute AdminDailyMetric rows for every day in [start, end] and replace
+    any existing rows in that range. Each table is read with one grouped
+    ``TruncDate`` query for the range; the running totals continue from the
+    stored row of the previous day and are accumulated in Python.
+    Questions have no creation date, so they are dated by their quiz.
+    Returns the number of days written.
+    """
+    from ..models import AdminDailyMetric, Question, Quiz, QuizSubmission
+
+    users = get_user_model().objects.all()
+    quizzes = Quiz.objects.all()
+    questions = Question.objects.all()
+    submissions = QuizSubmission.objects.all()
+
+    new_users = _per_day(users, 'date_joined', start, end, total=Count('pk'))
+    new_quizzes = _per_day(quizzes, 'created_at', start, end, total=Count('pk'))
+    new_questions = _per_day(questions, 'quiz__created_at', start, end, total=Count('pk'))
+    new_submissions = _per_day(submissions, 'submitted_at', start, end, total=Count('pk'), score=Sum('score'))
+
+    total_users, total_quizzes, total_questions, total_submissions, score_sum = _baseline(
+        start, users, quizzes, questions, submissions
+    )
+
+    metrics = []
+    day = start
+    while day <= end:
+        submitted = new_submissions.get(day, {'total': 0, 'score': 0})
+        total_users += new_users.get(day, {'total': 0})['total']
+        total_quizzes += new_quizzes.get(day, {'total': 0})['total']
+        total_questions += new_questions.get(day, {'total': 0})['total']
+        total_submissions += submitted['total']
+        score_sum += submitted['score'] or 0
+
+        metrics.append(AdminDailyMetric(
+            date=day,
+            total_users=total_users,
+            total_quizzes=total_quizzes,
+            total_questions=total_questions,
+            total_submissions=total_submissions,
+            submissions_today=submitted['total'],
+            avg_score=round(score_sum / total_submissions, 2) if total_submissions else None,
+            score_sum=score_sum,
+        ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        AdminDailyMetric.objects.filter(date__gte=start, date__lte=end).delete()
+        AdminDailyMetric.objects.bulk_create(metrics, batch_size=1000)
+    return len(metrics)
@@ -1,38 +1,59 @@
-import google.generativeai as genai
 from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
-from django.core.exceptions import ValidationError
+import json
 import logging
 import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, Tuple
+from .explanation_store import (
+    apply_stored, content_hash, explanation_cache, find_stored, forget, remember, reuse_stored_explanations,
+)
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .providers import ExplanationProvider, GenerationResult, get_shared_provider
+from .rate_limit import estimate_tokens
+from .token_ledger import (
+    BudgetExceededError, get_ledger_stats, record_usage, release_budget, request_cost, reserve_budget,
+)
 
 logger = logging.getLogger(__name__)
 
+MEDICAL_KEYWORDS = [
+    'medical', 'clinical', 'anatomy', 'physiology', 'pathology', 'pharmacology',
+    'biochemistry', 'microbiology', 'histology', 'embryology', 'genetics',
+    'cardiology', 'neurology', 'oncology', 'endocrinology', 'gastroenterology',
+    'hematology', 'immunology', 'nephrology', 'pulmonology', 'rheumatology',
+    'dermatology', 'ophthalmology', 'otolaryngology', 'urology', 'gynecology',
+    'obstetrics', 'pediatrics', 'psychiatry', 'surgery', 'radiology',
+]
+
 
 class ExplanationGenerator:
     """
-    Service class for generating AI explanations using Google's Gemini API.
+    Service class for generating AI explanations through the provider
+    selected by ``EXPLANATION_PROVIDER`` (Google's Gemini API by default).
     Handles caching, rate limiting, error handling, and cost tracking.
     """
 
-    def __init__(self):
-        self.api_key = settings.GEMINI_API_KEY
-        self.model_name = settings.GEMINI_MODEL
-        self.max_tokens = settings.GEMINI_MAX_TOKENS
-        self.temperature = settings.GEMINI_TEMPERATURE
-        self.cache_timeout = settings.EXPLANATION_CACHE_TIMEOUT
-
-        if not self.api_key:
-            raise ValidationError("GEMINI_API_KEY is not configured")
+    def __init__(self, provider: Optional[ExplanationProvider] = None, limiter=None):
+        self.max_tokens = getattr(settings, 'GEMINI_MAX_TOKENS', 1000)
+        self.temperature = getattr(settings, 'GEMINI_TEMPERATURE', 0.7)
+        self.cache_timeout = getattr(settings, 'EXPLANATION_CACHE_TIMEOUT', 86400)
 
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(self.model_name)
+        self.provider = provider or get_shared_provider()
+        self.model_name = self.provider.model_name
+        self.breaker = CircuitBreaker('gemini')
+        self.request_timeout = getattr(settings, 'GEMINI_REQUEST_TIMEOUT', 30)
+        self.error_cache_timeout = getattr(settings, 'EXPLANATION_ERROR_CACHE_TIMEOUT', 60)
+        # Optional RateLimiter every upstream call waits on, fallbacks included
+        self.limiter = limiter
 
     def generate_explanation(self, question) -> Optional[str]:
         """
         Generate an AI explanation for a question.
-        Returns the explanation text or None if generation fails.
+        Returns the explanation text or None if generation fails. Questions
+        skipped without calling the model (a recent failure, an open circuit
+        or an exhausted budget) are marked ``explanation_deferred`` so
+        callers can retry later without counting an attempt.
         """
         from ..models import Question
 
@@ -41,83 +62,311 @@ class ExplanationGenerator:
 
         # Check cache first
         cache_key = question.get_cache_key()
-        cached_explanation = cache.get(cache_key)
+        cached_explanation = explanation_cache.get(cache_key)
         if cached_explanation:
             logger.info(f"Cache hit for question {question.id}")
             return cached_explanation
 
+        # Then an explanation already generated for identical content
+        stored = find_stored([content_hash(question)])
+        if stored:
+            apply_stored(question, next(iter(stored.values())), self.cache_timeout)
+            logger.info(f"Reused stored explanation for question {question.id}")
+            return question.ai_explanation
+
+        # A recent failure for this question is returned without a new attempt
+        recent_error = cache.get(self._error_cache_key(question))
+        if recent_error:
+            question.ai_error = recent_error
+            question.explanation_deferred = True
+            return None
+
         try:
             # Generate prompt
             prompt = self._build_prompt(question)
 
             # Generate response
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                )
-            )
+            result = self._call_model(prompt, self.max_tokens)
+            explanation = self._clean_explanation(result.text)
+            cost = record_usage(self.model_name, result.prompt_tokens, result.output_tokens, question=question)
+            self._store_explanation(question, explanation, cost)
 
-            if not response or not response.text:
-                raise ValueError("Empty response from Gemini API")
+            logger.info(f"Successfully generated explanation for question {question.id}")
+            return explanation
 
-            explanation = self._clean_explanation(response.text)
+        except (CircuitOpenError, BudgetExceededError) as e:
+            # Fail fast without touching the database while the API is down or over budget
+            question.ai_error = f"Explanations are temporarily unavailable: {e}"
+            question.explanation_deferred = True
+            return None
 
-            # Update question model
-            question.ai_explanation = explanation
-            question.ai_generated_at = timezone.now()
-            question.ai_model = self.model_name
-            question.ai_error = None
+        except Exception as e:
+            error_msg = f"Failed to generate explanation: {str(e)}"
+            logger.error(error_msg)
 
-            # Estimate cost (rough approximation for Gemini 1.5 Flash)
-            # Input tokens + output tokens * rate
-            input_tokens = len(prompt.split()) * 1.3  # rough estimate
-            output_tokens = len(explanation.split()) * 1.3
-            estimated_cost = (input_tokens + output_tokens) * 0.00000015  # $0.15 per million tokens
-            question.ai_cost = estimated_cost
+            # Store error in question model, once per negative cache period
+            question.ai_error = error_msg
+            question.save(update_fields=['ai_error'])
+            cache.set(self._error_cache_key(question), error_msg, self.error_cache_timeout)
 
-            question.save()
+            return None
 
-            # Cache the result
-            cache.set(cache_key, explanation, self.cache_timeout)
+    def stream_explanation(self, question) -> Iterator[Tuple[str, str]]:
+        """
+        Generate an explanation while relaying the model's text as it arrives.
+        Yields ``('chunk', text)`` events, then ``('done', explanation)`` once
+        the explanation is stored, or ``('failed', error)``. Cached or reused
+        explanations are returned as a single ``done`` event.
+        """
+        cached_explanation = explanation_cache.get(question.get_cache_key())
+        if cached_explanation:
+            yield 'done', cached_explanation
+            return
 
-            logger.info(f"Successfully generated explanation for question {question.id}")
-            return explanation
+        stored = find_stored([content_hash(question)])
+        if stored:
+            apply_stored(question, next(iter(stored.values())), self.cache_timeout)
+            yield 'done', question.ai_explanation
+            return
+
+        recent_error = cache.get(self._error_cache_key(question))
+        if recent_error:
+            yield 'failed', recent_error
+            return
 
+        prompt = self._build_prompt(question)
+        try:
+            reservation = reserve_budget(request_cost(estimate_tokens(prompt), self.max_tokens))
+            if not self.breaker.allow():
+                release_budget(reservation)
+                raise CircuitOpenError(f"Circuit '{self.breaker.name}' is open; skipping call")
+        except (CircuitOpenError, BudgetExceededError) as e:
+            yield 'failed', f"Explanations are temporarily unavailable: {e}"
+            return
+
+        result = None
+        parts = []
+        try:
+            for item in self.provider.stream(prompt, self.max_tokens, self.temperature, timeout=self.request_timeout):
+                if isinstance(item, GenerationResult):
+                    result = item
+                else:
+                    parts.append(item)
+                    yield 'chunk', item
         except Exception as e:
+            self.breaker.record_failure()
             error_msg = f"Failed to generate explanation: {str(e)}"
             logger.error(error_msg)
-
-            # Store error in question model
             question.ai_error = error_msg
-            question.save()
+            question.save(update_fields=['ai_error'])
+            cache.set(self._error_cache_key(question), error_msg, self.error_cache_timeout)
+            yield 'failed', error_msg
+            return
+        finally:
+            # Also when the client disconnects mid-stream
+            release_budget(reservation)
+            if result is None and parts:
+                # The streamed tokens are paid for; usage is only reported at the end, so estimate it
+                record_usage(self.model_name, estimate_tokens(prompt), estimate_tokens(''.join(parts)), question=question)
+                logger.warning(f"Stream for question {question.id} ended early; recorded estimated usage")
+        self.breaker.record_success()
+
+        explanation = self._clean_explanation(result.text)
+        cost = record_usage(self.model_name, result.prompt_tokens, result.output_tokens, question=question)
+        self._store_explanation(question, explanation, cost)
+        logger.info(f"Successfully streamed explanation for question {question.id}")
+        yield 'done', explanation
+
+    def _call_model(self, prompt: str, max_output_tokens: int, json_output: bool = False) -> GenerationResult:
+        """
+        Call the provider through the circuit breaker with a bounded request
+        timeout, holding the call's worst-case cost against the budget meanwhile.
+        With a limiter, each call waits for its own request and token
+        reservation, which is settled against the reported usage.
+        """
+        reservation = reserve_budget(request_cost(estimate_tokens(prompt), max_output_tokens))
+        reserved = estimate_tokens(prompt) + max_output_tokens
+
+        def send():
+            # Only reserve once the breaker lets the call through
+            if self.limiter is not None:
+                self.limiter.acquire(reserved)
+            return self.provider.generate(
+                prompt,
+                max_output_tokens=max_output_tokens,
+                temperature=self.temperature,
+                json_output=json_output,
+                timeout=self.request_timeout,
+            )
 
-            return None
+        try:
+            result = self.breaker.call(send)
+        finally:
+            # The caller records the actual cost right after
+            release_budget(reservation)
+        if self.limiter is not None:
+            self.limiter.settle(reserved, result.prompt_tokens + result.output_tokens)
+        return result
+
+    def _error_cache_key(self, question) -> str:
+        return f"question_explanation_error_{question.id}"
+
+    def generate_explanations(self, questions) -> Dict[int, Optional[str]]:
+        """
+        Generate explanations for several questions with one packed request:
+        the instructions are sent once and the model answers with a JSON
+        object keyed by question id. Questions missing from the answer, or
+        all of them when the request fails or the answer can't be parsed,
+        fall back to one request each. Content already explained is reused
+        and duplicated content is only sent once. Returns explanations by
+        question id.
+        """
+        results: Dict[int, Optional[str]] = {}
+        uncached = []
+        for question in questions:
+            cached_explanation = explanation_cache.get(question.get_cache_key())
+            if cached_explanation:
+                results[question.id] = cached_explanation
+            else:
+                uncached.append(question)
+
+        pending, reused = reuse_stored_explanations(uncached, self.cache_timeout)
+        for question in reused:
+            results[question.id] = question.ai_explanation
+        # Questions that failed recently are skipped until their negative cache entry expires
+        deferred = {question.id for question in pending if cache.get(self._error_cache_key(question))}
+        for question in pending:
+            if question.id in deferred:
+                question.explanation_deferred = True
+        pending = [question for question in pending if question.id not in deferred]
+
+        if len(pending) > 1:
+            prompt = self._build_packed_prompt(pending)
+            explanations = {}
+            try:
+                result = self._call_model(prompt, self.max_tokens * len(pending), json_output=True)
+            except (CircuitOpenError, BudgetExceededError):
+                result = None
+            except Exception as e:
+                logger.warning(f"Packed generation failed, falling back to single requests: {e}")
+                result = None
+
+            if result is not None:
+                try:
+                    explanations = self._parse_packed_response(result.text, [question.id for question in pending])
+                except ValueError as e:
+                    logger.warning(f"Unparsable packed response, falling back to single requests: {e}")
+                # The tokens are paid for even when the answer is unusable
+                cost = record_usage(
+                    self.model_name, result.prompt_tokens, result.output_tokens, questions=len(explanations)
+                )
+                # The cost is split evenly between the questions answered
+                for question in pending:
+                    if question.id in explanations:
+                        self._store_explanation(question, explanations[question.id], cost / len(explanations))
+                        results[question.id] = explanations[question.id]
+            logger.info(f"Packed request explained {len(explanations)} of {len(pending)} questions")
+
+        for question in pending:
+            if question.id not in results:
+                results[question.id] = self.generate_explanation(question)
+
+        # Copies of the content generated above
+        duplicates = [question for question in uncached if question.id not in results]
+        _, filled = reuse_stored_explanations(duplicates, self.cache_timeout)
+        for question in filled:
+            results[question.id] = question.ai_explanation
+        for question in duplicates:
+            results.setdefault(question.id, None)
+        return results
+
+    def _store_explanation(self, question, explanation: str, cost: float):
+        """Save a generated explanation with its share of the call's cost and cache it."""
+        question.ai_explanation = explanation
+        question.ai_generated_at = timezone.now()
+        question.ai_model = self.model_name
+        question.ai_error = None
+        question.ai_cost = round(cost, 6)
+        question.save()
+
+        explanation_cache.set(question.get_cache_key(), explanation, self.cache_timeout)
+        remember(question, explanation, self.model_name)
+
+    def _format_choices(self, question):
+        """Return the lettered options and the correct letter for a question."""
+        choices = list(question.choice_set.all())
+        choices_text = "\n".join(f"{chr(65 + i)}. {choice.text}" for i, choice in enumerate(choices))
+        correct = [i for i, choice in enumerate(choices) if choice.is_correct]
+        return choices_text, chr(65 + correct[0]) if correct else "Unknown"
+
+    def _is_medical(self, question) -> bool:
+        """Check if this appears to be a medical question."""
+        question_text_lower = question.text.lower()
+        return any(keyword in question_text_lower for keyword in MEDICAL_KEYWORDS)
+
+    def _build_packed_prompt(self, questions) -> str:
+        """
+        Build one prompt explaining several questions, asking for a JSON
+        object that maps each question id to its explanation.
+        """
+        if any(self._is_medical(question) for question in questions):
+            intro = ("You are an expert medical educator creating explanations for MDCAT "
+                     "(Medical and Dental College Admission Test) questions.")
+            focus = ("1. Key medical concepts and principles\n2. Clinical reasoning\n"
+                     "3. Why incorrect options are wrong (common misconceptions)\n"
+                     "4. Relevant anatomical/physiological facts")
+        else:
+            intro = "You are an expert educator creating explanations for quiz questions."
+            focus = ("1. Key concepts and principles\n2. Logical reasoning\n"
+                     "3. Why incorrect options are wrong (common misconceptions)\n"
+                     "4. Relevant facts and context")
+
+        blocks = []
+        for question in questions:
+            choices_text, correct_answer = self._format_choices(question)
+            blocks.append(
+                f"Question ID: {question.id}\nQuestion: {question.text}\n\n"
+                f"Options:\n{choices_text}\n\nCorrect Answer: {correct_answer}"
+            )
+        questions_text = "\n\n---\n\n".join(blocks)
+
+        return f"""{intro}
+
+For each question below, provide a clear, concise, and accurate explanation for why the correct answer is right and why the other options are incorrect. Focus on:
+
+{focus}
+
+Keep each explanation educational and helpful for students.
+
+{questions_text}
+
+Respond with only a JSON object whose keys are the question IDs (as strings) and whose values are the explanations, e.g. {{"12": "explanation for question 12"}}."""
+
+    def _parse_packed_response(self, text: str, question_ids) -> Dict[int, str]:
+        """
+        Split a packed JSON response into explanations by question id,
+        ignoring unknown ids and empty answers. Raises ValueError when the
+        response is not a JSON object.
+        """
+        data = json.loads(re.sub(r'```\w*\n?', '', text).strip())
+        if not isinstance(data, dict):
+            raise ValueError("Packed response is not a JSON object")
+
+        wanted = {str(question_id): question_id for question_id in question_ids}
+        explanations = {}
+        for key, value in data.items():
+            key = str(key).strip()
+            if key in wanted and isinstance(value, str) and value.strip():
+                explanations[wanted[key]] = self._clean_explanation(value)
+        return explanations
 
     def _build_prompt(self, question) -> str:
         """
         Build the prompt for the AI model based on the question.
         """
-        choices_text = "\n".join([
-            f"{chr(65 + i)}. {choice.text}"
-            for i, choice in enumerate(question.choice_set.all())
-        ])
-
-        correct_choice = question.choice_set.filter(is_correct=True).first()
-        correct_answer = chr(65 + list(question.choice_set.all()).index(correct_choice)) if correct_choice else "Unknown"
-
-        # Check if this appears to be a medical question
-        medical_keywords = ['medical', 'clinical', 'anatomy', 'physiology', 'pathology', 'pharmacology', 
-                           'biochemistry', 'microbiology', 'histology', 'embryology', 'genetics',
-                           'cardiology', 'neurology', 'oncology', 'endocrinology', 'gastroenterology',
-                           'hematology', 'immunology', 'nephrology', 'pulmonology', 'rheumatology',
-                           'dermatology', 'ophthalmology', 'otolaryngology', 'urology', 'gynecology',
-                           'obstetrics', 'pediatrics', 'psychiatry', 'surgery', 'radiology']
-        
-        question_text_lower = question.text.lower()
-        is_medical = any(keyword in question_text_lower for keyword in medical_keywords)
-        
+        choices_text, correct_answer = self._format_choices(question)
+        is_medical = self._is_medical(question)
+
         if is_medical:
             prompt = f"""
 You are an expert medical educator creating explanations for MDCAT (Medical and Dental College Admission Test) questions.
@@ -178,39 +427,25 @@ Explanation:
 
     def get_generation_stats(self) -> Dict[str, Any]:
         """
-        Get statistics about explanation generation.
+        Get statistics about explanation generation from the token ledger's
+        running counters, without scanning the question table.
         """
-        from ..models import Question
-        from django.db.models import Count, Sum, Avg, Q
-
-        stats = Question.objects.aggregate(
-            total_questions=Count('id'),
-            ai_generated=Count('ai_explanation', filter=~Q(ai_explanation='')),
-            total_cost=Sum('ai_cost'),
-            avg_cost=Avg('ai_cost'),
-        )
-
-        return {
-            'total_questions': stats['total_questions'],
-            'ai_generated_count': stats['ai_generated'],
-            'total_cost': float(stats['total_cost'] or 0),
-            'average_cost': float(stats['avg_cost'] or 0),
-            'cache_timeout': self.cache_timeout,
-        }
+        return get_ledger_stats(self.cache_timeout)
 
     def clear_cache_for_question(self, question):
         """
         Clear cache for a specific question.
         """
-        cache_key = question.get_cache_key()
-        cache.delete(cache_key)
+        explanation_cache.delete(question.get_cache_key())
+        cache.delete(self._error_cache_key(question))
 
     def regenerate_explanation(self, question) -> Optional[str]:
         """
         Force regenerate explanation, clearing cache and existing data.
         """
-        # Clear cache
+        # Clear cache and the explanation stored for this content
         self.clear_cache_for_question(question)
+        forget(question)
 
         # Clear existing AI data
         question.ai_explanation = None
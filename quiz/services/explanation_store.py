@@ -0,0 +1,90 @@
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+from typing import Dict, Iterable, List, Tuple
+import hashlib
+import re
+
+# Explanation texts by ``Question.get_cache_key()``, kept apart from the
+# coordination keys in the default cache
+explanation_cache = ConnectionProxy(caches, 'explanations')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase ``text`` and collapse whitespace so cosmetic edits hash alike."""
+    return re.sub(r'\s+', ' ', (text or '')).strip().lower()
+
+
+def content_hash(question) -> str:
+    """
+    SHA-256 of a question's normalized text, its choices in display order and
+    which of them is correct. Explanations refer to options by letter, so
+    the same choices in another order are different content.
+    """
+    choices = sorted(question.choice_set.all(), key=lambda choice: choice.id)
+    parts = [normalize_text(question.text)]
+    parts.extend(f"{'*' if choice.is_correct else '-'}{normalize_text(choice.text)}" for choice in choices)
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def find_stored(hashes: Iterable[str]) -> Dict[str, 'SharedExplanation']:
+    """Stored explanations for the given content hashes, in one query."""
+    from ..models import SharedExplanation
+
+    return {stored.content_hash: stored for stored in SharedExplanation.objects.filter(content_hash__in=set(hashes))}
+
+
+def apply_stored(question, stored, cache_timeout=None):
+    """Copy a stored explanation onto ``question``; reuse is free, so no cost is recorded."""
+    from ..models import SharedExplanation
+
+    question.ai_explanation = stored.explanation
+    question.ai_generated_at = timezone.now()
+    question.ai_model = stored.ai_model
+    question.ai_cost = 0
+    question.ai_error = None
+    question.save()
+    SharedExplanation.objects.filter(pk=stored.pk).update(reuse_count=F('reuse_count') + 1)
+    explanation_cache.set(question.get_cache_key(), stored.explanation, cache_timeout)
+
+
+def remember(question, explanation: str, ai_model: str):
+    """Store a freshly generated explanation under the question's content hash."""
+    from ..models import SharedExplanation
+
+    SharedExplanation.objects.update_or_create(
+        content_hash=content_hash(question),
+        defaults={'explanation': explanation, 'ai_model': ai_model, 'generated_at': timezone.now()},
+    )
+
+
+def forget(question):
+    """Drop the stored explanation for a question's content, so it is generated afresh."""
+    from ..models import SharedExplanation
+
+    SharedExplanation.objects.filter(content_hash=content_hash(question)).delete()
+
+
+def reuse_stored_explanations(questions, cache_timeout=None) -> Tuple[List, List]:
+    """
+    Fill in every question whose content was already explained and keep one
+    question per remaining content hash, so duplicates are generated once.
+    Returns ``(questions_to_generate, reused_questions)``; run it again after
+    generating to copy the new explanations onto the skipped duplicates.
+    """
+    by_hash: Dict[str, list] = {}
+    for question in questions:
+        by_hash.setdefault(content_hash(question), []).append(question)
+
+    stored = find_stored(by_hash)
+    to_generate = []
+    reused = []
+    for digest, copies in by_hash.items():
+        if digest in stored:
+            for question in copies:
+                apply_stored(question, stored[digest], cache_timeout)
+            reused.extend(copies)
+        else:
+            to_generate.append(copies[0])
+    return to_generate, reused
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models import Count, Max, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from typing import Any, Dict, Optional
+import numpy as np
+
+
+def quizzes_needing_analysis(force: bool = False):
+    """
+    Quizzes with submissions that changed since their last analysis: a newer
+    submission or a different submission count (some were deleted).
+    """
+    from ..models import Quiz
+
+    quizzes = (
+        Quiz.objects.annotate(latest_submission=Max('quizsubmission__id'), submission_count=Count('quizsubmission'))
+        .filter(latest_submission__isnull=False)
+    )
+    if force:
+        return quizzes
+    # Quizzes never analyzed have no watermark; -1 never matches a real value
+    return quizzes.exclude(
+        latest_submission=Coalesce('item_analysis__last_submission_id', Value(-1)),
+        submission_count=Coalesce('item_analysis__submission_count', Value(-1)),
+    )
+
+
+def _nullable(values: np.ndarray) -> list:
+    """Convert a float array to a list with NaN mapped to ``None``."""
+    return [None if np.isnan(value) else float(value) for value in values]
+
+
+def analyze_matrix(matrix: np.ndarray) -> Dict[str, Any]:
+    """
+    Item statistics for a 0/1 ``attempts x questions`` response matrix:
+    difficulty is the proportion correct, discrimination the point-biserial
+    correlation between an item and the rest score (total minus the item),
+    and reliability is KR-20. Undefined values (no variance) are NaN/None.
+    """
+    attempts, items = matrix.shape
+    if not attempts:
+        empty = np.full(items, np.nan)
+        return {'difficulty': empty, 'discrimination': empty, 'kr20': None}
+
+    x = matrix.astype(np.float64)
+    totals = x.sum(axis=1)
+    difficulty = x.mean(axis=0)
+
+    rest = totals[:, None] - x
+    x_centered = x - x.mean(axis=0)
+    rest_centered = rest - rest.mean(axis=0)
+    covariance = (x_centered * rest_centered).sum(axis=0)
+    spread = np.sqrt((x_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        discrimination = np.where(spread > 0, covariance / spread, np.nan)
+
+    kr20 = None
+    total_variance = totals.var()
+    if items > 1 and total_variance > 0:
+        kr20 = float(items / (items - 1) * (1 - (difficulty * (1 - difficulty)).sum() / total_variance))
+
+    return {'difficulty': difficulty, 'discrimination': discrimination, 'kr20': kr20}
+
+
+def answer_matrix(quiz):
+    """
+    Load a quiz's stored answers into a dense 0/1 matrix with one row per
+    answered submission and one column per question (unanswered counts as
+    wrong). Returns ``(question_ids, matrix)``.
+    """
+    from ..models import Question, SubmissionAnswer
+
+    question_ids = np.array(
+        list(Question.objects.filter(quiz=quiz).order_by('id').values_list('id', flat=True)), dtype=np.int64
+    )
+    rows = (
+        SubmissionAnswer.objects.filter(submission__quiz=quiz, question__quiz=quiz)
+        .values_list('submission_id', 'question_id', 'is_correct')
+        .order_by()
+    )
+    answers = np.array(list(rows.iterator(chunk_size=10000)), dtype=np.int64).reshape(-1, 3)
+
+    submissions, row_index = np.unique(answers[:, 0], return_inverse=True)
+    matrix = np.zeros((len(submissions), len(question_ids)), dtype=np.int8)
+    matrix[row_index.reshape(-1), np.searchsorted(question_ids, answers[:, 1])] = answers[:, 2]
+    return question_ids, matrix
+
+
+def analyze_quiz(quiz, latest_submission: Optional[int] = None, submission_count: Optional[int] = None) -> Dict[str, Any]:
+    """Compute and store item statistics for one quiz, replacing its previous results."""
+    from ..models import QuestionItemAnalysis, QuizItemAnalysis
+
+    question_ids, matrix = answer_matrix(quiz)
+    stats = analyze_matrix(matrix)
+    now = timezone.now()
+    attempts = matrix.shape[0]
+
+    with transaction.atomic():
+        QuestionItemAnalysis.objects.filter(question__quiz=quiz).delete()
+        QuestionItemAnalysis.objects.bulk_create([
+            QuestionItemAnalysis(
+                question_id=int(question_id), attempts=attempts, difficulty=difficulty,
+                discrimination=discrimination, computed_at=now,
+            )
+            for question_id, difficulty, discrimination in zip(
+                question_ids, _nullable(stats['difficulty']), _nullable(stats['discrimination'])
+            )
+        ])
+        QuizItemAnalysis.objects.update_or_create(quiz=quiz, defaults={
+            'attempts': attempts,
+            'kr20': stats['kr20'],
+            'last_submission_id': latest_submission or 0,
+            'submission_count': submission_count or 0,
+            'computed_at': now,
+        })
+    return {'attempts': attempts, 'questions': len(question_ids), 'kr20': stats['kr20']}
+
+
+def analyze_items(force: bool = False) -> Dict[int, Dict[str, Any]]:
+    """Analyze every quiz with new submissions (or all quizzes when ``force``)."""
+    return {
+        quiz.id: analyze_quiz(quiz, quiz.latest_submission, quiz.submission_count)
+        for quiz in quizzes_needing_analysis(force)
+    }
@@ -0,0 +1,429 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, DenseRank, Greatest, Rank
+from django.utils import timezone
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+import logging
+
+from .aggregates import upsert_increment
+from .quiz_stats import move_best_score
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_WINDOWS = ('all', 'month', 'week')
+GLOBAL_LEADERBOARD = 'global'
+TIE_POLICIES = {'competition': 'RANK', 'dense': 'DENSE_RANK'}
+UPSERT_VENDORS = ('sqlite', 'postgresql')
+SCORING_COLUMNS = {'best': 'best_score', 'latest': 'latest_score', 'sum': 'total_score'}
+
+
+def get_scoring_policy() -> str:
+    """
+    Return the configured scoring policy: ``best`` counts each user's best
+    attempt per quiz, ``latest`` their most recent attempt and ``sum`` every attempt.
+    """
+    policy = getattr(settings, 'LEADERBOARD_SCORING', 'best')
+    if policy not in SCORING_COLUMNS:
+        raise ValueError(f"Unknown leaderboard scoring policy: {policy}")
+    return policy
+
+
+def record_submission(submission) -> None:
+    """
+    Fold a new submission into the per-(user, quiz) aggregate and the
+    per-user, per-day rollups by category and by quiz, and refresh the
+    user's total.
+    """
+    from ..models import DailyCategoryScore, DailyQuizScore, UserQuizScore, UserRank
+
+    submitted_at = submission.submitted_at or timezone.now()
+    date = timezone.localdate(submitted_at)
+    upsert_increment(
+        DailyCategoryScore,
+        {'user_id': submission.user_id, 'category_id': submission.quiz.category_id, 'date': date},
+        {'attempts': 1, 'total_score': submission.score},
+    )
+    upsert_increment(
+        DailyQuizScore,
+        {'user_id': submission.user_id, 'quiz_id': submission.quiz_id, 'date': date},
+        {'attempts': 1},
+        defaults={'best_score': submission.score, 'latest_score': submission.score},
+        expressions={'best_score': Greatest('best_score', Value(submission.score))},
+    )
+
+    quiz_lookup = {'user_id': submission.user_id, 'quiz_id': submission.quiz_id}
+    with transaction.atomic():
+        # Lock the aggregate row so the quiz histogram sees a consistent previous best
+        previous_best = (
+            UserQuizScore.objects.select_for_update().filter(**quiz_lookup)
+            .values_list('best_score', flat=True).first()
+        )
+        upsert_increment(
+            UserQuizScore,
+            quiz_lookup,
+            {'attempts': 1, 'total_score': submission.score},
+            defaults={
+                'best_score': submission.score,
+                'latest_score': submission.score,
+                'last_submitted_at': submitted_at,
+            },
+            expressions={'best_score': Greatest('best_score', Value(submission.score))},
+        )
+        new_best = submission.score if previous_best is None else max(previous_best, submission.score)
+        move_best_score(submission.quiz_id, previous_best, new_best)
+
+    # Keep the running total live; the rank itself is refreshed by the worker
+    refresh_user_total(submission.user_id)
+
+
+def resync_submission(user_id: int, quiz_id: int, category_id: int, submitted_at) -> None:
+    """
+    Recompute the aggregates a deleted or edited submission contributed to
+    from the remaining submissions. Rows left without submissions are removed.
+    """
+    from ..models import DailyCategoryScore, DailyQuizScore, QuizSubmission, UserQuizScore
+
+    date = timezone.localdate(submitted_at)
+    user_submissions = QuizSubmission.objects.filter(user_id=user_id)
+
+    quiz_rows = user_submissions.filter(quiz_id=quiz_id)
+    quiz_stats = quiz_rows.aggregate(
+        attempts=Count('id'), best_score=Max('score'), total_score=Sum('score'),
+        last_submitted_at=Max('submitted_at'),
+    )
+    quiz_lookup = {'user_id': user_id, 'quiz_id': quiz_id}
+    with transaction.atomic():
+        previous_best = (
+            UserQuizScore.objects.select_for_update().filter(**quiz_lookup)
+            .values_list('best_score', flat=True).first()
+        )
+        if quiz_stats['attempts']:
+            quiz_stats['latest_score'] = quiz_rows.order_by('-submitted_at', '-id').values_list('score', flat=True)[0]
+            UserQuizScore.objects.update_or_create(**quiz_lookup, defaults=quiz_stats)
+        else:
+            UserQuizScore.objects.filter(**quiz_lookup).delete()
+        move_best_score(quiz_id, previous_best, quiz_stats['best_score'])
+
+    day_rows = user_submissions.filter(quiz__category_id=category_id, submitted_at__date=date)
+    day_stats = day_rows.aggregate(attempts=Count('id'), total_score=Sum('score'))
+    day_lookup = {'user_id': user_id, 'category_id': category_id, 'date': date}
+    if day_stats['attempts']:
+        DailyCategoryScore.objects.update_or_create(**day_lookup, defaults=day_stats)
+    else:
+        DailyCategoryScore.objects.filter(**day_lookup).delete()
+
+    quiz_day_rows = quiz_rows.filter(submitted_at__date=date)
+    quiz_day_stats = quiz_day_rows.aggregate(attempts=Count('id'), best_score=Max('score'))
+    quiz_day_lookup = {'user_id': user_id, 'quiz_id': quiz_id, 'date': date}
+    if quiz_day_stats['attempts']:
+        quiz_day_stats['latest_score'] = (
+            quiz_day_rows.order_by('-submitted_at', '-id').values_list('score', flat=True)[0]
+        )
+        DailyQuizScore.objects.update_or_create(**quiz_day_lookup, defaults=quiz_day_stats)
+    else:
+        DailyQuizScore.objects.filter(**quiz_day_lookup).delete()
+
+    refresh_user_total(user_id)
+
+
+def refresh_user_total(user_id: int) -> None:
+    """
+    Write a user's leaderboard total under the active scoring policy. This sums
+    at most one aggregate row per quiz, never the raw submissions.
+    """
+    from ..models import UserQuizScore, UserRank
+
+    column = SCORING_COLUMNS[get_scoring_policy()]
+    total = UserQuizScore.objects.filter(user_id=user_id).aggregate(total=Sum(column))['total']
+    if total is None:
+        UserRank.objects.filter(user_id=user_id).delete()
+        return
+    upsert_increment(UserRank, {'user_id': user_id}, {}, defaults={'total_score': total})
+
+
+def get_leaderboard_queryset():
+    """
+    All-time ranks with everything the leaderboard template touches: the user
+    and profile are joined in, and the quiz count is a correlated subquery so it
+    is only evaluated for the rows actually fetched (one page).
+    """
+    from ..models import UserQuizScore, UserRank
+
+    quiz_count = (
+        UserQuizScore.objects.filter(user_id=OuterRef('user_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(count=Sum('attempts'))
+        .values('count')
+    )
+    return (
+        UserRank.objects.select_related('user__profile')
+        .annotate(quiz_count=Coalesce(Subquery(quiz_count), 0))
+        .order_by(F('rank').asc(nulls_last=True), 'user_id')
+    )
+
+
+def get_rank_neighbourhood(user, radius: Optional[int] = None):
+    """
+    Return ``(user_rank, neighbours)`` for the "you are here" panel, where the
+    neighbours are the entries within ``radius`` places of the user.
+    """
+    from ..models import UserRank
+
+    if radius is None:
+        radius = getattr(settings, 'LEADERBOARD_AROUND_ME', 2)
+
+    user_rank = UserRank.objects.filter(user=user).first()
+    if user_rank is None or user_rank.rank is None:
+        return user_rank, []
+
+    neighbours = get_leaderboard_queryset().filter(
+        rank__gte=user_rank.rank - radius, rank__lte=user_rank.rank + radius
+    )
+    return user_rank, list(neighbours)
+
+
+def window_start(window: str):
+    """
+    Return the first date covered by a leaderboard window, or None for all time.
+    Weeks start on Monday and months on the first, in the site's time zone.
+    """
+    if window not in LEADERBOARD_WINDOWS:
+        raise ValueError(f"Unknown leaderboard window: {window}")
+
+    today = timezone.localdate()
+    if window == 'week':
+        return today - timedelta(days=today.weekday())
+    if window == 'month':
+        return today.replace(day=1)
+    return None
+
+
+def get_windowed_leaderboard(window: str = 'all', category_id: Optional[int] = None,
+                             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Rank users by score over a time window and/or category under the active
+    scoring policy. Only attempts made within the window count: ``sum`` adds
+    up the daily category rollups, while ``best`` and ``latest`` take one
+    daily quiz rollup per quiz (the best day, or the most recent one) so a
+    quick retake of an old quiz earns only what it scored. Each entry is a
+    dict with ``rank``, ``user``, ``total_score`` and ``quiz_count``.
+    """
+    from ..models import DailyCategoryScore, DailyQuizScore
+
+    if limit is None:
+        limit = getattr(settings, 'LEADERBOARD_WINDOW_SIZE', 100)
+
+    policy = get_scoring_policy()
+    start = window_start(window)
+    if policy == 'sum':
+        rows = DailyCategoryScore.objects.all()
+        if start is not None:
+            rows = rows.filter(date__gte=start)
+        if category_id is not None:
+            rows = rows.filter(category_id=category_id)
+    else:
+        days = DailyQuizScore.objects.all()
+        if start is not None:
+            days = days.filter(date__gte=start)
+        same_quiz = days.filter(user_id=OuterRef('user_id'), quiz_id=OuterRef('quiz_id'))
+        if policy == 'best':
+            # Ties on the best score go to the later day so exactly one row is kept
+            beaten = Q(best_score__gt=OuterRef('best_score')) | Q(
+                best_score=OuterRef('best_score'), date__gt=OuterRef('date')
+            )
+            chosen = ~Exists(same_quiz.filter(beaten))
+        else:
+            chosen = ~Exists(same_quiz.filter(date__gt=OuterRef('date')))
+        window_attempts = same_quiz.order_by().values('quiz_id').annotate(count=Sum('attempts')).values('count')
+        rows = days.filter(chosen).annotate(attempts_in_window=Subquery(window_attempts))
+        if category_id is not None:
+            rows = rows.filter(quiz__category_id=category_id)
+
+    rank_function = Rank if get_tie_policy() == 'competition' else DenseRank
+    totals = list(
+        rows.values('user_id')
+        .annotate(
+            total_score=Sum(SCORING_COLUMNS[policy]),
+            quiz_count=Sum('attempts' if policy == 'sum' else 'attempts_in_window'),
+        )
+        .annotate(rank=Window(rank_function(), order_by=F('total_score').desc()))
+        .order_by('-total_score', 'user_id')[:limit]
+    )
+    users = User.objects.select_related('profile').in_bulk([row['user_id'] for row in totals])
+
+    return [
+        {
+            'rank': row['rank'],
+            'user': users[row['user_id']],
+            'total_score': row['total_score'],
+            'quiz_count': row['quiz_count'],
+        }
+        for row in totals
+        if row['user_id'] in users
+    ]
+
+
+def mark_leaderboard_dirty(name: str = GLOBAL_LEADERBOARD) -> None:
+    """
+    Flag a leaderboard for rebuild. This is a single UPDATE so it is cheap enough
+    to call from request-path signals; bursts collapse onto the same flag.
+    """
+    from ..models import LeaderboardState
+
+    now = timezone.now()
+    if not LeaderboardState.objects.filter(name=name, dirty_at__isnull=True).update(dirty_at=now):
+        LeaderboardState.objects.get_or_create(name=name, defaults={'dirty_at': now})
+
+
+def get_tie_policy() -> str:
+    """
+    Return the configured tie policy: ``competition`` ranks ties equally and
+    skips the following places (1, 2, 2, 4); ``dense`` does not skip (1, 2, 2, 3).
+    """
+    policy = getattr(settings, 'LEADERBOARD_TIE_POLICY', 'competition')
+    if policy not in TIE_POLICIES:
+        raise ValueError(f"Unknown leaderboard tie policy: {policy}")
+    return policy
+
+
+def _score_totals_sql():
+    """SQL and params yielding one ``(user_id, total)`` row per ranked user."""
+    from ..models import UserQuizScore
+
+    scores = UserQuizScore._meta.db_table
+    column = SCORING_COLUMNS[get_scoring_policy()]
+    return f"SELECT user_id, SUM({column}) AS total FROM {scores} GROUP BY user_id", []
+
+
+def rebuild_leaderboard() -> int:
+    """
+    Recompute every UserRank from the score totals. Ranks are assigned by a
+    RANK()/DENSE_RANK() window function and upserted in a single statement,
+    then users without any score are dropped. Returns the number of rows written.
+    """
+    from ..models import UserRank
+
+    if connection.vendor not in UPSERT_VENDORS:
+        return _rebuild_leaderboard_bulk()
+
+    rank_function = TIE_POLICIES[get_tie_policy()]
+    ranks = UserRank._meta.db_table
+    totals_sql, params = _score_totals_sql()
+
+    # "WHERE 1 = 1" disambiguates INSERT ... SELECT ... ON CONFLICT for SQLite
+    upsert_sql = f"""
+        INSERT INTO {ranks} (user_id, total_score, rank)
+        SELECT user_id, total, {rank_function}() OVER (ORDER BY total DESC)
+        FROM ({totals_sql}) AS totals
+        WHERE 1 = 1
+        ON CONFLICT (user_id) DO UPDATE
+        SET total_score = excluded.total_score, rank = excluded.rank
+    """
+    delete_sql = f"DELETE FROM {ranks} WHERE user_id NOT IN (SELECT user_id FROM ({totals_sql}) AS totals)"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(upsert_sql, params)
+        written = cursor.rowcount
+        cursor.execute(delete_sql, params)
+
+    return written
+
+
+def _rebuild_leaderboard_bulk() -> int:
+    """
+    Fallback for databases without INSERT ... ON CONFLICT: rank with the same
+    window function through the ORM and write the results with bulk operations.
+    """
+    from ..models import UserQuizScore, UserRank
+
+    rank_function = Rank if get_tie_policy() == 'competition' else DenseRank
+    ranked = (
+        UserQuizScore.objects.values('user_id')
+        .annotate(total=Sum(SCORING_COLUMNS[get_scoring_policy()]))
+        .annotate(position=Window(rank_function(), order_by=F('total').desc()))
+    )
+    scores = {row['user_id']: (row['position'], row['total']) for row in ranked}
+
+    with transaction.atomic():
+        existing = {rank.user_id: rank for rank in UserRank.objects.all()}
+
+        changed = []
+        for user_id, rank in existing.items():
+            if user_id not in scores:
+                continue
+            position, total = scores[user_id]
+            if rank.rank != position or rank.total_score != total:
+                rank.rank, rank.total_score = position, total
+                changed.append(rank)
+        UserRank.objects.bulk_update(changed, ['rank', 'total_score'], batch_size=1000)
+
+        UserRank.objects.bulk_create(
+            [
+                UserRank(user_id=user_id, rank=position, total_score=total)
+                for user_id, (position, total) in scores.items()
+                if user_id not in existing
+            ],
+            batch_size=1000,
+        )
+        UserRank.objects.filter(~Exists(UserQuizScore.objects.filter(user_id=OuterRef('user_id')))).delete()
+
+    return len(scores)
+
+
+def rebuild_if_due(interval: float, name: str = GLOBAL_LEADERBOARD) -> bool:
+    """
+    Rebuild the leaderboard when it is dirty and the last rebuild is at least
+    ``interval`` seconds old. The flag is claimed before rebuilding, so marks
+    arriving during the rebuild schedule the next one instead of being lost.
+    """
+    from ..models import LeaderboardState
+
+    state = LeaderboardState.objects.filter(name=name).first()
+    if state is None or state.dirty_at is None:
+        return False
+
+    now = timezone.now()
+    if state.rebuilt_at and (now - state.rebuilt_at).total_seconds() < interval:
+        return False
+
+    claimed = LeaderboardState.objects.filter(pk=state.pk, dirty_at=state.dirty_at).update(dirty_at=None)
+    if not claimed:
+        return False
+
+    try:
+        ranked = rebuild_leaderboard()
+    except Exception:
+        # Put the flag back so the next poll retries
+        mark_leaderboard_dirty(name)
+        raise
+
+    LeaderboardState.objects.filter(pk=state.pk).update(rebuilt_at=now)
+    logger.info(f"Rebuilt leaderboard '{name}' for {ranked} users")
+    return True
+
+
+def rebuild_if_unattended(name: str = GLOBAL_LEADERBOARD) -> bool:
+    """
+    Fallback for deployments that do not run ``run_leaderboard_worker``:
+    rebuild from the request once the board has been dirty for
+    ``LEADERBOARD_FALLBACK_AFTER`` seconds (default twice the rebuild
+    interval), longer than a running worker would leave it. A failed
+    rebuild is logged rather than breaking the page.
+    """
+    from ..models import LeaderboardState
+
+    interval = getattr(settings, 'LEADERBOARD_REBUILD_INTERVAL', 30.0)
+    after = getattr(settings, 'LEADERBOARD_FALLBACK_AFTER', 2 * interval)
+    dirty_at = LeaderboardState.objects.filter(name=name).values_list('dirty_at', flat=True).first()
+    if dirty_at is None or (timezone.now() - dirty_at).total_seconds() < after:
+        return False
+
+    try:
+        return rebuild_if_due(interval, name)
+    except Exception as e:
+        logger.error(f"Fallback leaderboard rebuild failed: {e}")
+        return False
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from typing import Any, Dict, Optional
+
+from .aggregates import upsert_increment
+
+METRICS_CACHE_KEY = 'site_metrics_snapshot'
+
+# Counter name -> date field used for the per-day counter (None: no stored date)
+COUNTERS = {
+    'users': 'date_joined',
+    'quizzes': 'created_at',
+    'questions': None,
+    'submissions': 'submitted_at',
+}
+SCORE_SUM = 'submission_score_sum'
+
+
+def counter_for(instance) -> Optional[str]:
+    """Return the counter name tracking ``instance``'s model, if any."""
+    from django.contrib.auth.models import User
+    from ..models import Question, Quiz, QuizSubmission
+
+    return {
+        User: 'users',
+        Quiz: 'quizzes',
+        Question: 'questions',
+        QuizSubmission: 'submissions',
+    }.get(type(instance))
+
+
+def daily_counter(name: str, date) -> str:
+    """Name of the counter holding the rows of ``name`` created on ``date``."""
+    return f"{name}:{date.isoformat()}"
+
+
+def increment_counter(name: str, amount: int) -> None:
+    from ..models import SiteCounter
+
+    upsert_increment(SiteCounter, {'name': name}, {'value': amount})
+
+
+def count_instance(instance, amount: int) -> None:
+    """
+    Add ``amount`` (+1 on create, -1 on delete) to the total and per-day
+    counters of ``instance``'s model. Questions have no creation date, so
+    they are counted on the day they are added and never removed from it.
+    """
+    name = counter_for(instance)
+    if name is None:
+        return
+    increment_counter(name, amount)
+    if name == 'submissions':
+        increment_counter(SCORE_SUM, amount * instance.score)
+
+    date_field = COUNTERS[name]
+    created_at = getattr(instance, date_field) if date_field else None
+    if created_at is not None:
+        increment_counter(daily_counter(name, timezone.localdate(created_at)), amount)
+    elif amount > 0:
+        increment_counter(daily_counter(name, timezone.localdate()), amount)
+
+
+def count_score_change(previous_score: Optional[int], score: int) -> None:
+    """Keep the submission score sum right when an existing submission is re-scored."""
+    if previous_score is not None and previous_score != score:
+        increment_counter(SCORE_SUM, score - previous_score)
+
+
+def reconcile_counters() -> None:
+    """
+    Recount every counter exactly, including today's per-day counters. Only
+    needed after bulk writes that bypass signals (bulk_create, raw SQL).
+    """
+    from django.contrib.auth.models import User
+    from django.db.models import Sum
+    from ..models import Question, Quiz, QuizSubmission, SiteCounter
+
+    today = timezone.localdate()
+    values = {
+        'users': User.objects.count(),
+        'quizzes': Quiz.objects.count(),
+        'questions': Question.objects.count(),
+        'submissions': QuizSubmission.objects.count(),
+        SCORE_SUM: QuizSubmission.objects.aggregate(total=Sum('score'))['total'] or 0,
+        daily_counter('users', today): User.objects.filter(date_joined__date=today).count(),
+        daily_counter('quizzes', today): Quiz.objects.filter(created_at__date=today).count(),
+        daily_counter('submissions', today): QuizSubmission.objects.filter(submitted_at__date=today).count(),
+    }
+    for name, value in values.items():
+        SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+    cache.delete(METRICS_CACHE_KEY)
+
+
+def compute_site_metrics() -> Dict[str, Any]:
+    """
+    Build the dashboard snapshot: totals and today's counts come from the
+    counter table in one query; the remaining figures need a query each.
+    """
+    from ..models import Question, Quiz, SiteCounter, UserRank
+
+    today = timezone.localdate()
+    names = list(COUNTERS) + [SCORE_SUM] + [daily_counter(name, today) for name in COUNTERS]
+    counters = dict(SiteCounter.objects.filter(name__in=names).values_list('name', 'value'))
+
+    metrics = {f"total_{name}": counters.get(name, 0) for name in COUNTERS}
+    metrics.update({f"today_{name}": counters.get(daily_counter(name, today), 0) for name in COUNTERS})
+    total_submissions = metrics['total_submissions']
+    metrics['avg_score'] = counters.get(SCORE_SUM, 0) / total_submissions if total_submissions else None
+
+    metrics['quizzes_with_no_questions'] = Quiz.objects.filter(
+        ~Exists(Question.objects.filter(quiz_id=OuterRef('pk')))
+    ).count()
+    metrics['pending_ai_errors'] = (
+        Question.objects.filter(ai_error__isnull=False).exclude(ai_error__exact='').count()
+    )
+    metrics['top_users'] = [
+        {'username': username, 'total_score': total_score}
+        for username, total_score in UserRank.objects.filter(rank__isnull=False)
+        .order_by('rank', 'user_id')
+        .values_list('user__username', 'total_score')[:5]
+    ]
+    metrics['computed_at'] = timezone.now()
+    return metrics
+
+
+def get_site_metrics() -> Dict[str, Any]:
+    """
+    Return the cached dashboard snapshot, recomputing it at most once per
+    ``ADMIN_METRICS_CACHE_TTL`` seconds (default 60).
+    """
+    metrics = cache.get(METRICS_CACHE_KEY)
+    if metrics is None:
+        metrics = compute_site_metrics()
+        cache.set(METRICS_CACHE_KEY, metrics, getattr(settings, 'ADMIN_METRICS_CACHE_TTL', 60))
+    return metrics
@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from datetime import timedelta
+from typing import Dict, List
+
+
+def quiz_popularity(quiz) -> int:
+    """
+    Recent submissions (``EXPLANATION_PREWARM_POPULARITY_DAYS``, default 30)
+    to the quiz plus those to its category, so a fresh quiz in a busy
+    category is explained before one nobody takes.
+    """
+    from ..models import QuizSubmission
+
+    since = timezone.now() - timedelta(days=getattr(settings, 'EXPLANATION_PREWARM_POPULARITY_DAYS', 30))
+    counts = QuizSubmission.objects.filter(submitted_at__gte=since).aggregate(
+        quiz_submissions=Count('id', filter=Q(quiz=quiz)),
+        category_submissions=Count('id', filter=Q(quiz__category_id=quiz.category_id)),
+    )
+    return counts['quiz_submissions'] + counts['category_submissions']
+
+
+def enqueue_explanations(quiz) -> int:
+    """
+    Queue an ExplanationJob for every question of ``quiz`` without an AI
+    explanation, at the quiz's popularity as priority. Questions already
+    queued get the new priority. Jobs being run are left alone, and so are
+    jobs that used up their attempts: the import re-runs on every save of
+    the quiz, which must not retry them forever. Returns the number of
+    questions without an explanation.
+    """
+    from ..models import ExplanationJob, Question
+
+    question_ids = list(
+        Question.objects.filter(quiz=quiz)
+        .filter(Q(ai_explanation__isnull=True) | Q(ai_explanation=''))
+        .values_list('id', flat=True)
+    )
+    if not question_ids:
+        return 0
+
+    priority = quiz_popularity(quiz)
+    with transaction.atomic():
+        ExplanationJob.objects.bulk_create(
+            [ExplanationJob(question_id=question_id, priority=priority) for question_id in question_ids],
+            ignore_conflicts=True,
+        )
+        ExplanationJob.objects.filter(question_id__in=question_ids).exclude(
+            status__in=[ExplanationJob.RUNNING, ExplanationJob.FAILED]
+        ).update(
+            status=ExplanationJob.QUEUED, priority=priority, attempts=0, last_error=None, next_attempt_at=None,
+        )
+    return len(question_ids)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Backoff before a job is claimed again: ``EXPLANATION_JOB_RETRY_DELAY``
+    seconds (default: the negative cache period plus 30s, so a retry really
+    reaches the API), doubled for every failed attempt so far.
+    """
+    base = getattr(
+        settings, 'EXPLANATION_JOB_RETRY_DELAY', getattr(settings, 'EXPLANATION_ERROR_CACHE_TIMEOUT', 60) + 30
+    )
+    return timedelta(seconds=base * 2 ** max(attempts - 1, 0))
+
+
+def claim_jobs(limit: int) -> List:
+    """
+    Mark up to ``limit`` queued jobs that are due, highest priority first,
+    as running and return them. Jobs left running for
+    ``EXPLANATION_JOB_TIMEOUT`` seconds (default 600) by a worker that died
+    are queued again first.
+    """
+    from ..models import ExplanationJob
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'EXPLANATION_JOB_TIMEOUT', 600))
+    ExplanationJob.objects.filter(status=ExplanationJob.RUNNING, updated_at__lt=stale).update(
+        status=ExplanationJob.QUEUED
+    )
+
+    with transaction.atomic():
+        jobs = list(
+            ExplanationJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExplanationJob.QUEUED)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('-priority', 'created_at')[:limit]
+        )
+        ExplanationJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=ExplanationJob.RUNNING, updated_at=now,
+        )
+    return jobs
+
+
+def run_jobs(generator, limit: int) -> Dict[str, int]:
+    """
+    Claim up to ``limit`` jobs and explain their questions with one
+    (packed) generation call. A failed call counts as an attempt and is
+    retried after ``retry_delay`` until ``EXPLANATION_JOB_MAX_ATTEMPTS``
+    (default 3). Questions the generator skipped without calling the API
+    (recent failure, open circuit, budget) are deferred without using an
+    attempt. Returns the number of jobs done, failed and deferred.
+    """
+    from ..models import ExplanationJob, Question
+
+    jobs = claim_jobs(limit)
+    if not jobs:
+        return {'done': 0, 'failed': 0, 'deferred': 0}
+
+    questions = {
+        question.id: question
+        for question in Question.objects.prefetch_related('choice_set').filter(id__in=[job.question_id for job in jobs])
+    }
+    results = generator.generate_explanations(list(questions.values()))
+
+    max_attempts = getattr(settings, 'EXPLANATION_JOB_MAX_ATTEMPTS', 3)
+    now = timezone.now()
+    counts = {'done': 0, 'failed': 0, 'deferred': 0}
+    for job in jobs:
+        if results.get(job.question_id):
+            ExplanationJob.objects.filter(pk=job.pk).update(
+                status=ExplanationJob.DONE, last_error=None, next_attempt_at=None,
+            )
+            counts['done'] += 1
+            continue
+
+        question = questions.get(job.question_id)
+        error = (question.ai_error if question else None) or 'Failed to generate explanation'
+        if question is not None and getattr(question, 'explanation_deferred', False):
+            ExplanationJob.objects.filter(pk=job.pk).update(
+                status=ExplanationJob.QUEUED, last_error=error, next_attempt_at=now + retry_delay(job.attempts),
+            )
+            counts['deferred'] += 1
+            continue
+
+        attempts = job.attempts + 1
+        ExplanationJob.objects.filter(pk=job.pk).update(
+            status=ExplanationJob.QUEUED if attempts < max_attempts else ExplanationJob.FAILED,
+            attempts=attempts, last_error=error, next_attempt_at=now + retry_delay(attempts),
+        )
+        counts['failed'] += 1
+    return counts
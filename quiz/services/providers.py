@@ -0,0 +1,205 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+import google.generativeai as genai
+import json
+import random
+import re
+import threading
+import time
+
+from .rate_limit import estimate_tokens
+
+
+@dataclass
+class GenerationResult:
+    """Response text with the prompt and output token usage reported for it."""
+    text: str
+    prompt_tokens: int
+    output_tokens: int
+
+
+def _token_count(value, fallback: int) -> int:
+    """Use a reported token count when the API gave one, else the estimate."""
+    return value if isinstance(value, int) and value >= 0 else fallback
+
+
+class ExplanationProvider(ABC):
+    """
+    Interface of the text generation backends used by ExplanationGenerator.
+    ``generate`` returns a GenerationResult and raises on any failure,
+    including an empty response.
+    """
+    model_name = ''
+
+    @abstractmethod
+    def generate(self, prompt: str, max_output_tokens: int, temperature: float,
+                 json_output: bool = False, timeout: Optional[float] = None) -> GenerationResult:
+        """Return the full response for ``prompt``."""
+
+    def stream(self, prompt: str, max_output_tokens: int, temperature: float,
+               timeout: Optional[float] = None) -> Iterator[Union[str, GenerationResult]]:
+        """
+        Yield the response text in chunks as they arrive, then a final
+        GenerationResult with the full text and token usage. Providers
+        without streaming yield the whole text as a single chunk.
+        """
+        result = self.generate(prompt, max_output_tokens, temperature, timeout=timeout)
+        yield result.text
+        yield result
+
+
+class GeminiProvider(ExplanationProvider):
+    """Google Gemini through ``google.generativeai``; requires ``GEMINI_API_KEY``."""
+
+    def __init__(self):
+        api_key = getattr(settings, 'GEMINI_API_KEY', None)
+        if not api_key:
+            raise ValidationError("GEMINI_API_KEY is not configured")
+
+        self.model_name = getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash')
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+
+    def generate(self, prompt, max_output_tokens, temperature, json_output=False, timeout=None):
+        config = {'max_output_tokens': max_output_tokens, 'temperature': temperature}
+        if json_output:
+            config['response_mime_type'] = 'application/json'
+        response = self.model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(**config),
+            request_options={'timeout': timeout} if timeout else None,
+        )
+        if not response or not response.text:
+            raise ValueError("Empty response from Gemini API")
+
+        return self._result(prompt, response, response.text)
+
+    def stream(self, prompt, max_output_tokens, temperature, timeout=None):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                max_output_tokens=max_output_tokens, temperature=temperature,
+            ),
+            request_options={'timeout': timeout} if timeout else None,
+            stream=True,
+        )
+        parts = []
+        for chunk in response:
+            text = chunk.text if chunk.parts else ''
+            if text:
+                parts.append(text)
+                yield text
+        if not parts:
+            raise ValueError("Empty response from Gemini API")
+        # Usage is reported once the stream has been consumed
+        yield self._result(prompt, response, ''.join(parts))
+
+    def _result(self, prompt, response, text):
+        usage = getattr(response, 'usage_metadata', None)
+        return GenerationResult(
+            text=text,
+            prompt_tokens=_token_count(getattr(usage, 'prompt_token_count', None), estimate_tokens(prompt)),
+            output_tokens=_token_count(getattr(usage, 'candidates_token_count', None), estimate_tokens(text)),
+        )
+
+
+class FakeProvider(ExplanationProvider):
+    """
+    Local stand-in for load testing without network access. Each call sleeps
+    ``EXPLANATION_FAKE_LATENCY`` seconds (default 0.5, +/-20% jitter), fails
+    with probability ``EXPLANATION_FAKE_ERROR_RATE`` (default 0) and returns
+    about ``EXPLANATION_FAKE_OUTPUT_WORDS`` words (default 120). Packed JSON
+    prompts get one explanation per ``Question ID:`` line.
+    """
+    model_name = 'fake'
+
+    def __init__(self, latency=None, error_rate=None, output_words=None, seed=None):
+        self.latency = getattr(settings, 'EXPLANATION_FAKE_LATENCY', 0.5) if latency is None else latency
+        self.error_rate = getattr(settings, 'EXPLANATION_FAKE_ERROR_RATE', 0.0) if error_rate is None else error_rate
+        self.output_words = getattr(settings, 'EXPLANATION_FAKE_OUTPUT_WORDS', 120) if output_words is None else output_words
+        self.random = random.Random(seed)
+
+    def _text(self, max_output_tokens: int) -> str:
+        # Stay within the output limit, as the real API truncates
+        words = min(self.output_words, max(1, int(max_output_tokens / 1.3)))
+        return ' '.join(['lorem'] * words)
+
+    def generate(self, prompt, max_output_tokens, temperature, json_output=False, timeout=None):
+        latency = self.latency * self.random.uniform(0.8, 1.2)
+        if timeout and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake provider timed out after {timeout}s")
+        time.sleep(latency)
+        if self.random.random() < self.error_rate:
+            raise ConnectionError("Fake provider error")
+
+        if json_output:
+            question_ids = re.findall(r'^Question ID: (\d+)$', prompt, re.MULTILINE)
+            per_question = max_output_tokens // max(len(question_ids), 1)
+            text = json.dumps({question_id: self._text(per_question) for question_id in question_ids})
+        else:
+            text = self._text(max_output_tokens)
+        return GenerationResult(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def stream(self, prompt, max_output_tokens, temperature, timeout=None):
+        # The latency is spread over chunks of a few words, like a real stream
+        text = self._text(max_output_tokens)
+        words = text.split(' ')
+        chunks = [' '.join(words[i:i + 5]) + ' ' for i in range(0, len(words), 5)]
+        delay = self.latency / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay * self.random.uniform(0.8, 1.2))
+            if self.random.random() < self.error_rate / len(chunks):
+                raise ConnectionError("Fake provider error")
+            yield chunk
+        yield GenerationResult(text, estimate_tokens(prompt), estimate_tokens(text))
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'fake': FakeProvider,
+}
+
+
+def get_provider() -> ExplanationProvider:
+    """
+    Instantiate the provider named by ``EXPLANATION_PROVIDER``: ``'gemini'``
+    (default), ``'fake'`` or the dotted path of an ExplanationProvider class.
+    """
+    name = getattr(settings, 'EXPLANATION_PROVIDER', 'gemini')
+    provider_class = PROVIDERS[name] if name in PROVIDERS else import_string(name)
+    return provider_class()
+
+
+_shared_providers = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_provider() -> ExplanationProvider:
+    """
+    The provider named by ``EXPLANATION_PROVIDER``, created on first use and
+    then reused by every request in the process, so the Gemini client is
+    configured once and keeps its HTTP connections open.
+    """
+    name = getattr(settings, 'EXPLANATION_PROVIDER', 'gemini')
+    provider = _shared_providers.get(name)
+    if provider is None:
+        with _shared_lock:
+            provider = _shared_providers.get(name)
+            if provider is None:
+                provider = _shared_providers[name] = get_provider()
+    return provider
+
+
+@receiver(setting_changed)
+def reset_providers(setting=None, **kwargs):
+    """Drop the shared providers so the next request builds them from the current settings."""
+    if setting is None or setting.startswith(('GEMINI_', 'EXPLANATION_')):
+        with _shared_lock:
+            _shared_providers.clear()
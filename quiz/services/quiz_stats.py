@@ -0,0 +1,99 @@
+from django.conf import settings
+from typing import Any, Dict, List, Optional, Tuple
+
+from .aggregates import upsert_increment
+
+
+def move_best_score(quiz_id: int, previous_best: Optional[int], new_best: Optional[int]) -> None:
+    """
+    Move one taker between the quiz's histogram buckets when their best score
+    changes. ``None`` means the user had (or has) no attempt at the quiz.
+    """
+    from ..models import QuizScoreBucket
+
+    if previous_best == new_best:
+        return
+    if previous_best is not None:
+        upsert_increment(QuizScoreBucket, {'quiz_id': quiz_id, 'score': previous_best}, {'takers': -1})
+    if new_best is not None:
+        upsert_increment(QuizScoreBucket, {'quiz_id': quiz_id, 'score': new_best}, {'takers': 1})
+
+
+def get_score_distribution(quiz) -> List[Tuple[int, int]]:
+    """Return ``(score, takers)`` pairs for every non-empty bucket, lowest score first."""
+    from ..models import QuizScoreBucket
+
+    return list(
+        QuizScoreBucket.objects.filter(quiz=quiz, takers__gt=0)
+        .order_by('score')
+        .values_list('score', 'takers')
+    )
+
+
+def summarize_distribution(distribution: List[Tuple[int, int]], score: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compute taker count, median best score and, when ``score`` is given, the
+    percentage of takers whose best score is strictly lower. The work is bounded
+    by the number of distinct scores, not by the number of submissions.
+    """
+    takers = sum(count for _, count in distribution)
+    summary = {'takers': takers, 'median': None, 'percentile': None}
+    if not takers:
+        return summary
+
+    # Median over the expanded histogram, averaging the two middle values
+    middle = [(takers - 1) // 2, takers // 2]
+    values, seen = [], 0
+    for bucket_score, count in distribution:
+        while middle and middle[0] < seen + count:
+            values.append(bucket_score)
+            middle.pop(0)
+        seen += count
+    summary['median'] = sum(values) / len(values)
+
+    if score is not None:
+        below = sum(count for bucket_score, count in distribution if bucket_score < score)
+        summary['percentile'] = round(below * 100 / takers)
+    return summary
+
+
+def get_score_group(quiz, score: int) -> Optional[str]:
+    """
+    Place a score in the quiz's upper (``'top'``) or lower (``'bottom'``)
+    group of takers, each ``DISTRACTOR_GROUP_FRACTION`` (default 0.27) of the
+    histogram, using the score's mid-rank percentile. ``None`` for the middle.
+    """
+    fraction = getattr(settings, 'DISTRACTOR_GROUP_FRACTION', 0.27)
+    distribution = get_score_distribution(quiz)
+    takers = sum(count for _, count in distribution)
+    if not takers:
+        return None
+
+    below = sum(count for bucket_score, count in distribution if bucket_score < score)
+    equal = sum(count for bucket_score, count in distribution if bucket_score == score)
+    percentile = (below + equal / 2) / takers
+    if percentile >= 1 - fraction:
+        return 'top'
+    if percentile < fraction:
+        return 'bottom'
+    return None
+
+
+def get_quiz_top_scores(quiz, limit: Optional[int] = None):
+    """Return the quiz's best-scoring takers, served from the (quiz, best_score) index."""
+    from ..models import UserQuizScore
+
+    if limit is None:
+        limit = getattr(settings, 'QUIZ_TOP_SCORES_SIZE', 5)
+    return list(
+        UserQuizScore.objects.filter(quiz=quiz)
+        .select_related('user')
+        .order_by('-best_score', 'last_submitted_at')[:limit]
+    )
+
+
+def get_quiz_result_stats(quiz, score: Optional[int]) -> Dict[str, Any]:
+    """Everything the results page shows next to "Your Score"."""
+    stats = summarize_distribution(get_score_distribution(quiz), score)
+    stats['top_scores'] = get_quiz_top_scores(quiz)
+    return stats
@@ -0,0 +1,78 @@
+from django.conf import settings
+from math import ceil
+from typing import Callable, Optional
+import threading
+import time
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for ``text`` (about 1.3 tokens per word)."""
+    return ceil(len(text.split()) * 1.3)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at ``rate_per_minute``
+    tokens per minute and holding at most ``capacity`` tokens (by default one
+    second's worth, so bursts stay small). Reservations may overdraw the
+    bucket; the caller then waits until the debt has been refilled, which
+    keeps concurrent callers in first-come, first-served order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take ``amount`` tokens and return how many seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        """Give back tokens that were reserved but not used."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Limit API calls to ``requests_per_minute`` requests and
+    ``tokens_per_minute`` tokens, shared by every thread that calls
+    ``acquire``. Defaults come from ``GEMINI_REQUESTS_PER_MINUTE`` (15) and
+    ``GEMINI_TOKENS_PER_MINUTE`` (1,000,000).
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        requests_per_minute = requests_per_minute or getattr(settings, 'GEMINI_REQUESTS_PER_MINUTE', 15)
+        tokens_per_minute = tokens_per_minute or getattr(settings, 'GEMINI_TOKENS_PER_MINUTE', 1_000_000)
+        self.requests = TokenBucket(requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock)
+        self._sleep = sleep
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of about ``tokens`` tokens may be sent; return the seconds waited."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens) if tokens else 0.0)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def settle(self, reserved: int, used: int):
+        """Return the unused part of a reservation once the actual usage is known."""
+        if reserved > used:
+            self.tokens.refund(reserved - used)
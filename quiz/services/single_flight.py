@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import cache
+from typing import Callable, Optional, Tuple
+import time
+import uuid
+
+from .explanation_store import explanation_cache
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+
+
+def lock_key(question) -> str:
+    return f"question_explanation_lock_{question.id}"
+
+
+def is_generating(question) -> bool:
+    """Whether some request currently holds the generation lock for ``question``."""
+    return cache.get(lock_key(question)) is not None
+
+
+def acquire_lock(question) -> Optional[str]:
+    """
+    Take the generation lock for ``question`` for ``EXPLANATION_LOCK_TIMEOUT``
+    seconds (default 60). Returns the owner token, or None if it is held.
+    """
+    token = uuid.uuid4().hex
+    if cache.add(lock_key(question), token, getattr(settings, 'EXPLANATION_LOCK_TIMEOUT', 60)):
+        return token
+    return None
+
+
+def release_lock(question, token: str):
+    """Release the generation lock, unless it expired and another request took it."""
+    key = lock_key(question)
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def wait_for_explanation(question, timeout: float, interval: float = 0.25) -> Optional[str]:
+    """Poll the explanation cache for up to ``timeout`` seconds while another request generates."""
+    deadline = time.monotonic() + timeout
+    while True:
+        explanation = explanation_cache.get(question.get_cache_key())
+        if explanation or not is_generating(question):
+            return explanation
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(interval, remaining))
+
+
+def generate_once(question, generate: Callable[[object], Optional[str]],
+                  wait: Optional[float] = None) -> Tuple[str, Optional[str]]:
+    """
+    Coalesce concurrent explanation requests for one question into a single
+    upstream call. The first caller takes a short-lived lock in the shared
+    cache (``EXPLANATION_LOCK_TIMEOUT``, default 60s), so this holds across
+    worker processes, and runs ``generate``; the
+    others wait up to ``EXPLANATION_WAIT_SECONDS`` (default 3s) for its
+    result. Returns ``(status, explanation)`` where status is ``READY``,
+    ``PENDING`` (still generating elsewhere, poll later) or ``FAILED``.
+    """
+    explanation = explanation_cache.get(question.get_cache_key())
+    if explanation:
+        return READY, explanation
+
+    token = acquire_lock(question)
+    if token:
+        try:
+            # The previous holder may have finished between the check and the lock
+            explanation = explanation_cache.get(question.get_cache_key()) or generate(question)
+        finally:
+            release_lock(question, token)
+        return (READY, explanation) if explanation else (FAILED, None)
+
+    wait = getattr(settings, 'EXPLANATION_WAIT_SECONDS', 3) if wait is None else wait
+    explanation = wait_for_explanation(question, wait)
+    if explanation:
+        question.refresh_from_db()
+        return READY, explanation
+    return (PENDING, None) if is_generating(question) else (FAILED, None)
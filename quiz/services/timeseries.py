@@ -0,0 +1,105 @@
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from datetime import date, timedelta
+from math import ceil
+from typing import Any, Dict, List, Optional
+
+TIMESERIES_BUCKETS = ('hour', 'day', 'week', 'month')
+TIMESERIES_FIELDS = (
+    'total_users', 'total_quizzes', 'total_questions', 'total_submissions',
+    'submissions_today', 'avg_score',
+)
+# Per-day counts are summed when days are merged; running totals and the
+# cumulative average keep the value of the latest day in the bucket
+SUMMED_FIELDS = ('submissions_today', 'submissions')
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """First day of the ``bucket`` (day, ISO week or month) containing ``day``."""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _merge(points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine consecutive points into one, labelled with the first point's time."""
+    merged = dict(points[-1], t=points[0]['t'])
+    for field in SUMMED_FIELDS:
+        if field in merged:
+            merged[field] = sum(point[field] for point in points)
+    return merged
+
+
+def downsample(points: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """Merge runs of consecutive points so that at most ``max_points`` remain."""
+    if max_points < 1 or len(points) <= max_points:
+        return points
+    size = ceil(len(points) / max_points)
+    return [_merge(points[i:i + size]) for i in range(0, len(points), size)]
+
+
+def get_metric_series(bucket: str = 'day', start: Optional[date] = None, end: Optional[date] = None,
+                      max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return AdminDailyMetric history grouped into ``bucket`` periods and then
+    downsampled to at most ``max_points`` points. The daily table holds one
+    row per day, so the grouping is done in Python over a single query.
+    """
+    from ..models import AdminDailyMetric
+
+    rows = AdminDailyMetric.objects.order_by('date')
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+
+    buckets: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows.values('date', *TIMESERIES_FIELDS):
+        day = row.pop('date')
+        row['avg_score'] = float(row['avg_score']) if row['avg_score'] is not None else None
+        row['t'] = bucket_start(day, bucket).isoformat()
+        buckets.setdefault(row['t'], []).append(row)
+
+    points = [_merge(group) for group in buckets.values()]
+    sampled = downsample(points, max_points or len(points))
+    return {
+        'bucket': bucket,
+        'fields': list(TIMESERIES_FIELDS),
+        'points': sampled,
+        'downsampled': len(sampled) < len(points),
+    }
+
+
+def get_hourly_submissions(hours: int = 48, max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return submissions per hour for the last ``hours`` hours, with empty hours
+    filled in, from one grouped query over the indexed ``submitted_at``.
+    """
+    from ..models import QuizSubmission
+
+    # Align to hour boundaries in the current time zone, as TruncHour does
+    now = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+    first = now - timedelta(hours=hours - 1)
+    counts = {
+        row['hour']: row['submissions']
+        for row in QuizSubmission.objects.filter(submitted_at__gte=first)
+        .annotate(hour=TruncHour('submitted_at'))
+        .values('hour')
+        .annotate(submissions=Count('id'))
+        .order_by()
+    }
+    points = []
+    for offset in range(hours):
+        hour = first + timedelta(hours=offset)
+        points.append({'t': hour.isoformat(), 'submissions': counts.get(hour, 0)})
+
+    sampled = downsample(points, max_points or len(points))
+    return {
+        'bucket': 'hour',
+        'fields': ['submissions'],
+        'points': sampled,
+        'downsampled': len(sampled) < len(points),
+    }
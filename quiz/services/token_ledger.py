@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import daily_counter, increment_counter
+
+# Running totals kept in SiteCounter; cost is counted in nano-dollars
+PROMPT_TOKENS = 'explanation_prompt_tokens'
+OUTPUT_TOKENS = 'explanation_output_tokens'
+REQUESTS = 'explanation_requests'
+GENERATED = 'explanations_generated'
+COST = 'explanation_cost_nanousd'
+NANO = 1_000_000_000
+
+
+class BudgetExceededError(Exception):
+    """Raised before a model call that would exceed the daily or monthly budget."""
+
+
+def monthly_counter(name: str, date) -> str:
+    """Name of the counter holding ``name`` for the month of ``date``."""
+    return f"{name}:{date:%Y-%m}"
+
+
+def request_cost(prompt_tokens: int, output_tokens: int) -> float:
+    """
+    USD cost of a call at ``GEMINI_INPUT_PRICE_PER_MILLION`` and
+    ``GEMINI_OUTPUT_PRICE_PER_MILLION`` (defaults: Gemini 1.5 Flash prices).
+    """
+    input_price = getattr(settings, 'GEMINI_INPUT_PRICE_PER_MILLION', 0.075)
+    output_price = getattr(settings, 'GEMINI_OUTPUT_PRICE_PER_MILLION', 0.30)
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def record_usage(ai_model: str, prompt_tokens: int, output_tokens: int,
+                 questions: int = 1, question=None) -> float:
+    """
+    Append a ledger entry for one model call and add it to the running
+    totals (overall, today and this month). Returns the call's cost.
+    """
+    from ..models import TokenLedgerEntry
+
+    cost = request_cost(prompt_tokens, output_tokens)
+    today = timezone.localdate()
+    with transaction.atomic():
+        TokenLedgerEntry.objects.create(
+            ai_model=ai_model, question=question, questions=questions,
+            prompt_tokens=prompt_tokens, output_tokens=output_tokens, cost=round(cost, 9),
+        )
+        increment_counter(PROMPT_TOKENS, prompt_tokens)
+        increment_counter(OUTPUT_TOKENS, output_tokens)
+        increment_counter(REQUESTS, 1)
+        increment_counter(GENERATED, questions)
+        for name in (COST, daily_counter(COST, today), monthly_counter(COST, today)):
+            increment_counter(name, round(cost * NANO))
+    return cost
+
+
+def get_spend() -> Dict[str, float]:
+    """Spend so far today and this month, in USD, from two counters."""
+    from ..models import SiteCounter
+
+    today = timezone.localdate()
+    names = {'today': daily_counter(COST, today), 'month': monthly_counter(COST, today)}
+    values = dict(SiteCounter.objects.filter(name__in=names.values()).values_list('name', 'value'))
+    return {period: values.get(name, 0) / NANO for period, name in names.items()}
+
+
+def reserve_budget(estimated_cost: float) -> Optional[Tuple[List[str], int]]:
+    """
+    Hold ``estimated_cost`` against today's and this month's spend before a
+    call, refusing it when that takes either past ``EXPLANATION_DAILY_BUDGET``
+    / ``EXPLANATION_MONTHLY_BUDGET`` (USD; unset means unlimited). The hold
+    is an atomic counter increment, so concurrent callers see each other's
+    reservations instead of all passing the same check. Returns the
+    reservation to hand to ``release_budget`` after the call, or None when
+    no budget is set.
+    """
+    from ..models import SiteCounter
+
+    budgets = {
+        'today': getattr(settings, 'EXPLANATION_DAILY_BUDGET', None),
+        'month': getattr(settings, 'EXPLANATION_MONTHLY_BUDGET', None),
+    }
+    if not any(budget is not None for budget in budgets.values()):
+        return None
+
+    today = timezone.localdate()
+    names = {'today': daily_counter(COST, today), 'month': monthly_counter(COST, today)}
+    reservation = (list(names.values()), round(estimated_cost * NANO))
+    for name in names.values():
+        increment_counter(name, reservation[1])
+
+    values = dict(SiteCounter.objects.filter(name__in=names.values()).values_list('name', 'value'))
+    for period, budget in budgets.items():
+        if budget is not None and values.get(names[period], 0) > budget * NANO:
+            release_budget(reservation)
+            label = 'Daily' if period == 'today' else 'Monthly'
+            raise BudgetExceededError(f"{label} explanation budget of ${budget:.2f} reached")
+    return reservation
+
+
+def release_budget(reservation: Optional[Tuple[List[str], int]]) -> None:
+    """Give back a reservation; the actual cost is added by ``record_usage``."""
+    if reservation is None:
+        return
+    names, amount = reservation
+    for name in names:
+        increment_counter(name, -amount)
+
+
+def get_ledger_stats(cache_timeout: Optional[int] = None) -> Dict[str, Any]:
+    """Generation statistics from the running counters, in a single query."""
+    from ..models import SiteCounter
+
+    today = timezone.localdate()
+    names = [
+        'questions', PROMPT_TOKENS, OUTPUT_TOKENS, REQUESTS, GENERATED, COST,
+        daily_counter(COST, today), monthly_counter(COST, today),
+    ]
+    counters = dict(SiteCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    generated = counters.get(GENERATED, 0)
+    total_cost = counters.get(COST, 0) / NANO
+
+    return {
+        'total_questions': counters.get('questions', 0),
+        'explanations_generated': generated,
+        'total_cost': total_cost,
+        'average_cost': total_cost / generated if generated else 0,
+        'requests': counters.get(REQUESTS, 0),
+        'prompt_tokens': counters.get(PROMPT_TOKENS, 0),
+        'output_tokens': counters.get(OUTPUT_TOKENS, 0),
+        'spent_today': counters.get(daily_counter(COST, today), 0) / NANO,
+        'spent_this_month': counters.get(monthly_counter(COST, today), 0) / NANO,
+        'daily_budget': getattr(settings, 'EXPLANATION_DAILY_BUDGET', None),
+        'monthly_budget': getattr(settings, 'EXPLANATION_MONTHLY_BUDGET', None),
+        'cache_timeout': cache_timeout,
+    }
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from .aggregates import upsert_increment
+
+
+def score_percentage(score: int, question_count: int) -> Optional[float]:
+    """Return ``score`` as a percentage of ``question_count``, or ``None`` for an empty quiz."""
+    if question_count <= 0:
+        return None
+    return score * 100 / question_count
+
+
+def record_user_stats(submission) -> None:
+    """
+    Fold a new submission into the user's profile statistics and daily
+    activity row. Submissions to quizzes without questions count as attempts
+    but not towards the average.
+    """
+    from ..models import Question, UserDailyActivity, UserStats
+
+    submitted_at = submission.submitted_at or timezone.now()
+    question_count = Question.objects.filter(quiz_id=submission.quiz_id).count()
+    percentage = score_percentage(submission.score, question_count)
+
+    increments = {'attempts': 1}
+    defaults = {'best_score': submission.score, 'last_submitted_at': submitted_at}
+    expressions = {'best_score': Greatest('best_score', Value(submission.score))}
+    if percentage is not None:
+        increments.update(scored_attempts=1, total_percentage=percentage)
+        defaults['best_percentage'] = percentage
+        expressions['best_percentage'] = Greatest('best_percentage', Value(percentage))
+
+    upsert_increment(
+        UserStats, {'user_id': submission.user_id}, increments,
+        defaults=defaults, expressions=expressions,
+    )
+    upsert_increment(
+        UserDailyActivity,
+        {'user_id': submission.user_id, 'date': timezone.localdate(submitted_at)},
+        {'attempts': 1, 'questions_answered': question_count, 'correct_answers': submission.score},
+    )
+
+
+def resync_user_stats(user_id: int, submitted_at=None) -> None:
+    """
+    Recompute a user's profile statistics from their remaining submissions,
+    with question counts joined in a single query, and the activity row for
+    the day of ``submitted_at`` when given. Rows left without submissions are
+    removed.
+    """
+    from ..models import QuizSubmission, UserStats
+
+    if submitted_at is not None:
+        resync_daily_activity(user_id, timezone.localdate(submitted_at))
+
+    rows = (
+        QuizSubmission.objects.filter(user_id=user_id)
+        # Annotating first groups by submission, so identical attempts stay apart
+        .annotate(question_count=Count('quiz__question'))
+        .values_list('score', 'submitted_at', 'question_count')
+        .order_by()
+    )
+    stats = {
+        'attempts': 0, 'scored_attempts': 0, 'total_percentage': 0.0,
+        'best_score': None, 'best_percentage': 0.0, 'last_submitted_at': None,
+    }
+    for score, submitted_at, question_count in rows:
+        stats['attempts'] += 1
+        stats['best_score'] = max(score, stats['best_score'] if stats['best_score'] is not None else score)
+        stats['last_submitted_at'] = max(submitted_at, stats['last_submitted_at'] or submitted_at)
+        percentage = score_percentage(score, question_count)
+        if percentage is not None:
+            stats['scored_attempts'] += 1
+            stats['total_percentage'] += percentage
+            stats['best_percentage'] = max(stats['best_percentage'], percentage)
+
+    if not stats['attempts']:
+        UserStats.objects.filter(user_id=user_id).delete()
+        return
+    UserStats.objects.update_or_create(user_id=user_id, defaults=stats)
+
+
+def resync_daily_activity(user_id: int, date) -> None:
+    """Recompute one day of a user's activity from that day's submissions."""
+    from ..models import Question, QuizSubmission, UserDailyActivity
+
+    day_rows = QuizSubmission.objects.filter(user_id=user_id, submitted_at__date=date)
+    day_stats = day_rows.aggregate(attempts=Count('id'), correct_answers=Sum('score'))
+    lookup = {'user_id': user_id, 'date': date}
+    if not day_stats['attempts']:
+        UserDailyActivity.objects.filter(**lookup).delete()
+        return
+    day_stats['questions_answered'] = Question.objects.filter(
+        quiz__quizsubmission__in=day_rows
+    ).count()
+    UserDailyActivity.objects.update_or_create(**lookup, defaults=day_stats)
+
+
+def get_activity_history(user, days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return a user's daily activity for the last ``days`` days (default
+    ``PROFILE_ACTIVITY_DAYS``, 365), read from the daily rollup only: at most
+    one small row per day, never the raw submissions.
+    """
+    from ..models import UserDailyActivity
+
+    days = days or getattr(settings, 'PROFILE_ACTIVITY_DAYS', 365)
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    rows = (
+        UserDailyActivity.objects.filter(user=user, date__gte=start)
+        .order_by('date')
+        .values_list('date', 'attempts', 'questions_answered', 'correct_answers')
+    )
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': [
+            {
+                'date': date.isoformat(),
+                'attempts': attempts,
+                'questions_answered': questions_answered,
+                'accuracy': score_percentage(correct_answers, questions_answered),
+            }
+            for date, attempts, questions_answered, correct_answers in rows
+        ],
+    }
@@ -1,4 +1,4 @@
-from django.test import TestCase, override_settings
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.cache import cache
@@ -6,6 +6,7 @@ from unittest.mock import patch, MagicMock
 from .models import Quiz, Question, Choice, Category
 from .services import ExplanationGenerator
 import json
+from io import StringIO
 
 
 class ExplanationGeneratorTestCase(TestCase):
@@ -71,9 +72,10 @@ class ExplanationGeneratorTestCase(TestCase):
     @override_settings(GEMINI_API_KEY='test_key', GEMINI_MODEL='gemini-1.5-flash', GEMINI_MAX_TOKENS=1000, GEMINI_TEMPERATURE=0.7, EXPLANATION_CACHE_TIMEOUT=86400)
     def test_cache_hit(self):
         """Test that cached explanations are returned."""
+        from .services.explanation_store import explanation_cache
         cache_key = self.question.get_cache_key()
         cached_explanation = "Cached explanation"
-        cache.set(cache_key, cached_explanation, 3600)
+        explanation_cache.set(cache_key, cached_explanation, 3600)
 
         with patch('quiz.services.genai') as mock_genai:
             generator = ExplanationGenerator()
@@ -205,3 +207,1545 @@ class ModelTestCase(TestCase):
         """Test cache key generation."""
         expected_key = f"question_explanation_{self.question.id}"
         self.assertEqual(self.question.get_cache_key(), expected_key)
+
+
+class LeaderboardRollupTestCase(TestCase):
+    def setUp(self):
+        self.biology = Category.objects.create(name="Biology")
+        self.physics = Category.objects.create(name="Physics")
+        self.bio_quiz = Quiz.objects.create(title="Cells", category=self.biology)
+        self.phy_quiz = Quiz.objects.create(title="Motion", category=self.physics)
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+
+    def test_submission_updates_daily_rollup(self):
+        """Test that submissions are folded into one row per user, category and day."""
+        from .models import QuizSubmission, DailyCategoryScore
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=3)
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=4)
+
+        rollup = DailyCategoryScore.objects.get(user=self.alice, category=self.biology)
+        self.assertEqual(rollup.attempts, 2)
+        self.assertEqual(rollup.total_score, 7)
+
+    def test_category_leaderboard(self):
+        """Test that a category leaderboard only counts that category's quizzes."""
+        from .models import QuizSubmission
+        from .services import get_windowed_leaderboard
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=5)
+        QuizSubmission.objects.create(user=self.bob, quiz=self.bio_quiz, score=2)
+        QuizSubmission.objects.create(user=self.bob, quiz=self.phy_quiz, score=9)
+
+        board = get_windowed_leaderboard('week', self.biology.id)
+        self.assertEqual([entry['user'] for entry in board], [self.alice, self.bob])
+        self.assertEqual(board[0]['total_score'], 5)
+
+    @override_settings(LEADERBOARD_SCORING='sum')
+    def test_window_excludes_old_rollups(self):
+        """Test that rollups before the window start are not counted."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import DailyCategoryScore
+        from .services import get_windowed_leaderboard
+        DailyCategoryScore.objects.create(
+            user=self.alice, category=self.biology,
+            date=timezone.localdate() - timedelta(days=40), attempts=1, total_score=10
+        )
+
+        self.assertEqual(get_windowed_leaderboard('month'), [])
+        self.assertEqual(len(get_windowed_leaderboard('all')), 1)
+
+    def test_windowed_board_respects_scoring_policy(self):
+        """Test that retakes do not add up on windowed boards under the best policy."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import DailyQuizScore, QuizSubmission
+        from .services import get_windowed_leaderboard
+        for score in (3, 5, 4):
+            QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=score)
+        QuizSubmission.objects.create(user=self.bob, quiz=self.phy_quiz, score=9)
+        DailyQuizScore.objects.filter(user=self.bob).update(date=timezone.localdate() - timedelta(days=40))
+
+        board = get_windowed_leaderboard('month')
+        self.assertEqual([(entry['user'], entry['total_score']) for entry in board], [(self.alice, 5)])
+        self.assertEqual(board[0]['quiz_count'], 3)
+        self.assertEqual(get_windowed_leaderboard('all', self.biology.id)[0]['total_score'], 5)
+        with self.settings(LEADERBOARD_SCORING='sum'):
+            self.assertEqual(get_windowed_leaderboard('week', self.biology.id)[0]['total_score'], 12)
+
+    def test_retake_only_scores_within_window(self):
+        """Test that retaking an old quiz does not bring its old best onto this week's board."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import DailyQuizScore, QuizSubmission
+        from .services import get_windowed_leaderboard
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=10)
+        DailyQuizScore.objects.filter(user=self.alice).update(date=timezone.localdate() - timedelta(days=90))
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=0)
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=2)
+
+        week = get_windowed_leaderboard('week')
+        self.assertEqual((week[0]['total_score'], week[0]['quiz_count']), (2, 2))
+        self.assertEqual(get_windowed_leaderboard('all')[0]['total_score'], 10)
+        with self.settings(LEADERBOARD_SCORING='latest'):
+            self.assertEqual(get_windowed_leaderboard('week')[0]['total_score'], 2)
+            self.assertEqual(get_windowed_leaderboard('all')[0]['total_score'], 2)
+
+    def test_deleting_submission_resyncs_daily_quiz_rollup(self):
+        """Test that the per-quiz daily rollup follows deleted submissions."""
+        from .models import DailyQuizScore, QuizSubmission
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=7)
+        later = QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=3)
+        rollup = DailyQuizScore.objects.get(user=self.alice, quiz=self.bio_quiz)
+        self.assertEqual((rollup.attempts, rollup.best_score, rollup.latest_score), (2, 7, 3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            later.delete()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.attempts, rollup.best_score, rollup.latest_score), (1, 7, 7))
+
+    def test_leaderboard_view_window(self):
+        """Test that the leaderboard page renders windowed boards."""
+        from .models import QuizSubmission
+        QuizSubmission.objects.create(user=self.alice, quiz=self.bio_quiz, score=5)
+        response = self.client.get(reverse('leaderboard'), {'window': 'week', 'category': self.biology.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['window'], 'week')
+        self.assertEqual(len(response.context['leaderboard_users']), 1)
+
+
+class LeaderboardRebuildTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=self.category)
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+
+    def test_submission_marks_dirty_without_rebuilding(self):
+        """Test that submissions update totals and flag ranks for the worker."""
+        from .models import QuizSubmission, UserRank, LeaderboardState
+        QuizSubmission.objects.create(user=self.alice, quiz=self.quiz, score=4)
+
+        rank = UserRank.objects.get(user=self.alice)
+        self.assertEqual(rank.total_score, 4)
+        self.assertIsNone(rank.rank)
+        self.assertIsNotNone(LeaderboardState.objects.get(name='global').dirty_at)
+
+    def test_rebuild_if_due_coalesces(self):
+        """Test that a dirty leaderboard is rebuilt once per interval."""
+        from .models import QuizSubmission, UserRank, LeaderboardState
+        from .services.leaderboard import rebuild_if_due
+        QuizSubmission.objects.create(user=self.alice, quiz=self.quiz, score=2)
+        QuizSubmission.objects.create(user=self.bob, quiz=self.quiz, score=5)
+
+        self.assertTrue(rebuild_if_due(interval=60))
+        self.assertEqual(UserRank.objects.get(user=self.bob).rank, 1)
+        self.assertEqual(UserRank.objects.get(user=self.alice).rank, 2)
+        self.assertIsNone(LeaderboardState.objects.get(name='global').dirty_at)
+
+        # A new burst inside the interval waits for the next window
+        QuizSubmission.objects.create(user=self.alice, quiz=self.quiz, score=9)
+        self.assertFalse(rebuild_if_due(interval=60))
+        self.assertTrue(rebuild_if_due(interval=0))
+        self.assertEqual(UserRank.objects.get(user=self.alice).rank, 1)
+
+    def test_leaderboard_page_rebuilds_when_no_worker_ran(self):
+        """Test that the page rebuilds a board left dirty past the worker's interval."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import QuizSubmission, UserRank, LeaderboardState
+        QuizSubmission.objects.create(user=self.alice, quiz=self.quiz, score=4)
+
+        self.client.get(reverse('leaderboard'))
+        self.assertIsNone(UserRank.objects.get(user=self.alice).rank)
+
+        LeaderboardState.objects.update(dirty_at=timezone.now() - timedelta(seconds=61))
+        self.client.get(reverse('leaderboard'))
+        self.assertEqual(UserRank.objects.get(user=self.alice).rank, 1)
+        self.assertIsNone(LeaderboardState.objects.get(name='global').dirty_at)
+
+    def test_rebuild_drops_users_without_submissions(self):
+        """Test that deleted submissions are reflected after a rebuild."""
+        from .models import QuizSubmission, UserRank, calculate_leaderboard
+        submission = QuizSubmission.objects.create(user=self.alice, quiz=self.quiz, score=2)
+        calculate_leaderboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        calculate_leaderboard()
+        self.assertFalse(UserRank.objects.filter(user=self.alice).exists())
+
+
+class LeaderboardPageTestCase(TestCase):
+    def setUp(self):
+        from .models import QuizSubmission
+        from .services.leaderboard import rebuild_leaderboard
+        category = Category.objects.create(name="Biology")
+        quiz = Quiz.objects.create(title="Cells", category=category)
+        self.users = []
+        for i in range(30):
+            user = User.objects.create(username=f'student{i}')
+            QuizSubmission.objects.create(user=user, quiz=quiz, score=i)
+            self.users.append(user)
+        rebuild_leaderboard()
+
+    @override_settings(LEADERBOARD_PAGE_SIZE=10)
+    def test_leaderboard_is_paginated(self):
+        """Test that only one page of ranks is rendered."""
+        response = self.client.get(reverse('leaderboard'), {'page': 2})
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertEqual(page[0].rank, 11)
+        self.assertEqual(page[0].quiz_count, 1)
+
+    @override_settings(LEADERBOARD_PAGE_SIZE=10)
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Test that rendering a page does not issue per-row queries."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('leaderboard'))
+        with override_settings(LEADERBOARD_PAGE_SIZE=30):
+            with CaptureQueriesContext(connection) as large:
+                self.client.get(reverse('leaderboard'))
+        self.assertEqual(len(small), len(large))
+
+    def test_around_me(self):
+        """Test that the current user sees the ranks around their own."""
+        self.client.force_login(self.users[10])
+        response = self.client.get(reverse('leaderboard'))
+        self.assertEqual(response.context['my_rank'].rank, 20)
+        self.assertEqual([rank.rank for rank in response.context['around_me']], [18, 19, 20, 21, 22])
+
+
+class TieAwareRankingTestCase(TestCase):
+    def setUp(self):
+        from .models import QuizSubmission
+        category = Category.objects.create(name="Biology")
+        quiz = Quiz.objects.create(title="Cells", category=category)
+        for username, score in [('ali', 9), ('sara', 7), ('omar', 7), ('hina', 3)]:
+            user = User.objects.create(username=username)
+            QuizSubmission.objects.create(user=user, quiz=quiz, score=score)
+
+    def ranks(self):
+        from .models import UserRank
+        return dict(UserRank.objects.values_list('user__username', 'rank'))
+
+    def test_competition_ranking(self):
+        """Test that tied users share a rank and the next place is skipped."""
+        from .services.leaderboard import rebuild_leaderboard
+        self.assertEqual(rebuild_leaderboard(), 4)
+        self.assertEqual(self.ranks(), {'ali': 1, 'sara': 2, 'omar': 2, 'hina': 4})
+
+    @override_settings(LEADERBOARD_TIE_POLICY='dense')
+    def test_dense_ranking(self):
+        """Test that dense ranking does not skip places after ties."""
+        from .services.leaderboard import rebuild_leaderboard
+        rebuild_leaderboard()
+        self.assertEqual(self.ranks(), {'ali': 1, 'sara': 2, 'omar': 2, 'hina': 3})
+
+    def test_rebuild_is_constant_in_queries(self):
+        """Test that a rebuild does not issue one statement per user."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services.leaderboard import rebuild_leaderboard
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_leaderboard()
+        self.assertLessEqual(len([q for q in queries if not q['sql'].startswith('SAVEPOINT') and not q['sql'].startswith('RELEASE')]), 2)
+
+    def test_windowed_board_shares_tie_policy(self):
+        """Test that windowed leaderboards rank ties the same way."""
+        from .services import get_windowed_leaderboard
+        board = get_windowed_leaderboard('week')
+        self.assertEqual([entry['rank'] for entry in board], [1, 2, 2, 4])
+
+    def test_bulk_fallback_matches_sql_ranking(self):
+        """Test that the ORM fallback produces the same ranks as the SQL upsert."""
+        from .services.leaderboard import rebuild_leaderboard
+        with patch('quiz.services.leaderboard.UPSERT_VENDORS', ()):
+            rebuild_leaderboard()
+        self.assertEqual(self.ranks(), {'ali': 1, 'sara': 2, 'omar': 2, 'hina': 4})
+
+
+class ScoringPolicyTestCase(TestCase):
+    def setUp(self):
+        from .models import QuizSubmission
+        category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=category)
+        self.user = User.objects.create(username='retaker')
+        for score in (6, 9, 4):
+            QuizSubmission.objects.create(user=self.user, quiz=self.quiz, score=score)
+
+    def total(self):
+        from .models import UserRank
+        from .services.leaderboard import rebuild_leaderboard
+        rebuild_leaderboard()
+        return UserRank.objects.get(user=self.user).total_score
+
+    def test_aggregate_row_per_user_and_quiz(self):
+        """Test that retakes update a single aggregate row."""
+        from .models import UserQuizScore
+        score = UserQuizScore.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual((score.attempts, score.best_score, score.latest_score, score.total_score), (3, 9, 4, 19))
+
+    def test_best_attempt_is_default(self):
+        """Test that retakes cannot farm points under the default policy."""
+        self.assertEqual(self.total(), 9)
+
+    @override_settings(LEADERBOARD_SCORING='latest')
+    def test_latest_attempt(self):
+        self.assertEqual(self.total(), 4)
+
+    @override_settings(LEADERBOARD_SCORING='sum')
+    def test_sum_of_attempts(self):
+        self.assertEqual(self.total(), 19)
+
+    def test_score_correction_resyncs_aggregate(self):
+        """Test that editing a submission recomputes the aggregate row."""
+        from .models import QuizSubmission, UserQuizScore
+        submission = QuizSubmission.objects.get(user=self.user, score=9)
+        submission.score = 2
+        submission.save()
+        self.assertEqual(UserQuizScore.objects.get(user=self.user, quiz=self.quiz).best_score, 6)
+        self.assertEqual(self.total(), 6)
+
+    def test_deleting_user_cleans_up_aggregates(self):
+        """Test that cascading deletes do not resurrect leaderboard rows."""
+        from .models import UserQuizScore, UserRank
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(UserQuizScore.objects.exists())
+        self.assertFalse(UserRank.objects.exists())
+
+
+class QuizScoreHistogramTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=category)
+        self.users = [User.objects.create(username=f'taker{i}') for i in range(4)]
+
+    def submit(self, user, score):
+        from .models import QuizSubmission
+        return QuizSubmission.objects.create(user=user, quiz=self.quiz, score=score)
+
+    def test_histogram_tracks_best_score_per_taker(self):
+        """Test that an improved retake moves the taker to a higher bucket."""
+        from .services.quiz_stats import get_score_distribution
+        self.submit(self.users[0], 3)
+        self.submit(self.users[1], 5)
+        self.submit(self.users[0], 7)
+        self.submit(self.users[0], 2)
+        self.assertEqual(get_score_distribution(self.quiz), [(5, 1), (7, 1)])
+
+    def test_percentile_and_median(self):
+        """Test percentile and median lookups against the histogram."""
+        from .services.quiz_stats import get_quiz_result_stats
+        for user, score in zip(self.users, (2, 4, 6, 8)):
+            self.submit(user, score)
+        stats = get_quiz_result_stats(self.quiz, 6)
+        self.assertEqual(stats['takers'], 4)
+        self.assertEqual(stats['percentile'], 50)
+        self.assertEqual(stats['median'], 5)
+        self.assertEqual([entry.best_score for entry in stats['top_scores']], [8, 6, 4, 2])
+
+    def test_deleted_submission_moves_taker_back(self):
+        """Test that deleting a best attempt falls back to the next best."""
+        from .services.quiz_stats import get_score_distribution
+        self.submit(self.users[0], 3)
+        best = self.submit(self.users[0], 9)
+        with self.captureOnCommitCallbacks(execute=True):
+            best.delete()
+        self.assertEqual(get_score_distribution(self.quiz), [(3, 1)])
+
+    def test_results_page_shows_context(self):
+        """Test that the results page receives the quiz statistics."""
+        self.submit(self.users[1], 1)
+        self.client.force_login(self.users[0])
+        response = self.client.post(reverse('quiz', kwargs={'quiz_id': self.quiz.id}), {'score': 4})
+        self.assertEqual(response.context['quiz_stats']['percentile'], 50)
+        self.assertContains(response, 'You beat')
+
+
+class UserStatsTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Physics")
+        self.quiz = Quiz.objects.create(title="Motion", category=category)
+        for i in range(4):
+            Question.objects.create(quiz=self.quiz, text=f"Question {i}")
+        self.empty_quiz = Quiz.objects.create(title="Draft", category=category)
+        self.user = User.objects.create(username='student')
+
+    def submit(self, quiz, score):
+        from .models import QuizSubmission
+        return QuizSubmission.objects.create(user=self.user, quiz=quiz, score=score)
+
+    def test_stats_updated_incrementally(self):
+        """Test attempts, average and best percentage after several submissions."""
+        from .models import UserStats
+        self.submit(self.quiz, 1)
+        self.submit(self.quiz, 3)
+        latest = self.submit(self.empty_quiz, 0)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.attempts, 3)
+        self.assertEqual(stats.scored_attempts, 2)
+        self.assertEqual(stats.average_percentage, 50)
+        self.assertEqual(stats.best_percentage, 75)
+        self.assertEqual(stats.best_score, 3)
+        self.assertEqual(stats.last_submitted_at, latest.submitted_at)
+
+    def test_stats_resynced_on_delete(self):
+        """Test that deleting a submission recomputes the stats row."""
+        from .models import UserStats
+        self.submit(self.quiz, 2)
+        best = self.submit(self.quiz, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            best.delete()
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.attempts, stats.best_score, stats.average_percentage), (1, 2, 50))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.quizsubmission_set.all().delete()
+        self.assertFalse(UserStats.objects.filter(user=self.user).exists())
+
+    def test_resync_keeps_identical_submissions_apart(self):
+        """Test that submissions sharing score and time are still counted separately."""
+        from .models import QuizSubmission, UserStats
+        from .services.user_stats import resync_user_stats
+        first = self.submit(self.quiz, 2)
+        self.submit(self.quiz, 2)
+        self.submit(self.quiz, 4)
+        QuizSubmission.objects.filter(user=self.user, score=2).update(submitted_at=first.submitted_at)
+
+        resync_user_stats(self.user.id)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.attempts, stats.scored_attempts), (3, 3))
+        self.assertAlmostEqual(stats.average_percentage, 200 / 3)
+
+    def test_profile_query_count_is_constant(self):
+        """Test that the profile page does not issue queries per submission."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_login(self.user)
+        url = reverse('profile', kwargs={'username': self.user.username})
+
+        self.submit(self.quiz, 1)
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(url)
+        for score in range(6):
+            self.submit(self.quiz, score % 4)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(len(one), len(many))
+        self.assertContains(response, '/4')
+
+
+class CategoryStrengthTestCase(TestCase):
+    def setUp(self):
+        self.biology = Category.objects.create(name="Biology")
+        self.physics = Category.objects.create(name="Physics")
+        self.cells = Quiz.objects.create(title="Cells", category=self.biology)
+        self.motion = Quiz.objects.create(title="Motion", category=self.physics)
+        for quiz in (self.cells, self.motion):
+            for i in range(4):
+                Question.objects.create(quiz=quiz, text=f"{quiz.title} {i}")
+        self.user = User.objects.create(username='student')
+
+    def submit(self, quiz, score, days_ago=0):
+        from django.utils import timezone
+        from datetime import timedelta
+        from .models import QuizSubmission
+        submission = QuizSubmission.objects.create(user=self.user, quiz=quiz, score=score)
+        QuizSubmission.objects.filter(pk=submission.pk).update(
+            submitted_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_accuracy_and_trend_per_category(self):
+        """Test vectorized accuracy and recent-vs-previous trend per category."""
+        from .models import UserCategoryStrength
+        from .services.category_strengths import compute_category_strengths
+        self.submit(self.cells, 1, days_ago=40)
+        self.submit(self.cells, 3, days_ago=2)
+        self.submit(self.motion, 2, days_ago=5)
+
+        with override_settings(CATEGORY_TREND_DAYS=30):
+            self.assertEqual(compute_category_strengths(), 2)
+
+        biology = UserCategoryStrength.objects.get(user=self.user, category=self.biology)
+        self.assertEqual((biology.attempts, biology.accuracy), (2, 50))
+        self.assertEqual((biology.recent_accuracy, biology.trend), (75, 50))
+        physics = UserCategoryStrength.objects.get(user=self.user, category=self.physics)
+        self.assertEqual((physics.accuracy, physics.recent_accuracy), (50, 50))
+        self.assertIsNone(physics.trend)
+
+    def test_recompute_replaces_rows(self):
+        """Test that a rerun with no submissions clears stale rows."""
+        from .models import QuizSubmission, UserCategoryStrength
+        from .services.category_strengths import compute_category_strengths
+        self.submit(self.cells, 2)
+        compute_category_strengths()
+        QuizSubmission.objects.all().delete()
+        self.assertEqual(compute_category_strengths(), 0)
+        self.assertFalse(UserCategoryStrength.objects.exists())
+
+    def test_profile_shows_panel(self):
+        """Test that the profile renders the precomputed strengths."""
+        from .services.category_strengths import compute_category_strengths
+        self.submit(self.motion, 4)
+        compute_category_strengths()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profile', kwargs={'username': self.user.username}))
+        self.assertContains(response, 'Strengths &amp; Weaknesses')
+        self.assertEqual(response.context['category_strengths'][0].accuracy, 100)
+
+
+class ActivityHistoryTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Chemistry")
+        self.quiz = Quiz.objects.create(title="Bonds", category=category)
+        for i in range(5):
+            Question.objects.create(quiz=self.quiz, text=f"Question {i}")
+        self.user = User.objects.create(username='student')
+
+    def submit(self, score):
+        from .models import QuizSubmission
+        return QuizSubmission.objects.create(user=self.user, quiz=self.quiz, score=score)
+
+    def test_daily_rollup_updated_on_submission(self):
+        """Test attempts, questions answered and correct answers per day."""
+        from django.utils import timezone
+        from .models import UserDailyActivity
+        self.submit(2)
+        self.submit(4)
+        day = UserDailyActivity.objects.get(user=self.user, date=timezone.localdate())
+        self.assertEqual((day.attempts, day.questions_answered, day.correct_answers), (2, 10, 6))
+
+    def test_daily_rollup_resynced_on_delete(self):
+        """Test that deleting submissions rolls the day back and then removes it."""
+        from .models import UserDailyActivity
+        first = self.submit(2)
+        second = self.submit(4)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        day = UserDailyActivity.objects.get(user=self.user)
+        self.assertEqual((day.attempts, day.questions_answered, day.correct_answers), (1, 5, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(UserDailyActivity.objects.exists())
+
+    def test_activity_endpoint_reads_rollup_only(self):
+        """Test the JSON endpoint never touches raw submissions."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.submit(3)
+        self.client.force_login(self.user)
+        url = reverse('profile_activity', kwargs={'username': self.user.username})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(len(data['days']), 1)
+        self.assertEqual(data['days'][0]['accuracy'], 60)
+        self.assertFalse(any('quiz_quizsubmission' in query['sql'] for query in queries))
+
+
+class SiteMetricsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=self.category)
+        Question.objects.create(quiz=self.quiz, text="Question 1")
+        Question.objects.create(quiz=self.quiz, text="Question 2")
+        Quiz.objects.create(title="Empty", category=self.category)
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+
+    def test_counters_follow_creates_deletes_and_rescores(self):
+        """Test totals, today's counts and average from the signal-maintained counters."""
+        from .models import QuizSubmission
+        from .services.metrics import compute_site_metrics
+        first = QuizSubmission.objects.create(user=self.admin, quiz=self.quiz, score=2)
+        second = QuizSubmission.objects.create(user=self.admin, quiz=self.quiz, score=1)
+        second.score = 0
+        second.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        metrics = compute_site_metrics()
+        self.assertEqual(metrics['total_users'], 1)
+        self.assertEqual(metrics['total_quizzes'], 2)
+        self.assertEqual(metrics['total_questions'], 2)
+        self.assertEqual(metrics['total_submissions'], 1)
+        self.assertEqual(metrics['today_submissions'], 1)
+        self.assertEqual(metrics['today_questions'], 2)
+        self.assertEqual(metrics['avg_score'], 0)
+        self.assertEqual(metrics['quizzes_with_no_questions'], 1)
+
+    def test_snapshot_is_cached(self):
+        """Test that the snapshot is served from cache within the TTL."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services.metrics import get_site_metrics
+        get_site_metrics()
+        Quiz.objects.create(title="New", category=self.category)
+        # The only query is the read from the shared database cache
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_site_metrics()['total_quizzes'], 2)
+        self.assertEqual([query['sql'] for query in queries if 'django_cache' not in query['sql']], [])
+
+    def test_reconcile_matches_signals(self):
+        """Test that an exact recount agrees with the incremental counters."""
+        from .services.metrics import compute_site_metrics, reconcile_counters
+        before = compute_site_metrics()
+        reconcile_counters()
+        after = compute_site_metrics()
+        for key in ('total_users', 'total_quizzes', 'total_questions', 'total_submissions', 'today_submissions'):
+            self.assertEqual(before[key], after[key])
+
+    def test_dashboards_use_snapshot(self):
+        """Test that both dashboards render the shared figures."""
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:index'))
+        self.assertEqual(response.context['total_quizzes'], 2)
+        self.assertEqual(response.context['quizzes_with_no_questions'], 1)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_questions'], 2)
+
+
+class DailyMetricsTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        self.today = timezone.localdate()
+        category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=category)
+        Question.objects.create(quiz=self.quiz, text="Question 1")
+        self.user = User.objects.create(username='student')
+
+    def backdate(self, days_ago, score):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import QuizSubmission
+        submission = QuizSubmission.objects.create(user=self.user, quiz=self.quiz, score=score)
+        QuizSubmission.objects.filter(pk=submission.pk).update(
+            submitted_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_backfill_range_with_running_totals(self):
+        """Test that a backfill writes every day with cumulative totals."""
+        from datetime import timedelta
+        from django.core.management import call_command
+        from .models import AdminDailyMetric
+        self.backdate(3, 2)
+        self.backdate(1, 0)
+        self.backdate(1, 1)
+        start = self.today - timedelta(days=4)
+        call_command('compute_daily_metrics', start=start.isoformat(), end=self.today.isoformat(), stdout=StringIO())
+
+        rows = list(AdminDailyMetric.objects.order_by('date').values_list('submissions_today', 'total_submissions'))
+        self.assertEqual(rows, [(0, 0), (1, 1), (0, 1), (2, 3), (0, 3)])
+        self.assertEqual(float(AdminDailyMetric.objects.get(date=self.today).avg_score), 1)
+
+    def test_incremental_run_resumes_from_last_day(self):
+        """Test that later runs only recompute from the last computed date."""
+        from datetime import timedelta
+        from django.core.management import call_command
+        from .models import AdminDailyMetric
+        AdminDailyMetric.objects.create(
+            date=self.today - timedelta(days=10), total_users=99, total_quizzes=0,
+            total_questions=0, total_submissions=0, submissions_today=0,
+        )
+        AdminDailyMetric.objects.create(
+            date=self.today - timedelta(days=2), total_users=0, total_quizzes=0,
+            total_questions=0, total_submissions=0, submissions_today=0,
+        )
+        self.backdate(1, 1)
+        call_command('compute_daily_metrics', stdout=StringIO())
+
+        self.assertEqual(AdminDailyMetric.objects.count(), 4)
+        self.assertEqual(AdminDailyMetric.objects.get(date=self.today - timedelta(days=10)).total_users, 99)
+        latest = AdminDailyMetric.objects.get(date=self.today)
+        self.assertEqual((latest.total_users, latest.total_questions, latest.total_submissions), (1, 1, 1))
+
+    def test_rejects_impossible_dates(self):
+        """Test that a well-formed but impossible date is a command error, not a traceback."""
+        from django.core.management import CommandError, call_command
+        with self.assertRaisesMessage(CommandError, "--start must be a date in YYYY-MM-DD format"):
+            call_command('compute_daily_metrics', start='2025-02-30', stdout=StringIO())
+
+    def test_incremental_run_continues_from_stored_totals(self):
+        """Test that running totals carry on from the previous day's row instead of re-counting."""
+        from datetime import timedelta
+        from .models import AdminDailyMetric
+        from .services.daily_metrics import compute_daily_metrics
+        AdminDailyMetric.objects.create(
+            date=self.today - timedelta(days=2), total_users=50, total_quizzes=5, total_questions=20,
+            total_submissions=10, submissions_today=0, score_sum=30,
+        )
+        self.backdate(0, 6)
+        compute_daily_metrics(self.today - timedelta(days=1), self.today)
+
+        latest = AdminDailyMetric.objects.get(date=self.today)
+        self.assertEqual(
+            (latest.total_users, latest.total_quizzes, latest.total_questions, latest.total_submissions, latest.score_sum),
+            (51, 6, 21, 11, 36),
+        )
+        self.assertEqual(float(latest.avg_score), round(36 / 11, 2))
+
+
+class MetricsTimeseriesTestCase(TestCase):
+    def setUp(self):
+        from datetime import date, timedelta
+        from .models import AdminDailyMetric
+        start = date(2025, 1, 1)
+        for i in range(70):
+            AdminDailyMetric.objects.create(
+                date=start + timedelta(days=i), total_users=i + 1, total_quizzes=1,
+                total_questions=1, total_submissions=i, submissions_today=1,
+            )
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        self.url = reverse('metrics_timeseries_api')
+
+    def test_monthly_buckets(self):
+        """Test that months sum per-day counts and keep the last running total."""
+        from .services.timeseries import get_metric_series
+        series = get_metric_series('month')
+        self.assertEqual([point['t'] for point in series['points']], ['2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual([point['submissions_today'] for point in series['points']], [31, 28, 11])
+        self.assertEqual(series['points'][0]['total_users'], 31)
+
+    def test_max_points_downsampling(self):
+        """Test that daily points are merged down to the requested maximum."""
+        from .services.timeseries import get_metric_series
+        series = get_metric_series('day', max_points=10)
+        self.assertEqual(len(series['points']), 10)
+        self.assertTrue(series['downsampled'])
+        self.assertEqual(sum(point['submissions_today'] for point in series['points']), 70)
+        self.assertEqual(series['points'][-1]['total_users'], 70)
+
+    def test_hourly_submissions(self):
+        """Test submissions per hour with empty hours filled in."""
+        from .models import QuizSubmission
+        from .services.timeseries import get_hourly_submissions
+        quiz = Quiz.objects.create(title="Cells", category=Category.objects.create(name="Biology"))
+        QuizSubmission.objects.create(user=self.staff, quiz=quiz, score=1)
+        series = get_hourly_submissions(hours=6)
+        self.assertEqual([point['submissions'] for point in series['points']], [0, 0, 0, 0, 0, 1])
+
+    def test_api_etag_and_access(self):
+        """Test staff-only access and 304 revalidation with the returned ETag."""
+        self.client.force_login(User.objects.create(username='student'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'bucket': 'week', 'max_points': 5})
+        self.assertLessEqual(len(response.json()['points']), 5)
+        etag = response['ETag']
+        cached = self.client.get(self.url, {'bucket': 'week', 'max_points': 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get(self.url, {'bucket': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2025-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'end': 'yesterday'}).status_code, 400)
+
+
+class ItemAnalysisTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=category)
+        self.questions = []
+        for i in range(3):
+            question = Question.objects.create(quiz=self.quiz, text=f"Question {i}")
+            Choice.objects.create(question=question, text="right", is_correct=True)
+            Choice.objects.create(question=question, text="wrong")
+            self.questions.append(question)
+        self.users = [User.objects.create(username=f'taker{i}') for i in range(4)]
+
+    def take(self, user, picks):
+        self.client.force_login(user)
+        data = {str(q.id): pick for q, pick in zip(self.questions, picks) if pick}
+        data['score'] = sum(pick == 'right' for pick in picks)
+        self.client.post(reverse('quiz', kwargs={'quiz_id': self.quiz.id}), data)
+
+    def test_answers_recorded_and_shown_on_review(self):
+        """Test that submitted answers are stored and reused by the review page."""
+        from .models import SubmissionAnswer
+        self.take(self.users[0], ['right', 'wrong', None])
+        answers = SubmissionAnswer.objects.order_by('question_id')
+        self.assertEqual([a.is_correct for a in answers], [True, False, False])
+        self.assertIsNone(answers[2].choice)
+        response = self.client.get(reverse('quiz', kwargs={'quiz_id': self.quiz.id}), {'review': '1'})
+        self.assertEqual(response.context['user_answers'][self.questions[1].id], 'wrong')
+
+    def test_matrix_statistics(self):
+        """Test p-values, rest-score point-biserial and KR-20 against hand-computed values."""
+        import numpy as np
+        from .services.item_analysis import analyze_matrix
+        matrix = np.array([[1, 1, 1], [1, 1, 0], [1, 0, 0], [0, 0, 0]])
+        stats = analyze_matrix(matrix)
+        np.testing.assert_allclose(stats['difficulty'], [0.75, 0.5, 0.25])
+        rest = matrix.sum(axis=1)[:, None] - matrix
+        expected = [np.corrcoef(matrix[:, i], rest[:, i])[0, 1] for i in range(3)]
+        np.testing.assert_allclose(stats['discrimination'], expected)
+        self.assertAlmostEqual(stats['kr20'], 1.5 * (1 - 0.625 / 1.25))
+
+    def test_constant_item_has_no_discrimination(self):
+        """Test that an item everyone answers alike yields no discrimination."""
+        import numpy as np
+        from .services.item_analysis import analyze_matrix
+        stats = analyze_matrix(np.array([[1, 1], [1, 0]]))
+        self.assertTrue(np.isnan(stats['discrimination'][0]))
+
+    def test_incremental_runs_only_changed_quizzes(self):
+        """Test that quizzes without new submissions are skipped."""
+        from .models import QuestionItemAnalysis, QuizItemAnalysis
+        from .services.item_analysis import analyze_items
+        for user, picks in zip(self.users, (['right'] * 3, ['right', 'right', 'wrong'], ['right', 'wrong', 'wrong'], ['wrong'] * 3)):
+            self.take(user, picks)
+        self.assertEqual(list(analyze_items()), [self.quiz.id])
+        self.assertEqual(QuizItemAnalysis.objects.get(quiz=self.quiz).attempts, 4)
+        self.assertEqual(QuestionItemAnalysis.objects.get(question=self.questions[0]).difficulty, 0.75)
+        self.assertEqual(analyze_items(), {})
+
+        self.take(self.users[0], ['wrong'] * 3)
+        self.assertEqual(analyze_items()[self.quiz.id]['attempts'], 5)
+
+
+class DistractorAnalysisTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Biology")
+        self.quiz = Quiz.objects.create(title="Cells", category=category)
+        self.question = Question.objects.create(quiz=self.quiz, text="Powerhouse of the cell?")
+        self.key = Choice.objects.create(question=self.question, text="Mitochondria", is_correct=True)
+        self.lure = Choice.objects.create(question=self.question, text="Nucleus")
+        self.dead = Choice.objects.create(question=self.question, text="Wall")
+        for i in range(3):
+            other = Question.objects.create(quiz=self.quiz, text=f"Filler {i}")
+            Choice.objects.create(question=other, text="right", is_correct=True)
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+
+    def take(self, username, pick, score):
+        self.client.force_login(User.objects.create(username=username))
+        self.client.post(reverse('quiz', kwargs={'quiz_id': self.quiz.id}), {str(self.question.id): pick, 'score': score})
+
+    def test_counters_split_by_scorer_group(self):
+        """Test pick counters overall and for the top and bottom scorer groups."""
+        from .models import ChoiceStats, QuizSubmission
+        # Earlier takers (without stored answers) shape the score histogram
+        for i, score in enumerate((1, 2, 3)):
+            QuizSubmission.objects.create(user=User.objects.create(username=f'seed{i}'), quiz=self.quiz, score=score)
+        self.take('low', 'Nucleus', 0)
+        self.take('high', 'Mitochondria', 4)
+        self.take('mid', 'Mitochondria', 2)
+        key, lure = ChoiceStats.objects.get(choice=self.key), ChoiceStats.objects.get(choice=self.lure)
+        self.assertEqual((key.picks, key.top_picks, key.bottom_picks), (2, 1, 0))
+        self.assertEqual((lure.picks, lure.top_picks, lure.bottom_picks), (1, 0, 1))
+        self.assertFalse(ChoiceStats.objects.filter(choice=self.dead).exists())
+
+    def test_admin_column_and_filter(self):
+        """Test that the admin reads the counters and filters weak choices."""
+        self.take('low', 'Nucleus', 0)
+        self.take('high', 'Mitochondria', 4)
+        self.client.force_login(self.admin)
+        url = reverse('admin:quiz_choice_changelist')
+        response = self.client.get(url)
+        self.assertContains(response, '50% picked')
+        response = self.client.get(url, {'distractor': 'unpicked'})
+        self.assertEqual([c.pk for c in response.context['cl'].result_list], [self.dead.pk])
+        response = self.client.get(reverse('admin:quiz_question_changelist'), {'distractors': 'weak'})
+        self.assertEqual([q.pk for q in response.context['cl'].result_list], [self.question.pk])
+
+
+class CohortRetentionTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        self.this_week = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        self.cohort = self.this_week - timedelta(weeks=2)
+        joined = timezone.make_aware(timezone.datetime.combine(self.cohort, timezone.datetime.min.time())) + timedelta(hours=12)
+        self.users = [User.objects.create(username=f'student{i}', date_joined=joined) for i in range(4)]
+
+    def activity(self, user, weeks_after):
+        from datetime import timedelta
+        from .models import UserDailyActivity
+        UserDailyActivity.objects.create(user=user, date=self.cohort + timedelta(weeks=weeks_after, days=1), attempts=1)
+
+    def test_retention_curve(self):
+        """Test cohort size, active users per week offset and unobservable weeks."""
+        from .models import CohortRetention
+        from .services.cohorts import compute_cohort_retention
+        for user in self.users:
+            self.activity(user, 0)
+        self.activity(self.users[0], 1)
+        self.activity(self.users[1], 1)
+        self.activity(self.users[0], 2)
+
+        self.assertEqual(compute_cohort_retention(max_weeks=6), 3)
+        curve = list(
+            CohortRetention.objects.filter(cohort_week=self.cohort)
+            .order_by('week_offset').values_list('cohort_size', 'active_users', 'retention')
+        )
+        self.assertEqual(curve, [(4, 4, 1.0), (4, 2, 0.5), (4, 1, 0.25)])
+
+    def test_dashboard_shows_table(self):
+        """Test that the admin dashboard renders the precomputed cohorts."""
+        from .services.cohorts import compute_cohort_retention
+        self.activity(self.users[0], 0)
+        compute_cohort_retention()
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        response = self.client.get(reverse('admin:index'))
+        self.assertContains(response, 'Weekly cohort retention')
+        self.assertContains(response, '25%')
+
+
+class RateLimiterTestCase(TestCase):
+    def test_token_bucket_paces_requests(self):
+        """Test that reservations beyond the burst wait for the refill."""
+        from .services.rate_limit import TokenBucket
+        now = [0.0]
+        bucket = TokenBucket(60, capacity=2, clock=lambda: now[0])
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        self.assertAlmostEqual(bucket.reserve(), 2.0)
+        now[0] = 10.0
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_limiter_waits_for_slowest_bucket(self):
+        """Test that the limiter sleeps for the larger of the request and token waits."""
+        from .services.rate_limit import RateLimiter
+        slept = []
+        limiter = RateLimiter(600, 6000, clock=lambda: 0.0, sleep=slept.append)
+        limiter.acquire(100)
+        limiter.acquire(100)
+        self.assertAlmostEqual(slept[-1], 1.0)
+        limiter.settle(100, 0)
+        self.assertAlmostEqual(limiter.acquire(100), 1.0)
+
+
+@override_settings(EXPLANATION_PROVIDER='fake', EXPLANATION_FAKE_LATENCY=0, EXPLANATION_FAKE_OUTPUT_WORDS=10)
+class ConcurrentGenerationTestCase(TransactionTestCase):
+    def test_workers_process_every_question(self):
+        """Test that the concurrent mode explains each question, every upstream call paced by the limiter."""
+        import threading
+        from django.core.management import call_command
+        from .management.commands.generate_explanations import Command
+        from .services.rate_limit import RateLimiter
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        for i in range(6):
+            question = Question.objects.create(quiz=quiz, text=f"Question {i}")
+            Choice.objects.create(question=question, text="Right", is_correct=True)
+            Choice.objects.create(question=question, text="Wrong", is_correct=False)
+
+        # The test database is SQLite, which cannot take concurrent writers
+        database_lock = threading.Lock()
+        generate = Command._generate
+
+        def generate_serially(command, generator, questions):
+            with database_lock:
+                return generate(command, generator, questions)
+
+        out = StringIO()
+        with patch.object(RateLimiter, 'acquire', autospec=True, side_effect=RateLimiter.acquire) as acquire, \
+                patch.object(Command, '_generate', generate_serially):
+            call_command('generate_explanations', workers=3, pack_size=2, rpm=6000, tpm=1_000_000, stdout=out)
+
+        self.assertIn("Successful: 6", out.getvalue())
+        self.assertFalse(Question.objects.filter(ai_explanation__isnull=True).exists())
+        # One reservation per packed request, sized for its prompt and output
+        self.assertEqual(acquire.call_count, 3)
+        self.assertTrue(all(call.args[1] > 0 for call in acquire.call_args_list))
+
+
+@override_settings(GEMINI_API_KEY='test_key', GEMINI_MODEL='gemini-1.5-flash', GEMINI_MAX_TOKENS=1000, GEMINI_TEMPERATURE=0.7, EXPLANATION_CACHE_TIMEOUT=86400)
+class PackedExplanationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        self.questions = []
+        for i in range(3):
+            question = Question.objects.create(quiz=quiz, text=f"Question {i}")
+            Choice.objects.create(question=question, text="Right", is_correct=True)
+            Choice.objects.create(question=question, text="Wrong", is_correct=False)
+            self.questions.append(question)
+
+    def generate(self, *responses):
+        from .services.providers import reset_providers
+        with patch('quiz.services.providers.genai.GenerativeModel') as model_class:
+            reset_providers()
+            model_class.return_value.generate_content.side_effect = [MagicMock(text=text) for text in responses]
+            results = ExplanationGenerator().generate_explanations(self.questions)
+        return results, model_class.return_value.generate_content
+
+    def test_one_request_for_all_questions(self):
+        """Test that a packed JSON response is split back onto each question."""
+        payload = json.dumps({str(question.id): f"Because {question.id}" for question in self.questions})
+        results, generate_content = self.generate(f"```json\n{payload}\n```")
+
+        self.assertEqual(generate_content.call_count, 1)
+        prompt = generate_content.call_args[0][0]
+        self.assertEqual(prompt.count("Correct Answer: A"), 3)
+        for question in self.questions:
+            question.refresh_from_db()
+            self.assertEqual(results[question.id], f"Because {question.id}")
+            self.assertEqual(question.ai_explanation, f"Because {question.id}")
+
+    def test_fallback_to_single_requests(self):
+        """Test that unparsable or incomplete packed responses fall back per question."""
+        first, second, third = self.questions
+        results, generate_content = self.generate(
+            json.dumps({str(first.id): "Packed", "999": "Unknown"}), "Single 2", "Single 3",
+        )
+        self.assertEqual(generate_content.call_count, 3)
+        self.assertEqual(results, {first.id: "Packed", second.id: "Single 2", third.id: "Single 3"})
+
+        from .models import SharedExplanation
+        from .services.explanation_store import explanation_cache
+        explanation_cache.clear()
+        SharedExplanation.objects.all().delete()
+        results, generate_content = self.generate("not json", "A", "B", "C")
+        self.assertEqual(generate_content.call_count, 4)
+        self.assertEqual(sorted(results.values()), ["A", "B", "C"])
+
+
+    def test_fallback_requests_are_rate_limited(self):
+        """Test that every upstream call, fallbacks included, takes its own limiter reservation."""
+        from .services.providers import reset_providers
+        limiter = MagicMock()
+        with patch('quiz.services.providers.genai.GenerativeModel') as model_class:
+            reset_providers()
+            model_class.return_value.generate_content.side_effect = [
+                MagicMock(text=text) for text in ("not json", "A", "B", "C")
+            ]
+            ExplanationGenerator(limiter=limiter).generate_explanations(self.questions)
+        self.assertEqual(limiter.acquire.call_count, 4)
+        self.assertEqual(limiter.settle.call_count, 4)
+
+
+@override_settings(GEMINI_API_KEY='test_key', GEMINI_MODEL='gemini-1.5-flash', GEMINI_MAX_TOKENS=1000, GEMINI_TEMPERATURE=0.7, EXPLANATION_CACHE_TIMEOUT=86400)
+class SharedExplanationTestCase(TestCase):
+    def setUp(self):
+        from .services.providers import reset_providers
+        cache.clear()
+        reset_providers()
+        category = Category.objects.create(name="Test")
+        self.copies = []
+        for title, text in [("Quiz 1", "What is the  capital of France?"), ("Quiz 2", "what is the capital of france?")]:
+            question = Question.objects.create(quiz=Quiz.objects.create(title=title, description="", category=category), text=text)
+            Choice.objects.create(question=question, text="Paris", is_correct=True)
+            Choice.objects.create(question=question, text="London", is_correct=False)
+            self.copies.append(question)
+
+    def test_content_hash_ignores_formatting_only(self):
+        """Test that copies hash alike and a different correct answer does not."""
+        from .services.explanation_store import content_hash
+        first, second = self.copies
+        self.assertEqual(content_hash(first), content_hash(second))
+        second.choice_set.update(is_correct=False)
+        Choice.objects.filter(question=second, text="London").update(is_correct=True)
+        self.assertNotEqual(content_hash(first), content_hash(second))
+
+    def test_copies_reuse_stored_explanation(self):
+        """Test that a duplicate question is explained from the store without a request."""
+        from .models import SharedExplanation
+        first, second = self.copies
+        with patch('quiz.services.providers.genai.GenerativeModel') as model_class:
+            model_class.return_value.generate_content.return_value = MagicMock(text="Paris is the capital.")
+            generator = ExplanationGenerator()
+            self.assertEqual(generator.generate_explanation(first), "Paris is the capital.")
+            self.assertEqual(generator.generate_explanation(second), "Paris is the capital.")
+        self.assertEqual(model_class.return_value.generate_content.call_count, 1)
+        second.refresh_from_db()
+        self.assertEqual(second.ai_explanation, "Paris is the capital.")
+        self.assertEqual(second.ai_cost, 0)
+        self.assertEqual(SharedExplanation.objects.get().reuse_count, 1)
+
+    def test_bulk_run_generates_duplicates_once(self):
+        """Test that the command sends one request for identical questions."""
+        from django.core.management import call_command
+        with patch('quiz.services.providers.genai.GenerativeModel') as model_class:
+            model_class.return_value.generate_content.return_value = MagicMock(text="Paris is the capital.")
+            call_command('generate_explanations', delay=0, stdout=StringIO())
+        self.assertEqual(model_class.return_value.generate_content.call_count, 1)
+        self.assertEqual(Question.objects.filter(ai_explanation="Paris is the capital.").count(), 2)
+
+    def test_force_generates_afresh(self):
+        """Test that --force sends a new request instead of reusing the stored explanation."""
+        from django.core.management import call_command
+        from .models import SharedExplanation
+        with patch('quiz.services.providers.genai.GenerativeModel') as model_class:
+            model_class.return_value.generate_content.return_value = MagicMock(text="Paris is the capital.")
+            call_command('generate_explanations', delay=0, stdout=StringIO())
+            model_class.return_value.generate_content.return_value = MagicMock(text="Paris, on the Seine.")
+            out = StringIO()
+            call_command('generate_explanations', delay=0, force=True, stdout=out)
+        self.assertEqual(model_class.return_value.generate_content.call_count, 2)
+        self.assertIn("Total questions processed: 1", out.getvalue())
+        self.assertEqual(Question.objects.filter(ai_explanation="Paris, on the Seine.").count(), 2)
+        self.assertEqual(SharedExplanation.objects.get().explanation, "Paris, on the Seine.")
+
+
+class SingleFlightExplanationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='student')
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        self.question = Question.objects.create(quiz=quiz, text="Test question?")
+        from .models import QuizSubmission
+        QuizSubmission.objects.create(user=self.user, quiz=quiz, score=1)
+
+    def test_waiters_share_one_generation(self):
+        """Test that a request arriving during generation reuses its result."""
+        from .services.explanation_store import explanation_cache
+        from .services.single_flight import READY, generate_once, lock_key
+        cache.add(lock_key(self.question), 'other', 60)
+        generate = MagicMock()
+
+        def finish(seconds):
+            explanation_cache.set(self.question.get_cache_key(), "Shared explanation")
+            cache.delete(lock_key(self.question))
+
+        with patch('quiz.services.single_flight.time.sleep', side_effect=finish):
+            self.assertEqual(generate_once(self.question, generate, wait=5), (READY, "Shared explanation"))
+        generate.assert_not_called()
+
+    def test_leader_generates_and_releases_lock(self):
+        """Test that the first request generates once and frees the lock."""
+        from .services.single_flight import READY, generate_once, is_generating
+        generate = MagicMock(return_value="Fresh explanation")
+        self.assertEqual(generate_once(self.question, generate), (READY, "Fresh explanation"))
+        generate.assert_called_once_with(self.question)
+        self.assertFalse(is_generating(self.question))
+
+    def test_lock_is_shared_between_processes(self):
+        """Test that the lock lives in the database, where another worker process sees it."""
+        from django.core.cache import caches
+        from django.db import connection
+        from .services.single_flight import acquire_lock, generate_once, lock_key, PENDING
+        self.assertTrue(acquire_lock(self.question))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM django_cache WHERE cache_key LIKE %s", [f"%{lock_key(self.question)}"])
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        # A fresh backend built from the settings, as in another gunicorn worker
+        generate = MagicMock()
+        with patch('quiz.services.single_flight.cache', caches.create_connection('default')):
+            self.assertEqual(generate_once(self.question, generate, wait=0), (PENDING, None))
+        generate.assert_not_called()
+
+    @override_settings(EXPLANATION_PROVIDER='fake', EXPLANATION_FAKE_LATENCY=0)
+    def test_explanations_are_cached_apart_from_locks(self):
+        """Test that explanation texts fill their own table, so culling it cannot evict locks or breaker state."""
+        from django.db import connection
+        from .services import ExplanationGenerator
+        self.assertTrue(ExplanationGenerator().generate_explanation(self.question))
+
+        key = f"%{self.question.get_cache_key()}"
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM explanation_cache WHERE cache_key LIKE %s", [key])
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("SELECT COUNT(*) FROM django_cache WHERE cache_key LIKE %s", [key])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    @override_settings(EXPLANATION_WAIT_SECONDS=0)
+    def test_api_returns_pending_then_result(self):
+        """Test the 202 pending response and polling the status endpoint."""
+        from .services.explanation_store import explanation_cache
+        from .services.single_flight import lock_key
+        cache.add(lock_key(self.question), 'other', 60)
+        self.client.force_login(self.user)
+
+        with patch('quiz.services.ExplanationGenerator') as generator_class:
+            response = self.client.post(reverse('generate_explanation_api', kwargs={'question_id': self.question.id}))
+        generator_class.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        poll_url = response.json()['poll_url']
+        self.assertEqual(self.client.get(poll_url).json()['status'], 'pending')
+
+        explanation_cache.set(self.question.get_cache_key(), "Shared explanation")
+        cache.delete(lock_key(self.question))
+        data = self.client.get(poll_url).json()
+        self.assertEqual(data['status'], 'ready')
+        self.assertEqual(data['explanation'], "Shared explanation")
+
+
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_opens_fails_fast_and_probes(self):
+        """Test the closed, open and half-open transitions."""
+        from .services.circuit_breaker import CircuitBreaker, CircuitOpenError
+        breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, window=60, open_seconds=30)
+        failing = MagicMock(side_effect=ConnectionError("down"))
+
+        now = [1200.0]
+        # Only the breaker's clock is faked; the cache keeps real expiry times
+        with patch('quiz.services.circuit_breaker.time') as clock:
+            clock.time.side_effect = lambda: now[0]
+            self.assertEqual(breaker.call(lambda: 'ok'), 'ok')
+            for _ in range(3):
+                with self.assertRaises(ConnectionError):
+                    breaker.call(failing)
+            self.assertEqual(breaker.state, 'open')
+            with self.assertRaises(CircuitOpenError):
+                breaker.call(failing)
+            self.assertEqual(failing.call_count, 3)
+
+            now[0] += 31
+            self.assertEqual(breaker.state, 'half-open')
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_success()
+            self.assertEqual(breaker.state, 'closed')
+
+    def test_open_circuit_is_seen_by_other_processes(self):
+        """Test that a tripped breaker is open for a backend built separately, as in another worker."""
+        from django.core.cache import caches
+        from .services.circuit_breaker import CircuitBreaker
+        CircuitBreaker('test', open_seconds=30).trip()
+        with patch('quiz.services.circuit_breaker.cache', caches.create_connection('default')):
+            self.assertEqual(CircuitBreaker('test', open_seconds=30).state, 'open')
+
+    @override_settings(GEMINI_API_KEY='test_key', GEMINI_MODEL='gemini-1.5-flash', GEMINI_MAX_TOKENS=1000, GEMINI_TEMPERATURE=0.7, EXPLANATION_CACHE_TIMEOUT=86400)
+    def test_generator_skips_failed_questions_and_open_circuit(self):
+        """Test negative caching per question and failing fast without DB writes."""
+        from .services.circuit_breaker import CircuitBreaker
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        first = Question.objects.create(quiz=quiz, text="First?")
+        second = Question.objects.create(quiz=quiz, text="Second?")
+
+        with patch('quiz.services.providers.genai.GenerativeModel') as model_class:
+            generate_content = model_class.return_value.generate_content
+            generate_content.side_effect = Exception("Quota exceeded")
+            generator = ExplanationGenerator()
+            self.assertIsNone(generator.generate_explanation(first))
+            self.assertIsNone(generator.generate_explanation(first))
+            self.assertEqual(generate_content.call_count, 1)
+
+            CircuitBreaker('gemini').trip()
+            with patch.object(Question, 'save') as save:
+                self.assertIsNone(generator.generate_explanation(second))
+            save.assert_not_called()
+            self.assertEqual(generate_content.call_count, 1)
+            self.assertIn("temporarily unavailable", second.ai_error)
+
+
+@override_settings(EXPLANATION_PROVIDER='fake', EXPLANATION_FAKE_LATENCY=0, EXPLANATION_FAKE_OUTPUT_WORDS=5)
+class FakeProviderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        self.questions = [Question.objects.create(quiz=quiz, text=f"Question {i}?") for i in range(3)]
+
+    @override_settings(GEMINI_API_KEY=None)
+    def test_generator_works_offline(self):
+        """Test that the fake provider needs no API key and answers packed prompts."""
+        generator = ExplanationGenerator()
+        self.assertEqual(generator.model_name, 'fake')
+        self.assertEqual(generator.generate_explanation(self.questions[0]), "lorem lorem lorem lorem lorem")
+
+        results = generator.generate_explanations(self.questions[1:])
+        self.assertEqual(set(results), {question.id for question in self.questions[1:]})
+        self.assertTrue(all(results.values()))
+
+    def test_incomplete_provider_fails_on_creation(self):
+        """Test that a provider class without generate() is rejected when it is built."""
+        from .services.providers import ExplanationProvider, get_provider
+
+        class Incomplete(ExplanationProvider):
+            model_name = 'incomplete'
+
+        with patch('quiz.services.providers.import_string', return_value=Incomplete):
+            with self.settings(EXPLANATION_PROVIDER='example.providers.Incomplete'):
+                with self.assertRaises(TypeError):
+                    get_provider()
+
+    @override_settings(EXPLANATION_FAKE_ERROR_RATE=1.0)
+    def test_configurable_errors(self):
+        """Test that the fake error rate surfaces as generation failures."""
+        self.assertIsNone(ExplanationGenerator().generate_explanation(self.questions[0]))
+        self.questions[0].refresh_from_db()
+        self.assertIn("Fake provider error", self.questions[0].ai_error)
+
+
+    @override_settings(EXPLANATION_PROVIDER='gemini', GEMINI_API_KEY='test_key')
+    def test_gemini_client_shared_across_requests(self):
+        """Test that generators reuse one configured client until a setting changes."""
+        from .services.providers import reset_providers
+        with patch('quiz.services.providers.genai') as mock_genai:
+            reset_providers()
+            first, second = ExplanationGenerator(), ExplanationGenerator()
+            self.assertIs(first.provider, second.provider)
+            mock_genai.configure.assert_called_once_with(api_key='test_key')
+            self.assertEqual(mock_genai.GenerativeModel.call_count, 1)
+
+            with self.settings(GEMINI_MODEL='gemini-1.5-pro'):
+                self.assertEqual(ExplanationGenerator().model_name, 'gemini-1.5-pro')
+            self.assertEqual(mock_genai.GenerativeModel.call_count, 2)
+
+
+@override_settings(
+    EXPLANATION_PROVIDER='fake', EXPLANATION_FAKE_LATENCY=0, EXPLANATION_FAKE_OUTPUT_WORDS=100,
+    GEMINI_INPUT_PRICE_PER_MILLION=1.0, GEMINI_OUTPUT_PRICE_PER_MILLION=2.0,
+)
+class TokenLedgerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        self.question = Question.objects.create(quiz=quiz, text="What is the capital of France?")
+
+    def test_usage_is_ledgered_and_counted(self):
+        """Test the ledger entry, the running totals and the question's cost."""
+        from .models import TokenLedgerEntry
+        self.assertIsNotNone(ExplanationGenerator().generate_explanation(self.question))
+
+        entry = TokenLedgerEntry.objects.get()
+        self.assertEqual(entry.question, self.question)
+        self.assertEqual(entry.output_tokens, 130)
+        expected = (entry.prompt_tokens * 1.0 + 130 * 2.0) / 1_000_000
+        self.question.refresh_from_db()
+        self.assertAlmostEqual(float(self.question.ai_cost), expected, places=6)
+
+        stats = ExplanationGenerator().get_generation_stats()
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['explanations_generated'], 1)
+        self.assertEqual(stats['output_tokens'], 130)
+        self.assertAlmostEqual(stats['total_cost'], expected)
+        self.assertAlmostEqual(stats['spent_today'], expected)
+
+    @override_settings(EXPLANATION_DAILY_BUDGET=0.0001)
+    def test_budget_is_enforced_before_the_call(self):
+        """Test that a call that could exceed the budget is never made."""
+        from .models import TokenLedgerEntry
+        with patch('quiz.services.providers.FakeProvider.generate') as generate:
+            self.assertIsNone(ExplanationGenerator().generate_explanation(self.question))
+        generate.assert_not_called()
+        self.assertIn("Daily explanation budget", self.question.ai_error)
+        self.assertFalse(TokenLedgerEntry.objects.exists())
+
+    @override_settings(EXPLANATION_DAILY_BUDGET=0.003)
+    def test_concurrent_reservations_cannot_overshoot(self):
+        """Test that an outstanding reservation counts against the budget until released."""
+        from .services.token_ledger import BudgetExceededError, get_spend, release_budget, reserve_budget
+        first = reserve_budget(0.002)
+        with self.assertRaises(BudgetExceededError):
+            reserve_budget(0.002)
+        self.assertAlmostEqual(get_spend()['today'], 0.002)
+
+        release_budget(first)
+        self.assertEqual(get_spend()['today'], 0)
+        release_budget(reserve_budget(0.002))
+
+    def test_stats_api_reads_counters(self):
+        """Test that the staff stats endpoint works without a configured provider."""
+        from .services.token_ledger import record_usage
+        record_usage('gemini-1.5-flash', 1000, 500, questions=2)
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+        with self.settings(EXPLANATION_PROVIDER='gemini', GEMINI_API_KEY=None):
+            stats = self.client.get(reverse('explanation_stats_api')).json()['stats']
+        self.assertEqual(stats['explanations_generated'], 2)
+        self.assertAlmostEqual(stats['total_cost'], 0.002)
+        self.assertAlmostEqual(stats['average_cost'], 0.001)
+
+
+@override_settings(EXPLANATION_PROVIDER='fake', EXPLANATION_FAKE_LATENCY=0, EXPLANATION_FAKE_OUTPUT_WORDS=12)
+class StreamingExplanationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='student')
+        quiz = Quiz.objects.create(title="Test Quiz", description="Test", category=Category.objects.create(name="Test"))
+        self.question = Question.objects.create(quiz=quiz, text="Test question?")
+        from .models import QuizSubmission
+        QuizSubmission.objects.create(user=self.user, quiz=quiz, score=1)
+        self.client.force_login(self.user)
+
+    def stream(self, token=None):
+        from .views import _stream_token
+        url = reverse('stream_explanation_api', kwargs={'question_id': self.question.id})
+        return self.client.get(url, {'token': _stream_token(self.user) if token is None else token})
+
+    def events(self):
+        response = self.stream()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        events = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    def test_chunks_then_persisted_explanation(self):
+        """Test that text is relayed in chunks and stored when the stream completes."""
+        events = self.events()
+        chunks = [data['text'] for event, data in events if event == 'chunk']
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(events[-1][0], 'done')
+        self.assertEqual(events[-1][1]['explanation'], ''.join(chunks).strip())
+
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.ai_explanation, events[-1][1]['explanation'])
+        self.assertEqual([event for event, data in self.events()], ['done'])
+
+    def test_pending_while_another_request_generates(self):
+        """Test that a second stream does not call the provider while the lock is held."""
+        from .services.single_flight import acquire_lock
+        acquire_lock(self.question)
+        with patch('quiz.services.providers.FakeProvider.stream') as stream:
+            events = self.events()
+        stream.assert_not_called()
+        self.assertEqual(events[0][0], 'pending')
+        self.assertIn('explanation-status', events[0][1]['poll_url'])
+
+
+    def test_requires_stream_token(self):
+        """Test that a GET without the page's token, e.g. from another site, starts nothing."""
+        from .views import _stream_token
+        with patch('quiz.services.providers.FakeProvider.stream') as stream:
+            self.assertEqual(self.stream(token='').status_code, 403)
+            self.assertEqual(self.stream(token=_stream_token(User.objects.create(username='other'))).status_code, 403)
+        stream.assert_not_called()
+
+    def test_shares_rate_limit_with_generate_endpoint(self):
+        """Test that streaming and the POST fallback draw from one hourly allowance."""
+        from .services.explanation_store import explanation_cache
+        explanation_cache.set(self.question.get_cache_key(), "Cached explanation")
+        for _ in range(10):
+            self.assertEqual(self.stream().status_code, 200)
+        response = self.client.post(reverse('generate_explanation_api', kwargs={'question_id': self.question.id}))
+        self.assertEqual(response.status_code, 403)
+
+    def test_disconnect_records_streamed_usage(self):
+        """Test that tokens streamed before the client went away are still ledgered."""
+        from .models import TokenLedgerEntry
+        response = self.stream()
+        next(iter(response.streaming_content))
+        response.close()
+
+        entry = TokenLedgerEntry.objects.get()
+        self.assertEqual(entry.question, self.question)
+        self.assertEqual(entry.output_tokens, 7)
+        self.question.refresh_from_db()
+        self.assertIsNone(self.question.ai_explanation)
+
+    def test_unconfigured_provider_fails_and_releases_lock(self):
+        """Test that a provider that cannot be built ends the stream with ``failed`` and frees the question."""
+        from .services.single_flight import is_generating
+        with self.settings(EXPLANATION_PROVIDER='gemini', GEMINI_API_KEY=None):
+            events = self.events()
+        self.assertEqual([event for event, data in events], ['failed'])
+        self.assertFalse(is_generating(self.question))
+
+
+@override_settings(EXPLANATION_PROVIDER='fake', EXPLANATION_FAKE_LATENCY=0, EXPLANATION_FAKE_OUTPUT_WORDS=10)
+class ExplanationPrewarmTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Biology")
+        self.user = User.objects.create(username='student')
+
+    def make_quiz(self, title, questions=2):
+        quiz = Quiz.objects.create(title=title, description="Test", category=self.category)
+        for i in range(questions):
+            question = Question.objects.create(quiz=quiz, text=f"{title} question {i}?")
+            Choice.objects.create(question=question, text="Yes", is_correct=True)
+            Choice.objects.create(question=question, text="No", is_correct=False)
+        return quiz
+
+    @override_settings(EXPLANATION_PREWARM_ON_IMPORT=True)
+    def test_import_queues_explanations(self):
+        """Test that importing a quiz file queues a job per question once the import commits."""
+        import tempfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import ExplanationJob
+
+        csv = b"Question,A,B,C,D,Answer\nWhat is DNA?,Acid,Base,Salt,Sugar,A\nWhat is RNA?,Acid,Base,Salt,Sugar,A\n"
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                quiz = Quiz.objects.create(
+                    title="Imported", description="Test", category=self.category,
+                    quiz_file=SimpleUploadedFile('quiz.csv', csv, content_type='text/csv'),
+                )
+
+        jobs = ExplanationJob.objects.filter(question__quiz=quiz)
+        self.assertEqual(jobs.count(), 2)
+        self.assertTrue(all(job.status == ExplanationJob.QUEUED for job in jobs))
+
+    def test_worker_explains_popular_quizzes_first(self):
+        """Test that the worker claims jobs by popularity."""
+        from .models import ExplanationJob, QuizSubmission
+        from .services.prewarm import enqueue_explanations, run_jobs
+
+        quiet = self.make_quiz("Quiet")
+        self.category = Category.objects.create(name="Chemistry")
+        popular = self.make_quiz("Popular")
+        QuizSubmission.objects.create(user=self.user, quiz=popular, score=1)
+        self.assertEqual(enqueue_explanations(quiet), 2)
+        self.assertEqual(enqueue_explanations(popular), 2)
+        self.assertEqual(ExplanationJob.objects.get(question__quiz=popular, question__text__endswith="0?").priority, 2)
+
+        self.assertEqual(run_jobs(ExplanationGenerator(), 2), {'done': 2, 'failed': 0, 'deferred': 0})
+        self.assertEqual(
+            set(ExplanationJob.objects.filter(status=ExplanationJob.DONE).values_list('question__quiz', flat=True)),
+            {popular.id},
+        )
+        self.assertFalse(Question.objects.filter(quiz=popular, ai_explanation__isnull=True).exists())
+
+    @override_settings(EXPLANATION_FAKE_ERROR_RATE=1.0, EXPLANATION_JOB_MAX_ATTEMPTS=2)
+    def test_only_real_calls_use_attempts(self):
+        """Test that retries wait out the negative cache and skipped runs do not count as attempts."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ExplanationJob
+        from .services.prewarm import enqueue_explanations, run_jobs
+
+        enqueue_explanations(self.make_quiz("Quiz", questions=1))
+        job = ExplanationJob.objects.get()
+        with patch('quiz.services.providers.FakeProvider.generate', side_effect=ConnectionError("down")) as generate:
+            self.assertEqual(run_jobs(ExplanationGenerator(), 1), {'done': 0, 'failed': 1, 'deferred': 0})
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (ExplanationJob.QUEUED, 1))
+            self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=60))
+            self.assertEqual(run_jobs(ExplanationGenerator(), 1)['failed'], 0)
+
+            # Due again while the failure is still negatively cached: deferred, not failed
+            ExplanationJob.objects.update(next_attempt_at=None)
+            self.assertEqual(run_jobs(ExplanationGenerator(), 1)['deferred'], 1)
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(generate.call_count, 1)
+
+            cache.clear()
+            ExplanationJob.objects.update(next_attempt_at=None)
+            self.assertEqual(run_jobs(ExplanationGenerator(), 1)['failed'], 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ExplanationJob.FAILED, 2))
+        self.assertEqual(generate.call_count, 2)
+
+    @override_settings(GEMINI_REQUESTS_PER_MINUTE=6000)
+    def test_worker_command_drains_queue(self):
+        """Test that run_explanation_worker --once explains every queued question and exits."""
+        from django.core.management import call_command
+        from .services.prewarm import enqueue_explanations
+
+        quiz = self.make_quiz("Quiz", questions=3)
+        enqueue_explanations(quiz)
+        out = StringIO()
+        call_command('run_explanation_worker', '--once', '--batch', '2', stdout=out)
+        self.assertIn("Explained 2 question(s)", out.getvalue())
+        self.assertIn("Explained 1 question(s)", out.getvalue())
+        self.assertFalse(Question.objects.filter(quiz=quiz, ai_explanation__isnull=True).exists())
+
+    def test_enqueue_keeps_failed_jobs_failed(self):
+        """Test that re-running the import (every quiz save) does not reset exhausted jobs."""
+        from .models import ExplanationJob
+        from .services.prewarm import enqueue_explanations
+
+        quiz = self.make_quiz("Quiz", questions=2)
+        enqueue_explanations(quiz)
+        failed = ExplanationJob.objects.first()
+        ExplanationJob.objects.filter(pk=failed.pk).update(status=ExplanationJob.FAILED, attempts=3)
+        ExplanationJob.objects.exclude(pk=failed.pk).update(status=ExplanationJob.DONE, attempts=1)
+
+        enqueue_explanations(quiz)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (ExplanationJob.FAILED, 3))
+        self.assertEqual(
+            list(ExplanationJob.objects.exclude(pk=failed.pk).values_list('status', 'attempts')),
+            [(ExplanationJob.QUEUED, 0)],
+        )
@@ -8,6 +8,11 @@ urlpatterns=[
     
     # API endpoints for AI explanations
     path('api/question/<int:question_id>/generate-explanation/', views.generate_explanation_api, name='generate_explanation_api'),
+    path('api/question/<int:question_id>/stream-explanation/', views.stream_explanation_api, name='stream_explanation_api'),
+    path('api/question/<int:question_id>/explanation-status/', views.explanation_status_api, name='explanation_status_api'),
     path('api/question/<int:question_id>/regenerate-explanation/', views.regenerate_explanation_api, name='regenerate_explanation_api'),
     path('api/explanation-stats/', views.explanation_stats_api, name='explanation_stats_api'),
+
+    # Admin metrics
+    path('api/metrics/timeseries/', views.metrics_timeseries_api, name='metrics_timeseries_api'),
 ]
\ No newline at end of file
@@ -104,12 +104,23 @@ from .models import Quiz, Category
 from django.db.models import Q
 from quiz.models import QuizSubmission
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core import signing
 from django.core.exceptions import PermissionDenied
 from django_ratelimit.decorators import ratelimit
+from .services.quiz_stats import get_quiz_result_stats
+from .services.answers import get_submitted_answers, record_answers
+from .services.explanation_store import explanation_cache
+from .services.timeseries import TIMESERIES_BUCKETS, get_hourly_submissions, get_metric_series
+from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
+import hashlib
 from django.utils import timezone
 from datetime import timedelta
 import json
@@ -117,6 +128,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# The generate and stream endpoints draw from one per-user rate limit; the
+# methods are part of django-ratelimit's key, so both name the same ones
+EXPLANATION_RATELIMIT_GROUP = 'quiz.explanations'
+EXPLANATION_RATELIMIT_METHODS = ['GET', 'POST']
+STREAM_TOKEN_SALT = 'quiz.stream-explanation'
+
 @login_required(login_url='login')
 def all_quiz_view(request):
     user_object = get_object_or_404(User, username=request.user)
@@ -162,7 +179,7 @@ def quiz_view(request, quiz_id):
         return redirect('all_quiz')
 
     total_questions = quiz.question_set.all().count()
-    questions = quiz.question_set.all()
+    questions = quiz.question_set.prefetch_related('choice_set')
 
     if request.method == "POST":
         # Get the score
@@ -174,6 +191,8 @@ def quiz_view(request, quiz_id):
         # Always save a new submission to allow retakes
         submission = QuizSubmission(user=request.user, quiz=quiz, score=score)
         submission.save()
+        # Per-question answers feed the item analysis
+        record_answers(submission, questions, request.POST)
 
         # Display results and explanations
         messages.success(request, f"Quiz submitted! Score: {score}/{total_questions}")
@@ -184,7 +203,9 @@ def quiz_view(request, quiz_id):
             "score": score,
             "total_questions": total_questions,
             "show_explanation": True,  # Show explanations
-            "user_answers": user_answers
+            "user_answers": user_answers,
+            "quiz_stats": get_quiz_result_stats(quiz, score),
+            "explanation_stream_token": _stream_token(request.user),
         }
         return render(request, 'quiz.html', context)
 
@@ -196,6 +217,7 @@ def quiz_view(request, quiz_id):
         "show_explanation": False,  # Do not show explanations initially
         "user_answers": {},  # Empty dict for GET
         "total_questions": total_questions,
+        "explanation_stream_token": _stream_token(request.user),
     }
 
     # If user requested a review or has a previous submission for this quiz,
@@ -212,7 +234,8 @@ def quiz_view(request, quiz_id):
             "show_explanation": True,
             "score": latest_submission.score if latest_submission else None,
             "total_questions": total_questions,
-            "user_answers": {}  # per-question answers not stored
+            "user_answers": get_submitted_answers(latest_submission) if latest_submission else {},
+            "quiz_stats": get_quiz_result_stats(quiz, latest_submission.score) if latest_submission else None,
         })
     # If retake requested, present a clean quiz (no explanations, empty answers)
     elif retake_flag == '1':
@@ -233,46 +256,70 @@ def quiz_view(request, quiz_id):
 
 # API Views for AI Explanations
 
+def _check_explanation_access(user, question):
+    """Staff, or users who have taken the question's quiz, may see AI explanations."""
+    if not user.is_staff and not QuizSubmission.objects.filter(user=user, quiz=question.quiz).exists():
+        raise PermissionDenied("You must complete the quiz before requesting explanations.")
+
+
+def _explanation_response(question, explanation):
+    return {
+        'success': True,
+        'status': 'ready',
+        'explanation': explanation,
+        'is_ai_generated': True,
+        'generated_at': question.ai_generated_at.isoformat() if question.ai_generated_at else None,
+        'cost': float(question.ai_cost) if question.ai_cost else None,
+    }
+
+
+def _pending_response(question):
+    return JsonResponse({
+        'success': False,
+        'status': 'pending',
+        'poll_url': reverse('explanation_status_api', kwargs={'question_id': question.id}),
+        'retry_after': 2,
+    }, status=202)
+
+
 @require_POST
 @login_required
-@ratelimit(key='user', rate='10/h', method='POST', block=True)
+@ratelimit(key='user', rate='10/h', method=EXPLANATION_RATELIMIT_METHODS, block=True, group=EXPLANATION_RATELIMIT_GROUP)
 def generate_explanation_api(request, question_id):
     """
     API endpoint to generate AI explanation for a question.
-    Rate limited to 10 requests per hour per user.
+    Rate limited to 10 requests per hour per user. Concurrent requests for
+    the same question share one generation: late arrivals wait briefly for
+    it and otherwise get a 202 "pending" response to poll.
     """
     try:
         from .models import Question
         from .services import ExplanationGenerator
+        from .services.single_flight import PENDING, READY, generate_once
 
         question = get_object_or_404(Question, id=question_id)
 
         # Check if user has permission (must be staff or have taken the quiz)
-        if not request.user.is_staff:
-            quiz = question.quiz
-            if not QuizSubmission.objects.filter(user=request.user, quiz=quiz).exists():
-                raise PermissionDenied("You must complete the quiz before requesting explanations.")
+        _check_explanation_access(request.user, question)
 
-        # Generate explanation
-        generator = ExplanationGenerator()
-        explanation = generator.generate_explanation(question)
+        # Generate explanation, unless another request already is
+        status, explanation = generate_once(
+            question, lambda question: ExplanationGenerator().generate_explanation(question)
+        )
+        if status == PENDING:
+            return _pending_response(question)
 
-        if explanation:
-            response_data = {
-                'success': True,
-                'explanation': explanation,
-                'is_ai_generated': True,
-                'generated_at': question.ai_generated_at.isoformat() if question.ai_generated_at else None,
-                'cost': float(question.ai_cost) if question.ai_cost else None,
-            }
+        if status == READY:
+            response_data = _explanation_response(question, explanation)
         else:
             response_data = {
                 'success': False,
+                'status': 'failed',
                 'error': question.ai_error or 'Failed to generate explanation',
             }
 
         # Log the request
-        logger.info(f"Explanation request for question {question_id} by user {request.user.username}: {'success' if explanation else 'failed'}")
+        logger.info(f"Explanation request for question {question_id} by user {request.user.username}: {status}")
 
         return JsonResponse(response_data)
 
@@ -284,6 +331,124 @@ def generate_explanation_api(request, question_id):
         return JsonResponse({'success': False, 'error': 'Internal server error'}, status=500)
 
 
+def _stream_token(user) -> str:
+    """
+    Signed token the quiz page hands to the stream endpoint. EventSource can
+    only send plain GETs, so this stands in for the CSRF token: another site
+    cannot read it and so cannot start a paid generation for the user.
+    """
+    return signing.dumps(user.pk, salt=STREAM_TOKEN_SALT) if user.is_authenticated else ''
+
+
+def _valid_stream_token(request) -> bool:
+    try:
+        user_id = signing.loads(
+            request.GET.get('token', ''), salt=STREAM_TOKEN_SALT,
+            max_age=getattr(settings, 'EXPLANATION_STREAM_TOKEN_MAX_AGE', 12 * 3600),
+        )
+    except signing.BadSignature:
+        return False
+    return user_id == request.user.pk
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@require_GET
+@login_required
+@ratelimit(key='user', rate='10/h', method=EXPLANATION_RATELIMIT_METHODS, block=True, group=EXPLANATION_RATELIMIT_GROUP)
+def stream_explanation_api(request, question_id):
+    """
+    Stream an AI explanation as Server-Sent Events: ``chunk`` events carry
+    text as the model produces it and a final ``done`` event the stored
+    explanation (``failed`` on errors). When another request is already
+    generating the question, a single ``pending`` event points to the
+    status endpoint instead. Requires the quiz page's stream token and
+    shares the generate endpoint's rate limit.
+    """
+    from .models import Question
+    from .services import ExplanationGenerator
+    from .services.single_flight import acquire_lock, release_lock
+
+    if not _valid_stream_token(request):
+        return JsonResponse({'success': False, 'error': 'Invalid or expired stream token'}, status=403)
+
+    question = get_object_or_404(Question, id=question_id)
+    try:
+        _check_explanation_access(request.user, question)
+    except PermissionDenied as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+
+    def events():
+        explanation = explanation_cache.get(question.get_cache_key())
+        if explanation:
+            yield _sse('done', _explanation_response(question, explanation))
+            return
+
+        token = acquire_lock(question)
+        if not token:
+            yield _sse('pending', {
+                'poll_url': reverse('explanation_status_api', kwargs={'question_id': question.id}),
+                'retry_after': 2,
+            })
+            return
+
+        stream = None
+        try:
+            stream = ExplanationGenerator().stream_explanation(question)
+            for event, text in stream:
+                if event == 'chunk':
+                    yield _sse('chunk', {'text': text})
+                elif event == 'done':
+                    yield _sse('done', _explanation_response(question, text))
+                else:
+                    yield _sse('failed', {'error': text})
+        except Exception as e:
+            logger.error(f"Error streaming explanation for question {question_id}: {e}")
+            yield _sse('failed', {'error': 'Internal server error'})
+        finally:
+            # On a client disconnect this lets the generator record what was streamed
+            if stream is not None:
+                stream.close()
+            release_lock(question, token)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+@login_required
+def explanation_status_api(request, question_id):
+    """
+    Poll for an explanation being generated by another request. Cheap and
+    not rate limited: it only reads the cache and the question.
+    """
+    from .models import Question
+    from .services.single_flight import is_generating
+
+    question = get_object_or_404(Question, id=question_id)
+    try:
+        _check_explanation_access(request.user, question)
+    except PermissionDenied as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+
+    explanation = explanation_cache.get(question.get_cache_key()) or question.ai_explanation
+    if explanation:
+        return JsonResponse(_explanation_response(question, explanation))
+    if is_generating(question):
+        return _pending_response(question)
+    return JsonResponse({
+        'success': False,
+        'status': 'failed',
+        'error': question.ai_error or 'Failed to generate explanation',
+    })
+
+
 @staff_member_required
 @require_POST
 def regenerate_explanation_api(request, question_id):
@@ -327,10 +492,10 @@ def explanation_stats_api(request):
     Admin-only endpoint to get explanation generation statistics.
     """
     try:
-        from .services import ExplanationGenerator
+        from .services.token_ledger import get_ledger_stats
 
-        generator = ExplanationGenerator()
-        stats = generator.get_generation_stats()
+        # Served from the ledger's running counters; no provider is needed
+        stats = get_ledger_stats(getattr(settings, 'EXPLANATION_CACHE_TIMEOUT', 86400))
 
         return JsonResponse({
             'success': True,
@@ -340,3 +505,44 @@ def explanation_stats_api(request):
     except Exception as e:
         logger.error(f"Error getting explanation stats: {e}")
         return JsonResponse({'success': False, 'error': 'Internal server error'}, status=500)
+
+
+@staff_member_required
+def metrics_timeseries_api(request):
+    """
+    Admin-only time series of the daily metrics (``bucket`` = day, week or
+    month) or of submissions per hour (``bucket=hour``), downsampled to at
+    most ``max_points`` points. Responses carry an ETag so unchanged series
+    are revalidated with a 304 instead of being resent.
+    """
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in TIMESERIES_BUCKETS:
+        return JsonResponse({'success': False, 'error': f"bucket must be one of {', '.join(TIMESERIES_BUCKETS)}"}, status=400)
+
+    limit = getattr(settings, 'ADMIN_TIMESERIES_MAX_POINTS', 365)
+    try:
+        max_points = min(int(request.GET.get('max_points', limit)), limit)
+        hours = min(int(request.GET.get('hours', 48)), 24 * 31)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'max_points and hours must be integers'}, status=400)
+    if max_points < 1 or hours < 1:
+        return JsonResponse({'success': False, 'error': 'max_points and hours must be positive'}, status=400)
+
+    if bucket == 'hour':
+        series = get_hourly_submissions(hours, max_points)
+    else:
+        try:
+            start = parse_date(request.GET['start']) if request.GET.get('start') else None
+            end = parse_date(request.GET['end']) if request.GET.get('end') else None
+        except ValueError:
+            # Well-formed but impossible dates, e.g. 2025-02-30
+            start = end = None
+        if (request.GET.get('start') and start is None) or (request.GET.get('end') and end is None):
+            return JsonResponse({'success': False, 'error': 'start and end must be valid YYYY-MM-DD dates'}, status=400)
+        series = get_metric_series(bucket, start, end, max_points)
+
+    response = JsonResponse({'success': True, **series})
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)